@@ -0,0 +1,517 @@
+
+# coding: utf-8
+
+# ## OpenStreetMap Data Case Study: East Bay, California
+# 
+# ## Project Analysis
+# 
+# P3: Wrangle OpenStreetMap Data -- Udacity Data Science Nanodegree
+# 
+# Megan O'Neil
+# 
+# 2016-11-30
+
+# This document contains the queries used to analyze the eastbay.db created
+# by P3_EastBay_Map_Code_v3.py (see create_db there).
+
+# In[1]:
+
+import sqlite3
+from pprint import pprint
+
+from eastbay.cache import QueryCache
+from eastbay.reports import plot_freq_query, run_reports
+from eastbay.search import search
+
+
+# In[2]:
+
+# The report queries below are also defined in eastbay/reports.py (REPORTS), where
+# run_reports runs them all at once on parallel read-only connections:
+#report = run_reports('eastbay.db')
+#pprint(report['reports']['top_users']['rows'])
+
+# Rerunning a cell on an unchanged eastbay.db can reuse the stored rows
+# (eastbay/cache.py); they are dropped once the database is reloaded or updated:
+#cache = QueryCache()
+#report = run_reports('eastbay.db', cache=cache)
+#all_rows = cache.execute('eastbay.db', QUERY)
+
+# With create_db('eastbay.db', search=True), nodes and ways can be found by the
+# words in their names, streets, shops, cuisines and so on (eastbay/search.py):
+#pprint(search('eastbay.db', 'bicycle parking', limit=5))
+#pprint(search('eastbay.db', 'Berkeley', keys=['addr:city']))
+
+# With create_db('eastbay.db', tiles=True), node density per map tile is read
+# from the small tile_counts table instead of every nodes row (eastbay/tiles.py):
+#import matplotlib.pyplot as plt
+#from eastbay.tiles import density_grid
+#x0, y0, grid = density_grid('eastbay.db', 14, 'amenity=bicycle_parking')
+#plt.imshow(grid)
+
+# Nearest bicycle parking to many points at once, from a grid index of the
+# amenity and shop nodes (eastbay/nearby.py):
+#from eastbay.nearby import AmenityIndex
+#index = AmenityIndex.from_db('eastbay.db')
+#dist, ids = index.nearest('amenity=bicycle_parking', [37.8716, 37.8044], [-122.2727, -122.2712], k=3)
+
+# With create_db('eastbay.db', addresses=True), a street address is found with
+# one probe of the addresses table instead of a self-join of the addr tags
+# (eastbay/addresses.py):
+#from eastbay.addresses import AddressIndex
+#index = AddressIndex('eastbay.db')
+#pprint(index.geocode('2020 Telegraph Ave, Berkeley, CA 94704'))
+#pprint(index.prefix('telegraph', limit=5))
+
+# Travel distances along the highway ways, from the csv files (eastbay/routing.py):
+#from eastbay.routing import build_graph
+#graph = build_graph()
+#length, path = graph.route(graph.nearest(37.8716, -122.2727), graph.nearest(37.8044, -122.2712))
+
+
+# ### Assessing SQL Database
+
+# In[58]:
+
+# Connect to the database
+db = sqlite3.connect('eastbay.db')
+c = db.cursor()
+
+
+# In[59]:
+
+# Get database filesize
+# https://discussions.udacity.com/t/size-of-file-database-query/180429
+# http://www.sqlite.org/pragma.html#pragma_page_count
+
+QUERY = "PRAGMA PAGE_SIZE;"
+c.execute(QUERY)
+rows = c.fetchall()
+page_size = rows[0][0]
+
+
+QUERY = "PRAGMA PAGE_COUNT;"
+c.execute(QUERY)
+rows = c.fetchall()
+page_count = rows[0][0]
+
+bytesize = (page_size * page_count)
+MBsize = bytesize/1000000
+print MBsize
+
+
+# In[60]:
+
+# Number of nodes
+
+QUERY = '''
+SELECT COUNT(*) 
+FROM nodes;'''
+
+c.execute(QUERY)
+
+all_rows = c.fetchall()
+pprint(all_rows)
+nodes = all_rows[0][0]
+
+
+# In[61]:
+
+# Number of ways
+
+QUERY = '''
+SELECT COUNT(*) 
+FROM ways;'''
+
+c.execute(QUERY)
+
+all_rows = c.fetchall()
+pprint(all_rows)
+ways = all_rows[0][0]
+
+
+# In[62]:
+
+# Total number of ways + nodes
+pprint(ways + nodes)
+ways_nodes = ways + nodes
+
+
+# In[63]:
+
+# Number of unique users
+
+QUERY = '''
+SELECT COUNT(DISTINCT(e.uid))
+FROM (SELECT uid FROM nodes UNION ALL SELECT uid FROM ways) e;'''
+
+c.execute(QUERY)
+
+all_rows = c.fetchall()
+pprint(all_rows)
+
+## Note - python script returned 880 users. BUT this was before I dropped files with invalid zip codes.
+
+#Reference sample project: https://gist.github.com/carlward/54ec1c91b62a5f911c42#file-sample_project-md
+#Not useful reference: http://stackoverflow.com/questions/7731406/sql-query-to-find-distinct-values-in-two-tables
+
+
+# In[64]:
+
+# Frequency of users, top 5
+
+QUERY = '''
+SELECT users.user, e.count
+FROM (SELECT uid, COUNT(*) as count
+      FROM (SELECT uid FROM nodes UNION ALL SELECT uid FROM ways)
+      GROUP BY uid
+      ORDER BY count DESC
+      LIMIT 10) e
+    JOIN users ON users.uid = e.uid
+ORDER BY e.count DESC;
+'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+top10users = all_rows
+topuser_entries = float(all_rows[0][1])
+print topuser_entries
+
+
+# In[65]:
+
+# % of entries by top user:
+topuser_entries/ways_nodes
+
+
+# In[66]:
+
+# Number of users with only one post
+QUERY = '''
+SELECT COUNT(*)
+FROM (SELECT e.uid, COUNT(*) as num
+FROM (SELECT uid FROM nodes UNION ALL SELECT uid FROM ways) e
+GROUP BY e.uid
+HAVING num=1) u;
+'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+
+# In[67]:
+
+# Number of users with over 100 posts
+QUERY = '''
+SELECT COUNT(*)
+FROM (SELECT e.uid, COUNT(*) as num
+FROM (SELECT uid FROM nodes UNION ALL SELECT uid FROM ways) e
+GROUP BY e.uid
+HAVING num > 100) u;
+'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+
+# In[68]:
+
+# Number and frequency of top 5 zip codes.
+
+QUERY = '''
+SELECT tags.value, COUNT(*) as count
+FROM (SELECT * FROM nodes_tags 
+      UNION ALL 
+      SELECT * FROM ways_tags) tags
+WHERE tags.key = 'postcode'
+GROUP BY tags.value
+ORDER BY count DESC
+LIMIT 5;'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+
+# In[69]:
+
+# Sort 10 most frequent cities by count, descending
+
+QUERY = '''
+SELECT tags.value, COUNT(*) as count
+FROM (SELECT * FROM nodes_tags 
+      UNION ALL 
+      SELECT * FROM ways_tags) tags
+WHERE tags.key LIKE '%city'
+GROUP BY tags.value
+ORDER BY count DESC
+LIMIT 10;'''
+
+c.execute(QUERY)
+
+all_rows = c.fetchall()
+pprint(all_rows)
+
+## City function is working - it's only cleaning the ones I told it to, the other mess stays in there.
+
+
+# In[70]:
+
+# plot_freq_query (eastbay/reports.py) makes a bar plot of value, frequency rows
+
+
+# In[71]:
+
+# Frequency of top 10 amenities
+
+QUERY = '''
+SELECT tags.value, COUNT(*) as count
+FROM (SELECT * FROM nodes_tags 
+      UNION ALL 
+      SELECT * FROM ways_tags) tags
+WHERE tags.key='amenity'
+GROUP BY tags.value
+ORDER BY count DESC
+LIMIT 10;'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+plot_freq_query(all_rows, 'Amenity', 'Frequency', 'Top 10 Amenities by Frequency')
+
+
+# In[72]:
+
+# Average capacity of bicycle parking amenities
+QUERY = '''
+SELECT AVG(CAST(nodes_tags.value as INTEGER))
+FROM nodes_tags 
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE value='bicycle_parking') i
+    ON nodes_tags.id = i.id
+    WHERE nodes_tags.key = 'capacity';'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+
+# In[73]:
+
+# Capacities of top 10 largest bicycle parking amenities
+QUERY = '''
+SELECT CAST(nodes_tags.value as INTEGER)
+FROM nodes_tags 
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE value='bicycle_parking') i
+    ON nodes_tags.id = i.id
+    WHERE nodes_tags.key = 'capacity'
+    ORDER BY cast(nodes_tags.value as INTEGER) DESC
+    LIMIT 10;'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+
+# In[74]:
+
+# Details on this giant bicycle parking station!
+QUERY = '''
+SELECT *
+FROM nodes_tags
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE key = 'capacity' AND value='268') i
+    ON nodes_tags.id = i.id
+  ;'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+
+# In[75]:
+
+# Where is this giant bicycle parking, latitude & longitude?
+QUERY = '''
+SELECT nodes.lat, nodes.lon
+FROM nodes_tags JOIN nodes ON nodes_tags.id = nodes.id
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE value='bicycle_parking') i
+    ON nodes_tags.id = i.id
+    WHERE nodes_tags.key = 'capacity' AND nodes_tags.value = '268';'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+
+# In[76]:
+
+# Number of users adding bicycle parking to OSM
+QUERY = '''
+SELECT COUNT(DISTINCT(uid))
+FROM nodes_tags JOIN nodes ON nodes_tags.id = nodes.id
+WHERE nodes_tags.key = 'amenity' and nodes_tags.value = 'bicycle_parking' 
+;'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+
+# In[77]:
+
+# Users adding bicycle parking and number of entries per user
+QUERY = '''
+SELECT users.user, e.count
+FROM (SELECT nodes.uid, COUNT(*) as count
+      FROM nodes_tags JOIN nodes ON nodes_tags.id = nodes.id
+      WHERE nodes_tags.key = 'amenity' and nodes_tags.value = 'bicycle_parking'
+      GROUP BY nodes.uid) e
+    JOIN users ON users.uid = e.uid
+ORDER BY e.count DESC
+;'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+
+# In[95]:
+
+# Popular shops
+
+QUERY = '''
+SELECT nodes_tags.value, COUNT(*) as num
+FROM nodes_tags 
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE key='shop') i
+    ON nodes_tags.id = i.id
+WHERE key = 'shop'
+GROUP BY nodes_tags.value
+ORDER BY num DESC
+LIMIT 10;'''
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+plot_freq_query(all_rows, 'Shop Type', 'Frequency', 'Top 10 Shop Types by Frequency')
+
+
+# In[94]:
+
+# Popular cuisines
+QUERY = '''
+SELECT nodes_tags.value, COUNT(*) as num
+FROM nodes_tags 
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE value='restaurant') i
+    ON nodes_tags.id = i.id
+WHERE nodes_tags.key='cuisine'
+GROUP BY nodes_tags.value
+ORDER BY num DESC
+LIMIT 10;'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+plot_freq_query(all_rows, 'Cuisine', 'Frequency', 'Top 10 Restaurant Cuisines by Frequency')
+
+
+# In[103]:
+
+# Number of korean and ethiopian restaurants
+QUERY = '''
+SELECT nodes_tags.value, COUNT(*) as num
+FROM nodes_tags 
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE value='restaurant') i
+    ON nodes_tags.id = i.id
+WHERE nodes_tags.key='cuisine'
+AND (nodes_tags.value = 'korean' 
+OR nodes_tags.value = 'ethiopian')
+GROUP BY nodes_tags.value
+ORDER BY num DESC
+LIMIT 10;'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+
+# In[104]:
+
+# How many solar generators?
+QUERY = '''
+SELECT COUNT(*) as count
+FROM nodes_tags
+WHERE nodes_tags.key = 'source'
+    AND nodes_tags.value = 'solar';'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+
+# In[105]:
+
+# What information is there about energy nodes?
+QUERY = '''
+SELECT nodes_tags.value, COUNT(*) as count
+FROM nodes_tags 
+     
+WHERE nodes_tags.key='power'
+GROUP BY nodes_tags.value
+ORDER BY count DESC;'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+
+# In[106]:
+
+# What type of generators?
+QUERY = '''
+SELECT DISTINCT(nodes_tags.value)
+FROM nodes_tags
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE value='generator') i
+    ON nodes_tags.id = i.id
+    WHERE nodes_tags.key = 'source'
+    ORDER BY nodes_tags.value;'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+
+# In[107]:
+
+# Where are they?
+QUERY = '''
+SELECT DISTINCT(nodes_tags.value)
+FROM nodes_tags
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE value='generator') i
+    ON nodes_tags.id = i.id
+    WHERE nodes_tags.key = 'place'
+    ORDER BY nodes_tags.value;'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
+
+# In[108]:
+
+# Details on one of these rooftop solar systems:
+QUERY = '''
+SELECT *
+FROM nodes_tags
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE key = 'source' AND value='solar') i
+    ON nodes_tags.id = i.id
+    LIMIT 20
+  ;'''
+
+c.execute(QUERY)
+all_rows = c.fetchall()
+pprint(all_rows)
+
@@ -0,0 +1,268 @@
+# coding: utf-8
+
+"""Compare database layouts: file size and report query times.
+
+The csv files are written once with process_map; every layout is then loaded
+from the same csv files with create_db, into its own database file. Each
+layout runs its own version of the queries whose text depends on the layout,
+and the rows returned are checked against the first layout, so a faster query
+that answers differently is caught.
+
+Layouts:
+    user_text    'user' name on every nodes and ways row (create_db(users=False))
+    users_table  integer uid on nodes and ways, names in users(uid, user)
+    tag_codes    users_table, with tag keys and types stored as integer codes
+                 (create_db(encode_tags=True)); the reports that filter on a key run
+                 as ENCODED_TAG_REPORTS, on the integer key_id, as run_reports does
+    typed        users_table, with integer lat/lon (1e-7 degrees), version and
+                 epoch-second timestamps, and NULL for missing attributes
+                 (create_db(typed=True))
+    clustered    users_table, with WITHOUT ROWID tag and way node tables in
+                 element id order (create_db(clustered=True)), 8 KB pages;
+                 clustered_4k and clustered_16k with other page sizes
+
+Per-element lookups (all tags of one node or way, all nodes of one way) are
+timed on LOOKUPS elements spread over the id range, and reported per lookup.
+
+Besides the reports, each layout runs range queries: nodes and ways edited
+in a time window and nodes in a bounding box, written for its column types.
+
+The user_text queries group on the name, the users_table queries on the uid.
+The old top_users query mixed 'user' and 'uid' in its UNION; its user_text
+version here groups the names of both tables, so both layouts return the same rows.
+In the typed layout anonymous edits have a NULL uid instead of the MISSING
+user, and lat/lon are integers, so the reports in TYPED_DIFFERS are only
+checked against other typed layouts.
+
+With --reuse, each layout is loaded over a database already loaded with the
+default layout, as 'python -m eastbay load' does on an existing file; the page
+size each layout asked for is checked either way.
+
+Usage:
+    python benchmarks/synthetic_osm.py /tmp/synth.osm --elements 100000
+    python benchmarks/bench_database.py /tmp/synth.osm --out database.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from timeit import default_timer as timer
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import eastbay
+from eastbay.database import CLUSTERED_PAGE_SIZE, epoch_seconds, fixed_point
+from eastbay.reports import ENCODED_TAG_REPORTS, REPORTS, USER_TEXT_REPORTS, ReportSpec
+
+REPEAT = 5
+LOOKUPS = 20
+
+# The user_text layout has no users table; USER_TEXT_REPORTS replace the reports that
+# join it, as run_reports does, and one_post_users also groups on the names here
+USER_TEXT_QUERIES = USER_TEXT_REPORTS + [
+    ReportSpec('one_post_users', 'Number of users with only one post', '''
+SELECT COUNT(*)
+FROM (SELECT e.user, COUNT(*) as num
+FROM (SELECT user FROM nodes UNION ALL SELECT user FROM ways) e
+GROUP BY e.user
+HAVING num=1) u;'''),
+]
+
+# Reports whose rows change when missing attributes are NULL (typed) instead of MISSING
+TYPED_DIFFERS = ['unique_users', 'top_users', 'bicycle_parking_user_count',
+                 'bicycle_parking_users', 'giant_bicycle_parking_location']
+
+# One year of edits, and a box of about 5 x 4 km inside the synthetic_osm.py area
+TIME_WINDOW = ('2012-01-01T00:00:00Z', '2013-01-01T00:00:00Z')
+BOX = (37.80, -122.30, 37.85, -122.25)  # south, west, north, east
+
+RANGE_SQL = [
+    ('nodes_in_window', 'Nodes edited in TIME_WINDOW', '''
+SELECT COUNT(*) FROM nodes WHERE timestamp >= ? AND timestamp < ?;'''),
+    ('ways_in_window', 'Ways edited in TIME_WINDOW', '''
+SELECT COUNT(*) FROM ways WHERE timestamp >= ? AND timestamp < ?;'''),
+    ('nodes_in_box', 'Nodes in BOX', '''
+SELECT COUNT(*) FROM nodes WHERE lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?;'''),
+]
+
+
+def range_queries(typed=False):
+    """Return the range queries with their bounds for the text or the typed columns."""
+    start, end = TIME_WINDOW
+    south, west, north, east = BOX
+    if typed:
+        start, end = epoch_seconds(start), epoch_seconds(end)
+        south, west, north, east = [fixed_point(b) for b in BOX]
+    params = [(start, end), (start, end), (south, north, west, east)]
+    return [ReportSpec(name, title, sql, p) for (name, title, sql), p in zip(RANGE_SQL, params)]
+
+
+def layout_queries(replacements=(), typed=False):
+    """Return REPORTS, with 'replacements' swapped in by name, followed by the range queries."""
+    replaced = dict((spec.name, spec) for spec in replacements)
+    return [replaced.get(spec.name, spec) for spec in REPORTS] + range_queries(typed)
+
+
+# Name, create_db keyword arguments and queries of each layout
+LAYOUTS = [
+    ('user_text', {'users': False}, layout_queries(USER_TEXT_QUERIES)),
+    ('users_table', {'users': True}, layout_queries()),
+    ('tag_codes', {'users': True, 'encode_tags': True}, layout_queries(ENCODED_TAG_REPORTS)),
+    ('typed', {'users': True, 'typed': True}, layout_queries(typed=True)),
+    ('clustered', {'users': True, 'clustered': True}, layout_queries()),
+    ('clustered_4k', {'users': True, 'clustered': True, 'page_size': 4096}, layout_queries()),
+    ('clustered_16k', {'users': True, 'clustered': True, 'page_size': 16384}, layout_queries()),
+]
+
+# Name, query for the ids to look up and the lookup query, the same in every layout
+LOOKUP_QUERIES = [
+    ('node_tags_by_id', 'SELECT DISTINCT id FROM nodes_tags',
+     'SELECT key, type, value FROM nodes_tags WHERE id = ? ORDER BY key, type;'),
+    ('way_tags_by_id', 'SELECT DISTINCT id FROM ways_tags',
+     'SELECT key, type, value FROM ways_tags WHERE id = ? ORDER BY key, type;'),
+    ('way_nodes_by_id', 'SELECT DISTINCT id FROM ways_nodes',
+     'SELECT node_id FROM ways_nodes WHERE id = ? ORDER BY position;'),
+]
+
+
+def time_query(conn, spec, repeat=REPEAT):
+    """Return the median seconds of running a ReportSpec 'repeat' times, and its rows."""
+    times = []
+    for _ in range(repeat):
+        start = timer()
+        rows = conn.execute(spec.sql, spec.params).fetchall()
+        times.append(timer() - start)
+    return sorted(times)[len(times) // 2], rows
+
+
+def lookup_ids(conn, ids_query, count=LOOKUPS):
+    """Return 'count' ids spread evenly over the sorted results of ids_query."""
+    ids = sorted(row[0] for row in conn.execute(ids_query))
+    step = max(len(ids) // count, 1)
+    return ids[::step][:count]
+
+
+def time_lookups(conn, query, ids, repeat=REPEAT):
+    """Return the median seconds per lookup of running query once per id, and all rows."""
+    times = []
+    for _ in range(repeat):
+        rows = []
+        start = timer()
+        for element_id in ids:
+            rows.extend(conn.execute(query, (element_id,)).fetchall())
+        times.append((timer() - start) / max(len(ids), 1))
+    return sorted(times)[len(times) // 2], rows
+
+
+def same_rows(a, b):
+    """Rows are compared as sets: ties in ORDER BY count may come back in any order."""
+    return sorted(a) == sorted(b)
+
+
+def run(osm_file, layouts=LAYOUTS, workdir=None, repeat=REPEAT, reuse=False):
+    """Load each layout from the csv files of osm_file and time its queries.
+
+    Args:
+        osm_file (string): name of .osm file
+        layouts (list): (name, create_db keyword arguments, ReportSpec list) of each layout
+        workdir (string): directory for csv and database files (temporary by default)
+        repeat (int): times each query is run; the median is reported
+        reuse (Boolean): load each layout over a database loaded with the default layout
+
+    Returns:
+        dictionary with the load seconds, file size and query
+        seconds of each layout
+    """
+    osm_file = os.path.abspath(osm_file)
+    cleanup = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix='eastbay_db_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    results = []
+    expected = {}
+    try:
+        eastbay.process_map(osm_file, validate=False)
+        for name, kwargs, queries in layouts:
+            db_file = name + '.db'
+            if os.path.exists(db_file):
+                os.remove(db_file)
+            if reuse:
+                eastbay.create_db(db_file)
+            start = timer()
+            eastbay.create_db(db_file, **kwargs)
+            load = timer() - start
+            conn = sqlite3.connect(db_file)
+            page_size = conn.execute('PRAGMA page_size;').fetchone()[0]
+            wanted = kwargs.get('page_size') or (CLUSTERED_PAGE_SIZE if kwargs.get('clustered') else None)
+            if wanted and page_size != wanted:
+                raise ValueError('{0}: page size {1}, not {2}'.format(name, page_size, wanted))
+            seconds = {}
+            for spec in queries:
+                query_name = spec.name
+                seconds[query_name], rows = time_query(conn, spec, repeat)
+                check = query_name
+                if query_name in TYPED_DIFFERS:
+                    check = (query_name, kwargs.get('typed', False))
+                if check not in expected:
+                    expected[check] = rows
+                elif not same_rows(rows, expected[check]):
+                    raise ValueError('{0}: {1} returned different rows'.format(name, query_name))
+            for query_name, ids_query, query in LOOKUP_QUERIES:
+                ids = lookup_ids(conn, ids_query)
+                seconds[query_name], rows = time_lookups(conn, query, ids, repeat)
+                if query_name not in expected:
+                    expected[query_name] = rows
+                elif rows != expected[query_name]:
+                    raise ValueError('{0}: {1} returned different rows'.format(name, query_name))
+            conn.close()
+            results.append({
+                'layout': name,
+                'load_seconds': load,
+                'bytes': os.path.getsize(db_file),
+                'page_size': page_size,
+                'queries': seconds,
+            })
+            sys.stderr.write('{0:<12} {1:10.1f} KB  load {2:.3f} s\n'.format(
+                name, os.path.getsize(db_file) / 1024.0, load))
+    finally:
+        os.chdir(cwd)
+        if cleanup:
+            shutil.rmtree(workdir)
+    return {'input': osm_file, 'bytes': os.path.getsize(osm_file), 'layouts': results}
+
+
+def table(report):
+    """Return a text table of sizes and query times, one column per layout."""
+    layouts = report['layouts']
+    lines = ['{0:<30}'.format('') + ''.join('{0:>14}'.format(l['layout']) for l in layouts)]
+    lines.append('{0:<30}'.format('size (KB)') +
+                 ''.join('{0:14.1f}'.format(l['bytes'] / 1024.0) for l in layouts))
+    lines.append('{0:<30}'.format('load (s)') +
+                 ''.join('{0:14.3f}'.format(l['load_seconds']) for l in layouts))
+    for query_name in sorted(layouts[0]['queries']):
+        lines.append('{0:<30}'.format(query_name + ' (ms)') + ''.join(
+            '{0:14.2f}'.format(l['queries'][query_name] * 1000) if query_name in l['queries']
+            else '{0:>14}'.format('-') for l in layouts))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('osm_file', help='.osm file to export and load')
+    parser.add_argument('--workdir', help='keep csv and database files here')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='runs of each query')
+    parser.add_argument('--out', help='save results to this JSON file')
+    parser.add_argument('--reuse', action='store_true',
+                        help='load each layout over an existing database, not a new file')
+    args = parser.parse_args()
+
+    report = run(args.osm_file, workdir=args.workdir, repeat=args.repeat, reuse=args.reuse)
+    print(table(report))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
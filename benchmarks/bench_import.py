@@ -0,0 +1,110 @@
+# coding: utf-8
+
+"""Check that importing the eastbay package is fast and has no side effects.
+
+Each module is imported in a fresh interpreter, several times, and the median
+time of the import statement is compared with the target. The import
+also must not load any of the heavy optional dependencies (pandas, numpy,
+matplotlib, seaborn, cerberus, schema.py) and must not create any files in the
+working directory. The exit status is 1 if any check fails.
+
+Usage:
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --repeat 20 --target-ms 50 --out import.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['eastbay', 'eastbay.clean', 'eastbay.export', 'P3_EastBay_Map_Code_v3']
+HEAVY = ['pandas', 'numpy', 'matplotlib', 'seaborn', 'cerberus', 'schema']
+# Allowed median cold import time (ms)
+DEFAULT_TARGET_MS = 50.0
+
+PROBE = '''
+import json, sys
+from timeit import default_timer as timer
+start = timer()
+__import__(sys.argv[1])
+seconds = timer() - start
+print(json.dumps({'seconds': seconds, 'heavy': [m for m in sys.argv[2:] if m in sys.modules]}))
+'''
+
+
+def probe(module, workdir):
+    """Import module in a fresh interpreter started in workdir; return its timing and heavy modules."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([REPO] + [p for p in [env.get('PYTHONPATH')] if p])
+    env.pop('PYTHONSTARTUP', None)
+    out = subprocess.check_output([sys.executable, '-c', PROBE, module] + HEAVY, cwd=workdir, env=env)
+    return json.loads(out.decode('utf-8').strip().splitlines()[-1])
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def run(modules=MODULES, repeat=10, target_ms=DEFAULT_TARGET_MS):
+    """Measure the cold import time of each module and check it against the target.
+
+    Args:
+        modules (list): names of modules to import
+        repeat (int): number of fresh interpreters per module
+        target_ms (float): allowed median import time in ms
+
+    Returns:
+        dictionary with per-module median ms, heavy modules loaded, files created and pass/fail
+    """
+    workdir = tempfile.mkdtemp(prefix='eastbay_import_')
+    try:
+        results = []
+        for module in modules:
+            runs = [probe(module, workdir) for _ in range(repeat)]
+            ms = median([r['seconds'] for r in runs]) * 1000.0
+            heavy = sorted(set(m for r in runs for m in r['heavy']))
+            created = sorted(os.listdir(workdir))
+            results.append({
+                'module': module,
+                'median_ms': ms,
+                'heavy': heavy,
+                'created': created,
+                'ok': ms <= target_ms and not heavy and not created,
+            })
+            sys.stderr.write('{0:<24} {1:7.1f} ms\n'.format(module, ms))
+    finally:
+        shutil.rmtree(workdir)
+    return {'python': sys.version.split()[0], 'repeat': repeat, 'target_ms': target_ms,
+            'modules': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--modules', default=','.join(MODULES),
+                        help='comma separated modules to import')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--target-ms', type=float, default=DEFAULT_TARGET_MS,
+                        help='allowed median import time in ms (default %(default)s)')
+    parser.add_argument('--out', help='save results to this JSON file')
+    args = parser.parse_args()
+
+    report = run(args.modules.split(','), args.repeat, args.target_ms)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    for m in report['modules']:
+        problems = ['loads ' + ', '.join(m['heavy'])] if m['heavy'] else []
+        problems += ['creates ' + ', '.join(m['created'])] if m['created'] else []
+        if m['median_ms'] > report['target_ms']:
+            problems.append('slower than {0:.0f} ms'.format(report['target_ms']))
+        print('{0:<24} {1:7.1f} ms  {2}'.format(m['module'], m['median_ms'],
+                                                 '; '.join(problems) if problems else 'ok'))
+    sys.exit(0 if all(m['ok'] for m in report['modules']) else 1)
@@ -0,0 +1,196 @@
+# coding: utf-8
+
+"""Check that no pipeline stage's peak memory grows with the size of the input.
+
+Every stage from bench_pipeline.py is run in its own process on synthetic
+inputs of growing size. The peak memory of the stage is the highest anonymous
+resident memory (RssAnon in /proc/self/status, sampled every few milliseconds)
+above what the process used before the stage started. File-backed pages, such
+as the memory-mapped input of the scan stages, are not counted. Where /proc is
+not available the peak resident set size (ru_maxrss) is used instead.
+
+A stage fails when its peak on the largest input is more than its budget above
+its peak on the smallest input. The exit status is 1 if any stage fails.
+
+Usage:
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --sizes 10000,100000,1000000 --out memory.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import synthetic_osm
+
+DEFAULT_SIZES = [5000, 20000, 80000]
+# Allowed growth of peak memory (MB) from the smallest to the largest input
+DEFAULT_BUDGET = 16.0
+# Stages whose memory is expected to grow with the number of distinct values
+# (users, postcodes, street types) get a little more room.
+BUDGETS = {
+    'users': 24.0,
+    'zips': 24.0,
+    'streets': 24.0,
+    'cities': 24.0,
+    # The routing graph is built and queried in memory
+    'graph': 32.0,
+    # and its landmark distances are 256 bytes per graph node (LANDMARKS of 16 bytes)
+    'landmarks': 64.0,
+    # Up to NEAREST_QUERIES query points, and the index of every amenity and shop
+    'nearest': 32.0,
+}
+
+
+def anon_rss_mb():
+    """Return the current anonymous resident memory in MB, or None without /proc."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('RssAnon:'):
+                    return int(line.split()[1]) / 1024.0
+    except IOError:
+        pass
+    return None
+
+
+def max_rss_mb():
+    """Return the peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024.0 / 1024.0 if sys.platform == 'darwin' else peak / 1024.0
+
+
+class PeakSampler(threading.Thread):
+    """Sample anonymous resident memory in the background and keep the maximum."""
+
+    def __init__(self, interval=0.005):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.interval = interval
+        self.peak = anon_rss_mb()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, anon_rss_mb())
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.peak = max(self.peak, anon_rss_mb())
+        return self.peak
+
+
+def child(stage, osm_file, workdir):
+    """Run one stage in this process and print its peak memory as JSON."""
+    import bench_pipeline
+
+    os.chdir(workdir)
+    if anon_rss_mb() is None:
+        before = max_rss_mb()
+        bench_pipeline.STAGES[stage](osm_file, workdir)
+        peak = max_rss_mb() - before
+    else:
+        sampler = PeakSampler()
+        before = sampler.peak
+        sampler.start()
+        bench_pipeline.STAGES[stage](osm_file, workdir)
+        peak = sampler.stop() - before
+    print(json.dumps({'stage': stage, 'peak_mb': max(peak, 0.0)}))
+
+
+def measure(stage, osm_file, workdir):
+    """Run one stage in a fresh process and return its peak memory in MB."""
+    out = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                   '--child', stage, osm_file, workdir])
+    return json.loads(out.decode('utf-8').strip().splitlines()[-1])['peak_mb']
+
+
+def run(stages, sizes, budget=DEFAULT_BUDGET, tmpdir=None):
+    """Measure every stage on every input size and check the budgets.
+
+    Stages run in pipeline order for each size, sharing one work directory,
+    so the sqlite and reports stages find the csv files and database they need.
+
+    Args:
+        stages (list): names of stages from bench_pipeline.STAGES, in pipeline order
+        sizes (list): numbers of elements in the synthetic inputs
+        budget (float): allowed growth in MB for stages not listed in BUDGETS
+        tmpdir (string): directory for inputs and outputs (temporary by default)
+
+    Returns:
+        dictionary with per-stage peaks by size, growth, budget and pass/fail
+    """
+    cleanup = tmpdir is None
+    tmpdir = tmpdir or tempfile.mkdtemp(prefix='eastbay_mem_')
+    peaks = dict((stage, {}) for stage in stages)
+    try:
+        for size in sizes:
+            osm_file = os.path.join(tmpdir, 'synthetic_{0}.osm'.format(size))
+            if not os.path.exists(osm_file):
+                synthetic_osm.generate(osm_file, size)
+            workdir = os.path.join(tmpdir, 'work_{0}'.format(size))
+            if not os.path.isdir(workdir):
+                os.mkdir(workdir)
+            for stage in stages:
+                peaks[stage][size] = measure(stage, osm_file, workdir)
+                sys.stderr.write('{0:<12} {1:>10,} elements {2:8.1f} MB\n'.format(
+                    stage, size, peaks[stage][size]))
+    finally:
+        if cleanup:
+            shutil.rmtree(tmpdir)
+
+    results = []
+    for stage in stages:
+        growth = peaks[stage][sizes[-1]] - peaks[stage][sizes[0]]
+        allowed = BUDGETS.get(stage, budget)
+        results.append({
+            'stage': stage,
+            'peak_mb': dict((str(size), peak) for size, peak in peaks[stage].items()),
+            'growth_mb': growth,
+            'budget_mb': allowed,
+            'ok': growth <= allowed,
+        })
+    return {'sizes': sizes, 'python': sys.version.split()[0], 'stages': results}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 5 and sys.argv[1] == '--child':
+        child(*sys.argv[2:])
+        sys.exit(0)
+
+    import bench_pipeline
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--stages', default=','.join(bench_pipeline.DEFAULT_STAGES),
+                        help='comma separated stages from bench_pipeline.py')
+    parser.add_argument('--sizes', default=','.join(str(n) for n in DEFAULT_SIZES),
+                        help='comma separated numbers of elements, smallest first')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help='allowed peak growth in MB (default %(default)s)')
+    parser.add_argument('--tmpdir', help='keep inputs and outputs here')
+    parser.add_argument('--out', help='save results to this JSON file')
+    args = parser.parse_args()
+
+    report = run(args.stages.split(','), [int(n) for n in args.sizes.split(',')],
+                 args.budget, args.tmpdir)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    failed = [s for s in report['stages'] if not s['ok']]
+    for s in report['stages']:
+        print('{0:<12} growth {1:7.1f} MB  budget {2:5.1f} MB  {3}'.format(
+            s['stage'], s['growth_mb'], s['budget_mb'], 'ok' if s['ok'] else 'FAIL'))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,358 @@
+# coding: utf-8
+
+"""Time each stage of the East Bay pipeline on one .osm file.
+
+Stages, in order:
+    parse        iterate over every top level element with get_element
+    extract      extract EXTRACT_BOX with complete ways, into the work directory
+    count_tags   ElementTree tag count (count_tags)
+    scan_tags    byte-level tag count (scan_tags)
+    scan_keys    byte-level key categories (scan_key_types)
+    key_types    ElementTree key categories (process_key_types)
+    amenities    process_amenities
+    zips         process_zips
+    users        process_users
+    streets      audit (street types)
+    cities       audit2 (city names)
+    corrections  suggest_mappings: one pass for the unexpected street types and cities,
+                 then the matching, whose seconds are in the result
+    approx       approx_stats: distinct counts and top values in fixed memory
+    shape        shape_element on every node and way
+    validate     schema check of every shaped element (needs cerberus + schema.py)
+    csv          process_map, writing the five csv files
+    csv_threads  the same with process_map(..., pipelined=True)
+    cli_export   python -m eastbay -C <dir> export, run from the repo root as the README
+                 does, then again to check that it is skipped as up to date
+    integrity    check_csv: way node references, duplicate ids and positions in the csv files
+    geometry     write_geometries: each way's WKT from the csv files by external sort,
+                 with a GEOMETRY_MB memory budget
+    graph        build_graph: CSR routing graph of the highway ways, and ROUTES A* queries
+    landmarks    add_landmarks to the graph stage's graph, and the same ROUTES queries
+    sqlite       create_db, loading the csv files
+    nearest      AmenityIndex: the 3 nearest of the commonest amenity to NEAREST_QUERIES nodes
+    addresses    build_address_table, then lookup_many of GEOCODE_QUERIES of its addresses
+    reports      the report queries from P3_EastBay_Map_Analysis.py (run_reports)
+    reports_serial  the same on one connection
+
+validate needs cerberus and schema.py, which are not part of the repo, so it
+is only run when asked for with --stages.
+
+Results are saved as JSON so runs can be compared:
+    python benchmarks/synthetic_osm.py /tmp/synth.osm --elements 100000
+    python benchmarks/bench_pipeline.py /tmp/synth.osm --out before.json
+    ...change something...
+    python benchmarks/bench_pipeline.py /tmp/synth.osm --out after.json
+    python benchmarks/bench_pipeline.py --compare before.json after.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from timeit import default_timer as timer
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import eastbay
+from eastbay.export import load_schema
+from eastbay.reports import WORKERS, run_reports
+from eastbay.extract import extract
+from eastbay.addresses import AddressIndex, build_address_table
+from eastbay.corrections import suggest_mappings
+from eastbay.geometry import write_geometries
+from eastbay.nearby import AmenityIndex
+from eastbay.routing import RoutingGraph, build_graph
+from eastbay.integrity import check_csv
+from eastbay.sketches import approx_stats
+
+DEFAULT_STAGES = ['parse', 'extract', 'count_tags', 'scan_tags', 'scan_keys', 'key_types', 'amenities',
+                  'zips', 'users', 'streets', 'cities', 'corrections', 'approx', 'shape', 'csv',
+                  'csv_threads', 'cli_export', 'integrity', 'geometry', 'graph', 'landmarks', 'sqlite',
+                  'nearest', 'addresses', 'reports', 'reports_serial']
+# Stages that need packages the pipeline itself does not (cerberus and schema.py)
+OPTIONAL_STAGES = ['validate']
+
+def stage_parse(osm_file, workdir):
+    n = 0
+    for _ in eastbay.get_element(osm_file):
+        n += 1
+    return n
+
+
+def stage_shape(osm_file, workdir):
+    n = 0
+    for element in eastbay.get_element(osm_file, tags=('node', 'way')):
+        if eastbay.shape_element(element):
+            n += 1
+    return n
+
+
+def stage_validate(osm_file, workdir):
+    """Time only the schema check; shaping time is left out of the total.
+
+    Invalid elements are counted instead of raised, so one bad postcode does
+    not end the run.
+    """
+    import cerberus
+
+    validator = cerberus.Validator()
+    schema = load_schema()
+    spent = 0.0
+    invalid = 0
+    for element in eastbay.get_element(osm_file, tags=('node', 'way')):
+        el = eastbay.shape_element(element)
+        if el:
+            start = timer()
+            if validator.validate(el, schema) is not True:
+                invalid += 1
+            spent += timer() - start
+    return {'seconds': spent, 'invalid': invalid}
+
+
+# About 5 x 4 km inside the synthetic_osm.py area
+EXTRACT_BOX = (37.80, -122.30, 37.85, -122.25)
+# Sort run budget of the geometry stage, small enough that larger inputs spill to disk
+GEOMETRY_MB = 8
+# Shortest path queries between random graph nodes in the graph stage
+ROUTES = 20
+# Query points of the nearest stage, taken from the nodes
+NEAREST_QUERIES = 50000
+# Addresses looked up in the addresses stage
+GEOCODE_QUERIES = 20000
+
+
+def stage_corrections(osm_file, workdir):
+    result = suggest_mappings(osm_file)
+    return {'distinct': result['distinct'], 'matching_seconds': result['seconds']}
+
+
+def stage_extract(osm_file, workdir):
+    return extract(osm_file, os.path.join(workdir, 'extract.osm'), bbox=EXTRACT_BOX,
+                   complete_ways=True)
+
+
+def stage_csv(osm_file, workdir, pipelined=False):
+    eastbay.process_map(osm_file, validate=False, pipelined=pipelined)
+    return dict((path, os.path.getsize(path)) for path in eastbay.CSV_PATHS)
+
+
+def stage_cli_export(osm_file, workdir):
+    """Export with the CLI into a subdirectory, from the repo root; the result is the csv sizes."""
+    outdir = os.path.join(workdir, 'cli')
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    command = [sys.executable, '-m', 'eastbay', '-C', outdir, 'export', osm_file]
+    for expected in ('running', 'up to date'):
+        out = subprocess.check_output(command, cwd=REPO, stderr=subprocess.STDOUT).decode('utf-8')
+        if expected not in out:
+            raise ValueError('cli_export: expected {0!r}, got {1!r}'.format(expected, out))
+    return dict((path, os.path.getsize(os.path.join(outdir, path))) for path in eastbay.CSV_PATHS)
+
+
+def stage_geometry(osm_file, workdir):
+    return write_geometries(os.path.join(workdir, 'way_geometries.csv'), memory_mb=GEOMETRY_MB,
+                            tmpdir=workdir)['ways']
+
+
+def random_routes(graph):
+    """Route between ROUTES pairs of random nodes, the same pairs for the same graph."""
+    rng = random.Random(0)
+    for _ in range(ROUTES if len(graph) else 0):
+        graph.route(graph.node_ids.item(rng.randrange(len(graph))),
+                    graph.node_ids.item(rng.randrange(len(graph))))
+
+
+def stage_graph(osm_file, workdir):
+    """Build the routing graph and route between random nodes; the result is the edge count."""
+    graph = build_graph()
+    graph.save(os.path.join(workdir, 'routing_graph.npz'))
+    random_routes(graph)
+    return graph.edges
+
+
+def stage_landmarks(osm_file, workdir):
+    """Add landmarks to the saved routing graph and take the same routes; the result is the landmarks."""
+    graph = RoutingGraph.load(os.path.join(workdir, 'routing_graph.npz'))
+    graph.add_landmarks()
+    random_routes(graph)
+    return len(graph.landmarks)
+
+
+def stage_sqlite(osm_file, workdir):
+    eastbay.create_db(eastbay.sqlite_file)
+    return os.path.getsize(eastbay.sqlite_file)
+
+
+def stage_nearest(osm_file, workdir):
+    """Index the amenities and shops and find the 3 nearest of the commonest class to many nodes."""
+    index = AmenityIndex.from_db(eastbay.sqlite_file)
+    classes = index.classes()
+    if not classes:
+        return 0
+    conn = sqlite3.connect(eastbay.sqlite_file)
+    try:
+        points = conn.execute('SELECT lat, lon FROM nodes LIMIT ?;', (NEAREST_QUERIES,)).fetchall()
+    finally:
+        conn.close()
+    node_class = max(sorted(classes), key=classes.get)
+    index.nearest(node_class, [p[0] for p in points], [p[1] for p in points], k=3)
+    return len(points)
+
+
+def stage_addresses(osm_file, workdir):
+    """Build the addresses table and look up some of its addresses; the result is the rows found."""
+    conn = sqlite3.connect(eastbay.sqlite_file)
+    try:
+        build_address_table(conn)
+        pairs = conn.execute('SELECT housenumber, street FROM addresses LIMIT ?;',
+                             (GEOCODE_QUERIES,)).fetchall()
+    finally:
+        conn.close()
+    index = AddressIndex(eastbay.sqlite_file)
+    try:
+        return sum(len(rows) for rows in index.lookup_many(pairs))
+    finally:
+        index.close()
+
+
+def stage_reports(osm_file, workdir, workers=WORKERS):
+    """Run every report; the result is the seconds of each one."""
+    report = run_reports(eastbay.sqlite_file, workers=workers)
+    return dict((name, r['seconds']) for name, r in report['reports'].items())
+
+
+STAGES = {
+    'parse': stage_parse,
+    'extract': stage_extract,
+    'count_tags': lambda osm_file, workdir: eastbay.count_tags(osm_file),
+    'scan_tags': lambda osm_file, workdir: eastbay.scan_tags(osm_file),
+    'scan_keys': lambda osm_file, workdir: eastbay.scan_key_types(osm_file),
+    'key_types': lambda osm_file, workdir: eastbay.process_key_types(osm_file),
+    'amenities': lambda osm_file, workdir: eastbay.process_amenities(osm_file)[0],
+    'zips': lambda osm_file, workdir: eastbay.process_zips(osm_file)[0],
+    'users': lambda osm_file, workdir: len(eastbay.process_users(osm_file)),
+    'streets': lambda osm_file, workdir: len(eastbay.audit(osm_file)),
+    'cities': lambda osm_file, workdir: len(eastbay.audit2(osm_file)),
+    'corrections': stage_corrections,
+    'approx': lambda osm_file, workdir: approx_stats(osm_file)['unique_users']['estimate'],
+    'shape': stage_shape,
+    'validate': stage_validate,
+    'csv': stage_csv,
+    'csv_threads': lambda osm_file, workdir: stage_csv(osm_file, workdir, pipelined=True),
+    'cli_export': stage_cli_export,
+    'integrity': lambda osm_file, workdir: check_csv()['ok'],
+    'geometry': stage_geometry,
+    'graph': stage_graph,
+    'landmarks': stage_landmarks,
+    'sqlite': stage_sqlite,
+    'nearest': stage_nearest,
+    'addresses': stage_addresses,
+    'reports': stage_reports,
+    'reports_serial': lambda osm_file, workdir: stage_reports(osm_file, workdir, workers=1),
+}
+
+
+def run(osm_file, stages=DEFAULT_STAGES, workdir=None):
+    """Run the given stages on osm_file and return the results as a dictionary.
+
+    The csv, sqlite and reports stages write their files in workdir (a temporary
+    directory by default), since the pipeline uses paths relative to the current
+    directory.
+
+    Args:
+        osm_file (string): name of .osm file
+        stages (list): names of stages to run, in order
+        workdir (string): directory for csv and database files
+
+    Returns:
+        dictionary with the input description and per-stage seconds,
+        elements/sec, MB/sec and the stage's own result
+    """
+    osm_file = os.path.abspath(osm_file)
+    size = os.path.getsize(osm_file)
+    cleanup = workdir is None
+    workdir = os.path.abspath(workdir or tempfile.mkdtemp(prefix='eastbay_bench_'))
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    elements = None
+    results = []
+    try:
+        for name in stages:
+            start = timer()
+            result = STAGES[name](osm_file, workdir)
+            seconds = timer() - start
+            if name == 'parse':
+                elements = result
+            if name == 'validate':
+                seconds = result['seconds']
+            results.append({
+                'stage': name,
+                'seconds': seconds,
+                'elements_per_sec': elements / seconds if elements and seconds else None,
+                'mb_per_sec': size / 1e6 / seconds if seconds else None,
+                'result': result,
+            })
+            sys.stderr.write('{0:<12} {1:10.3f} s\n'.format(name, seconds))
+    finally:
+        os.chdir(cwd)
+        if cleanup:
+            shutil.rmtree(workdir)
+    return {
+        'input': osm_file,
+        'bytes': size,
+        'elements': elements,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'stages': results,
+    }
+
+
+def compare(before, after):
+    """Return a text table comparing the stage times of two saved runs."""
+    old = dict((s['stage'], s['seconds']) for s in before['stages'])
+    lines = ['{0:<12} {1:>10} {2:>10} {3:>8}'.format('stage', 'before', 'after', 'speedup')]
+    for s in after['stages']:
+        if s['stage'] in old:
+            lines.append('{0:<12} {1:10.3f} {2:10.3f} {3:7.2f}x'.format(
+                s['stage'], old[s['stage']], s['seconds'],
+                old[s['stage']] / s['seconds'] if s['seconds'] else float('inf')))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('osm_file', nargs='?', help='.osm file to process')
+    parser.add_argument('--stages', default=','.join(DEFAULT_STAGES),
+                        help='comma separated stages; also: ' + ', '.join(OPTIONAL_STAGES))
+    parser.add_argument('--workdir', help='keep csv and database files here')
+    parser.add_argument('--out', help='save results to this JSON file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='compare two saved JSON results')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            before = json.load(f)
+        with open(args.compare[1]) as f:
+            after = json.load(f)
+        print(compare(before, after))
+    else:
+        if not args.osm_file:
+            parser.error('osm_file is required unless --compare is given')
+        report = run(args.osm_file, args.stages.split(','), args.workdir)
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+        else:
+            print(json.dumps(report, indent=2, sort_keys=True))
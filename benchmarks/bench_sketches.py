@@ -0,0 +1,130 @@
+# coding: utf-8
+
+"""Check approx_stats (eastbay/sketches.py) against exact counts.
+
+Each .osm file is read twice: once counting every distinct value exactly with
+sets and Counters, once with approx_stats. A file fails when
+
+    a distinct count (users, tag keys, key=value pairs) is off by more than
+        SIGMAS standard errors, or
+    a frequent value's count is below its true count, or more than its
+        overestimate or max_error above it.
+
+Recall is the fraction of the exact top values (amenities, postcodes, cities)
+that are in the approximate top; it is reported, not checked, since values
+with close counts may swap places. The exit status is 1 if any file fails.
+
+Usage:
+    python benchmarks/bench_sketches.py
+    python benchmarks/bench_sketches.py /tmp/synth.osm --frequency-error 0.01 --out sketches.json
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from timeit import default_timer as timer
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from eastbay.osm import iterparse_clear
+from eastbay.sketches import (DISTINCT_ERROR, FREQUENCY_ERROR, FREQUENT_KEYS, TOP,
+                              approx_stats)
+
+SAMPLES = [os.path.join(REPO, 'eastbay_samp3.osm')]
+SIGMAS = 3
+
+
+def exact_stats(filename):
+    """Return the exact distinct sets and value Counters approx_stats estimates."""
+    distinct = {'unique_users': set(), 'tag_keys': set(), 'tag_values': set()}
+    frequent = dict((name, Counter()) for name, _ in FREQUENT_KEYS)
+    by_key = dict((key, frequent[name]) for name, key in FREQUENT_KEYS)
+    for _, element in iterparse_clear(filename):
+        if element.tag == 'tag':
+            k = element.attrib['k']
+            v = element.attrib['v']
+            distinct['tag_keys'].add(k)
+            distinct['tag_values'].add(k + u'=' + v)
+            if k in by_key:
+                by_key[k][v] += 1
+        elif 'uid' in element.attrib:
+            distinct['unique_users'].add(element.attrib['uid'])
+    return distinct, frequent
+
+
+def check(filename, distinct_error=DISTINCT_ERROR, frequency_error=FREQUENCY_ERROR, top=TOP):
+    """Compare approx_stats with the exact counts of one file.
+
+    Returns:
+        dictionary with the seconds of each method, the exact and estimated
+        values, and 'failures', a list of messages (empty if the file passes)
+    """
+    start = timer()
+    distinct, frequent = exact_stats(filename)
+    exact_seconds = timer() - start
+    start = timer()
+    stats = approx_stats(filename, distinct_error, frequency_error, top)
+    approx_seconds = timer() - start
+
+    failures = []
+    result = {'file': filename, 'exact_seconds': exact_seconds,
+              'approx_seconds': approx_seconds, 'distinct': {}, 'frequent': {}}
+    for name, values in distinct.items():
+        exact = len(values)
+        estimate = stats[name]['estimate']
+        relative = abs(estimate - exact) / float(exact) if exact else float(estimate)
+        result['distinct'][name] = {'exact': exact, 'estimate': estimate, 'relative_error': relative}
+        if relative > SIGMAS * stats[name]['std_error']:
+            failures.append('{0}: {1} estimated as {2}'.format(name, exact, estimate))
+    for name, counts in frequent.items():
+        found = stats[name]['top']
+        for value, count, over in found:
+            true = counts[value]
+            if not count - over <= true <= count or count - true > stats[name]['max_error']:
+                failures.append('{0}: {1!r} counted {2} (+{3}), true count {4}'.format(
+                    name, value, count, over, true))
+        expected = [value for value, _ in counts.most_common(top)]
+        reported = set(value for value, _, _ in found)
+        recall = (sum(1 for value in expected if value in reported) / float(len(expected))
+                  if expected else 1.0)
+        result['frequent'][name] = {'total': sum(counts.values()), 'distinct': len(counts),
+                                    'max_error': stats[name]['max_error'], 'recall': recall}
+    result['failures'] = failures
+    return result
+
+
+def table(results):
+    """Return a text table of the exact and estimated values of each file."""
+    lines = []
+    for result in results:
+        lines.append('{0}  exact {1:.2f} s, approx {2:.2f} s'.format(
+            os.path.basename(result['file']), result['exact_seconds'], result['approx_seconds']))
+        for name, d in sorted(result['distinct'].items()):
+            lines.append('  {0:<14} {1:>10} {2:>10} {3:8.2%}'.format(
+                name, d['exact'], d['estimate'], d['relative_error']))
+        for name, f in sorted(result['frequent'].items()):
+            lines.append('  {0:<14} {1:>10} tags {2:>8} values  max_error {3:<6} recall {4:.0%}'.format(
+                name, f['total'], f['distinct'], f['max_error'], f['recall']))
+        lines.extend('  FAIL ' + failure for failure in result['failures'])
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('osm_files', nargs='*', default=SAMPLES,
+                        help='.osm files to check (default: eastbay_samp3.osm)')
+    parser.add_argument('--distinct-error', type=float, default=DISTINCT_ERROR)
+    parser.add_argument('--frequency-error', type=float, default=FREQUENCY_ERROR)
+    parser.add_argument('--top', type=int, default=TOP)
+    parser.add_argument('--out', help='save results to this JSON file')
+    args = parser.parse_args()
+
+    results = [check(f, args.distinct_error, args.frequency_error, args.top) for f in args.osm_files]
+    print(table(results))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    sys.exit(1 if any(result['failures'] for result in results) else 0)
@@ -0,0 +1,228 @@
+# coding: utf-8
+
+"""Write a synthetic East Bay .osm file of any size for benchmarking.
+
+The tag mix follows what the audits found in eastbay.osm: addr:street values
+with the street type variants fixed by 'mapping', addr:city values with the
+typos fixed by 'city_mapping', postcodes in every format clean_zip handles,
+amenities (restaurants with cuisines, bicycle parking with capacity), shops,
+solar generators, and ways with 'nd' lists that point at earlier nodes.
+
+Elements are written as they are generated, so memory use does not depend on
+the number of elements.
+
+Usage:
+    python benchmarks/synthetic_osm.py eastbay_synth.osm --elements 1000000
+"""
+
+import argparse
+import random
+from xml.sax.saxutils import quoteattr
+
+# East Bay bounding box (south, west, north, east)
+BBOX = (37.70, -122.35, 37.95, -122.10)
+
+STREET_NAMES = ["Telegraph", "Shattuck", "College", "Broadway", "Grand", "Lakeshore",
+                "San Pablo", "University", "Ashby", "MacArthur", "Piedmont", "Solano",
+                "Park", "Webster", "Harrison", "Alcatraz", "Claremont", "Fruitvale"]
+# Mostly expected types, plus every variant listed in 'mapping'
+STREET_TYPES = (["Street"] * 20 + ["Avenue"] * 20 + ["Boulevard"] * 5 + ["Way"] * 5 +
+                ["Drive", "Court", "Place", "Lane", "Road", "Circle", "Plaza"] * 2 +
+                ["St", "St.", "street", "st", "Ave", "Rd.", "Rd", "AVE", "Ave.", "Aveenue",
+                 "Avenie", "Blvd", "Blvd.", "blvd", "Ct", "Ctr", "Dr", "Dr.", "Ln.", "square", "Pl"])
+SPECIAL_STREETS = ["Washington St 2nd Floor:", "Telegraph", "San Francisco/Oakland Bridge Toll Pl"]
+
+# Mostly expected cities, plus every variant listed in 'city_mapping'
+CITIES = (["Oakland"] * 30 + ["Berkeley"] * 20 + ["Alameda"] * 8 + ["Richmond"] * 5 +
+          ["Albany", "El Cerrito", "San Leandro", "Emeryville", "Piedmont", "Orinda"] * 2 +
+          ["Alamda", "alameda", "Berkeley, CA", "berkeley", "Oakland ", "oakland", "Oakland CA",
+           "Oakland, CA", "Oakland, Ca", "Okaland", "OAKLAND", "Emeyville"])
+
+ZIPS = ["94601", "94602", "94603", "94605", "94606", "94607", "94609", "94610", "94611",
+        "94612", "94618", "94619", "94702", "94703", "94704", "94705", "94707", "94709",
+        "94710", "94501", "94530", "94577", "94608"]
+
+AMENITIES = (["restaurant"] * 10 + ["bicycle_parking"] * 8 + ["cafe"] * 5 + ["school"] * 4 +
+             ["parking", "bench", "fast_food", "bank", "place_of_worship", "post_box",
+              "toilets", "drinking_water", "pharmacy", "bar", "library", "fuel"])
+CUISINES = (["mexican"] * 6 + ["pizza"] * 5 + ["chinese"] * 5 + ["thai"] * 4 + ["japanese"] * 3 +
+            ["italian", "indian", "american", "vietnamese", "korean", "ethiopian", "burger"])
+SHOPS = (["convenience"] * 5 + ["supermarket"] * 3 + ["hairdresser"] * 3 + ["clothes"] * 2 +
+         ["bakery", "car_repair", "bicycle", "books", "laundry", "alcohol", "florist"])
+HIGHWAYS = (["residential"] * 10 + ["service"] * 5 + ["footway"] * 4 +
+            ["tertiary", "secondary", "primary", "cycleway", "path", "track"])
+# Keys that land in the "other" and "problemchars" categories of key_type
+ODD_KEYS = ["FIXME", "name_1", "Note", "addr:street:name", "bad key", "note.1"]
+
+
+def zipcode(rnd):
+    """Return a postcode in one of the formats found in the East Bay data."""
+    z = rnd.choice(ZIPS)
+    r = rnd.random()
+    if r < 0.85:
+        return z
+    if r < 0.90:
+        return z + "-" + "%04d" % rnd.randint(0, 9999)
+    if r < 0.94:
+        return "CA " + z
+    if r < 0.97:
+        return "ca" + z
+    return z[:4]  # too short, rejected by clean_zip
+
+
+def street(rnd):
+    """Return an addr:street value."""
+    if rnd.random() < 0.01:
+        return rnd.choice(SPECIAL_STREETS)
+    return rnd.choice(STREET_NAMES) + " " + rnd.choice(STREET_TYPES)
+
+
+def address_tags(rnd):
+    """Return a list of addr:* (k, v) pairs; not every address has every part."""
+    tags = [("addr:housenumber", str(rnd.randint(1, 9999))), ("addr:street", street(rnd))]
+    if rnd.random() < 0.7:
+        tags.append(("addr:city", rnd.choice(CITIES)))
+    if rnd.random() < 0.8:
+        tags.append(("addr:postcode", zipcode(rnd)))
+    return tags
+
+
+def node_tags(rnd):
+    """Return the (k, v) pairs for one node; most nodes have none."""
+    r = rnd.random()
+    if r < 0.80:
+        return []
+    tags = []
+    if r < 0.88:
+        amenity = rnd.choice(AMENITIES)
+        tags.append(("amenity", amenity))
+        if amenity == "restaurant":
+            tags.append(("cuisine", rnd.choice(CUISINES)))
+        elif amenity == "bicycle_parking":
+            tags.append(("capacity", str(rnd.choice([2, 2, 4, 4, 6, 8, 10, 12, 20, 268]))))
+        tags.append(("name", rnd.choice(STREET_NAMES) + " " + amenity.replace("_", " ").title()))
+        if rnd.random() < 0.5:
+            tags.extend(address_tags(rnd))
+    elif r < 0.92:
+        tags.append(("shop", rnd.choice(SHOPS)))
+        tags.extend(address_tags(rnd))
+    elif r < 0.94:
+        tags.extend([("power", "generator"), ("generator:source", "solar"),
+                     ("generator:place", "roof"), ("source", "solar")])
+    elif r < 0.98:
+        tags.extend(address_tags(rnd))
+    else:
+        tags.append(("created_by", "JOSM"))
+    if rnd.random() < 0.01:
+        tags.append((rnd.choice(ODD_KEYS), "x"))
+    return tags
+
+
+def way_tags(rnd):
+    """Return the (k, v) pairs for one way."""
+    r = rnd.random()
+    if r < 0.6:
+        tags = [("highway", rnd.choice(HIGHWAYS)), ("name", street(rnd))]
+        if rnd.random() < 0.3:
+            tags.append(("tiger:county", "Alameda, CA"))
+        return tags
+    if r < 0.9:
+        tags = [("building", "yes")]
+        if rnd.random() < 0.4:
+            tags.extend(address_tags(rnd))
+        return tags
+    return [("landuse", rnd.choice(["residential", "grass", "retail", "industrial"]))]
+
+
+class Users(object):
+    """Skewed pool of contributors: a few users make most edits, as in the real data."""
+
+    def __init__(self, rnd, count=1000):
+        self.rnd = rnd
+        self.users = [(str(1000 + 37 * i), "mapper%d" % i) for i in range(count)]
+
+    def pick(self):
+        # paretovariate gives a long tail; clamp into the pool
+        i = int(self.rnd.paretovariate(1.2)) - 1
+        return self.users[min(i, len(self.users) - 1)]
+
+
+def attrs(rnd, users, element_id):
+    """Return the attribute string shared by nodes and ways."""
+    uid, user = users.pick()
+    version = rnd.randint(1, 12)
+    changeset = rnd.randint(100000, 43000000)
+    timestamp = "%04d-%02d-%02dT%02d:%02d:%02dZ" % (
+        rnd.randint(2007, 2016), rnd.randint(1, 12), rnd.randint(1, 28),
+        rnd.randint(0, 23), rnd.randint(0, 59), rnd.randint(0, 59))
+    if rnd.random() < 0.001:
+        # Anonymous edit: no user/uid, which shape_element fills with MISSING ("99999999")
+        return 'changeset="%d" id="%d" timestamp="%s" version="%d"' % (
+            changeset, element_id, timestamp, version)
+    return 'changeset="%d" id="%d" timestamp="%s" uid="%s" user=%s version="%d"' % (
+        changeset, element_id, timestamp, uid, quoteattr(user), version)
+
+
+def write_tags(out, tags):
+    for k, v in tags:
+        out.write('\t\t<tag k=%s v=%s />\n' % (quoteattr(k), quoteattr(v)))
+
+
+def generate(path, elements, seed=0, way_share=0.12):
+    """Write a synthetic .osm file.
+
+    Args:
+        path (string): name of .osm file to write
+        elements (int): total number of top level elements (nodes + ways)
+        seed (int): random seed; the same seed gives the same file
+            on the same Python version
+        way_share (float): share of elements that are ways
+
+    Returns:
+        dictionary with the number of nodes and ways written
+    """
+    rnd = random.Random(seed)
+    users = Users(rnd)
+    n_ways = int(elements * way_share)
+    n_nodes = elements - n_ways
+    south, west, north, east = BBOX
+    node_ids = 26819224
+    with open(path, 'w') as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        out.write('<osm version="0.6" generator="synthetic_osm.py">\n')
+        out.write('\t<bounds minlat="%s" minlon="%s" maxlat="%s" maxlon="%s"/>\n' % BBOX)
+        for i in range(n_nodes):
+            node_id = node_ids + i * 3
+            lat = rnd.uniform(south, north)
+            lon = rnd.uniform(west, east)
+            tags = node_tags(rnd)
+            out.write('\t<node %s lat="%.7f" lon="%.7f"' % (attrs(rnd, users, node_id), lat, lon))
+            if tags:
+                out.write('>\n')
+                write_tags(out, tags)
+                out.write('\t</node>\n')
+            else:
+                out.write(' />\n')
+        way_id = 4000000
+        for i in range(n_ways):
+            # Ways are runs of nearby node ids, so nodes are shared like in real streets
+            length = rnd.randint(2, 20)
+            first = rnd.randint(0, max(n_nodes - length, 0))
+            out.write('\t<way %s>\n' % attrs(rnd, users, way_id + i * 7))
+            for j in range(first, min(first + length, n_nodes)):
+                out.write('\t\t<nd ref="%d" />\n' % (node_ids + j * 3))
+            write_tags(out, way_tags(rnd))
+            out.write('\t</way>\n')
+        out.write('</osm>\n')
+    return {'nodes': n_nodes, 'ways': n_ways}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('path', help='.osm file to write')
+    parser.add_argument('--elements', type=int, default=10000,
+                        help='number of nodes + ways (default 10000)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--way-share', type=float, default=0.12)
+    args = parser.parse_args()
+    print(generate(args.path, args.elements, args.seed, args.way_share))
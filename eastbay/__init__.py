@@ -0,0 +1,47 @@
+# coding: utf-8
+
+"""Audit, clean and export the East Bay OpenStreetMap data.
+
+Importing the package does no work: nothing is parsed, written or queried until
+a function is called. Only the standard library is imported up front; cerberus
+and schema.py are imported when an export is validated, and pandas, seaborn and
+matplotlib when a plot is made (see benchmarks/bench_import.py).
+
+Modules:
+    osm         get_element, iterparse_clear, create_sample
+    extract     extract: bounding box or polygon clip with the ways that cross it
+    audits      count_tags, process_key_types, process_amenities, process_zips,
+                process_users, audit (street types), audit2 (city names)
+    sketches    approx_stats: HyperLogLog and SpaceSaving audits in fixed memory
+    scan        byte-level scan_tags and scan_key_types
+    corrections suggest_mappings: mapping entries matched to expected by edit distance (BK-tree)
+    clean       clean_st_name, clean_city_name, clean_zip, clean_zip1 and their mappings
+    export      shape_element, validate_element, process_map (csv files)
+    metrics     ExportMetrics for process_map
+    integrity   IntegrityCheck for process_map, check_csv: dangling way nodes, duplicate ids
+    geometry    way_geometries, write_geometries: way coordinates by external sort, bounded memory
+    checkpoint  ExportCheckpoint for process_map
+    database    create_db (eastbay.db from the csv files) and its layout options
+    reports     REPORTS (ReportSpec), run_reports (concurrent), plot_freq_query
+    search      TagSearch: full-text search of tag values (create_db(search=True))
+    routing     build_graph, RoutingGraph: CSR graph of the highway ways, A* and one-to-many
+    nearby      AmenityIndex: k nearest amenities or shops of a kind to many points at once
+    addresses   AddressIndex: geocode street addresses from the addr tags (create_db(addresses=True))
+    tiles       tile_counts: nodes per map tile and zoom (create_db(tiles=True)), density_grid
+    cache       QueryCache: query results kept until the database changes
+    profiling   QueryProfiler: time, rows and query plan of each report, slowest first
+    cli         python -m eastbay: one subcommand per stage, skipping up to date stages
+"""
+
+from eastbay.osm import get_element, iterparse_clear, create_sample
+from eastbay.audits import (count_tags, key_type, process_key_types, process_amenities,
+                            process_zips, process_users, audit, audit2)
+from eastbay.scan import scan_tags, scan_keys, scan_key_types
+from eastbay.clean import (clean_st_name, clean_city_name, clean_zip, clean_zip1,
+                           mapping, special_map, city_mapping)
+from eastbay.export import (shape_element, validate_element, process_map, CSV_PATHS,
+                            NODES_PATH, NODE_TAGS_PATH, WAYS_PATH, WAY_NODES_PATH, WAY_TAGS_PATH)
+from eastbay.metrics import ExportMetrics
+from eastbay.checkpoint import ExportCheckpoint
+from eastbay.database import create_db, sqlite_file
+from eastbay.reports import plot_freq_query
@@ -0,0 +1,9 @@
+# coding: utf-8
+
+"""python -m eastbay: see eastbay/cli.py."""
+
+import sys
+
+from eastbay.cli import main
+
+sys.exit(main())
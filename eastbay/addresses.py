@@ -0,0 +1,231 @@
+# coding: utf-8
+
+"""Address lookup: one row per addressed node or way, indexed by normalized street and number.
+
+shape_element stores each addr:* tag as its own nodes_tags or ways_tags row
+(type 'addr'), so finding '2020 Telegraph Avenue' takes a self-join per field.
+create_db(addresses=True) pivots them once into
+
+    addresses(street_key, number_key, housenumber, street, city, postcode,
+              element, id, lat, lon)      indexed on (street_key, number_key)
+
+for every node and way with an addr:street; a way's lat and lon are the mean
+of its nodes'. The keys are normalized the same way for the table and for
+queries: lower case, accents and punctuation removed, a final street type
+abbreviation expanded with the cleaning mapping ('Telegraph Ave.' ->
+'telegraph avenue') and spaces removed from house numbers ('12 B' -> '12b').
+
+    index = AddressIndex('eastbay.db')
+    index.geocode('2020 Telegraph Ave, Berkeley 94704')   # best row or None
+    index.lookup('2020', 'Telegraph Avenue')              # one index probe
+    index.lookup_many([('2020', 'Telegraph Ave'), ...])   # batches of BATCH keys
+    index.prefix('telegr', limit=10)                      # streets starting with...
+"""
+
+import re
+import unicodedata
+from itertools import islice
+
+from eastbay.clean import mapping
+from eastbay.reports import connect_read_only
+
+ADDRESS_KEYS = ('housenumber', 'street', 'city', 'postcode')
+COLUMNS = ('street_key', 'number_key', 'housenumber', 'street', 'city', 'postcode',
+           'element', 'id', 'lat', 'lon')
+ADDRESSES_SQL = '''CREATE TABLE addresses(
+    street_key TEXT, number_key TEXT, housenumber TEXT, street TEXT, city TEXT, postcode TEXT,
+    element TEXT, id INTEGER, lat REAL, lon REAL)'''
+# Lookup pairs per query of lookup_many (two parameters each; older sqlite allows 999)
+BATCH = 400
+LIMIT = 20
+
+WORD = re.compile(r'\w+', re.UNICODE)
+POSTCODE = re.compile(r'\b\d{5}\b')
+# Final street type abbreviations, as clean_st_name expands them: 'ave' -> 'avenue'
+STREET_TYPES = dict((short.lower().rstrip('.'), full.lower()) for short, full in mapping.items())
+
+
+def pivot_sql(table):
+    """SELECT the addr tags of each element with a street in a tag table as one row."""
+    return """SELECT id, {0}
+FROM {1} WHERE type = 'addr' AND key IN ({2})
+GROUP BY id HAVING street IS NOT NULL""".format(
+        ', '.join("MAX(CASE key WHEN '{0}' THEN value END) AS {0}".format(key)
+                  for key in ADDRESS_KEYS),
+        table, ', '.join("'{0}'".format(key) for key in ADDRESS_KEYS))
+
+
+NODE_ADDRESSES_SQL = """SELECT a.*, n.lat, n.lon FROM ({0}) a JOIN nodes n ON n.id = a.id""".format(
+    pivot_sql('nodes_tags'))
+# A way's position is the mean of its nodes'
+WAY_ADDRESSES_SQL = """SELECT a.*, c.lat, c.lon FROM ({0}) a LEFT JOIN (
+    SELECT wn.id, AVG(n.lat) AS lat, AVG(n.lon) AS lon
+    FROM ways_nodes wn JOIN nodes n ON n.id = wn.node_id
+    WHERE wn.id IN (SELECT id FROM ways_tags WHERE type = 'addr' AND key = 'street')
+    GROUP BY wn.id) c ON c.id = a.id""".format(pivot_sql('ways_tags'))
+
+
+def fold(text):
+    """Lower case words of a string, without accents: u'Caf\\xe9 St.' -> [u'cafe', u'st']."""
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+    text = unicodedata.normalize('NFKD', text)
+    return WORD.findall(u''.join(c for c in text if not unicodedata.combining(c)).lower())
+
+
+def street_key(street):
+    """'Telegraph Ave.' -> 'telegraph avenue'"""
+    words = fold(street or u'')
+    if words and words[-1] in STREET_TYPES:
+        words[-1] = STREET_TYPES[words[-1]]
+    return u' '.join(words)
+
+
+def number_key(housenumber):
+    """'12 B' -> '12b'"""
+    return u''.join(fold(housenumber or u''))
+
+
+def parse_address(text):
+    """Split a one line address into (housenumber, street, city, postcode); missing parts are None.
+
+    '2020 Telegraph Ave, Berkeley, CA 94704' -> ('2020', 'Telegraph Ave', 'Berkeley', '94704')
+    """
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+    parts = [part.strip() for part in text.split(u',') if part.strip()]
+    housenumber = street = city = postcode = None
+    if parts:
+        first = parts.pop(0)
+        words = first.split()
+        if len(words) > 1 and any(c.isdigit() for c in words[0]):
+            housenumber, street = words[0], u' '.join(words[1:])
+        else:
+            street = first
+    for part in parts:
+        match = POSTCODE.search(part)
+        if match:
+            postcode = match.group()
+            part = (part[:match.start()] + part[match.end():]).strip()
+        # Drop a state after the city ('Berkeley CA')
+        words = [word for word in part.split() if word.upper() != u'CA']
+        if words and city is None:
+            city = u' '.join(words)
+    return housenumber, street, city, postcode
+
+
+def drop_address_table(conn):
+    """Drop the addresses table, if any."""
+    conn.execute('DROP TABLE IF EXISTS addresses;')
+    conn.commit()
+
+
+def build_address_table(conn, scale=1):
+    """Drop and rebuild the addresses table from the addr tags of nodes and ways.
+
+    Args:
+        conn (sqlite3 connection): connection to the database
+        scale (int, defaults to 1): units per degree of nodes.lat and lon; COORD_SCALE
+            for a database created with typed=True
+    """
+    drop_address_table(conn)
+    # The keys are computed by sqlite as it inserts, so no rows are held in Python
+    conn.create_function('street_key', 1, street_key)
+    conn.create_function('number_key', 1, number_key)
+    cur = conn.cursor()
+    cur.execute(ADDRESSES_SQL)
+    scale = float(scale)
+    for element, sql in (('node', NODE_ADDRESSES_SQL), ('way', WAY_ADDRESSES_SQL)):
+        cur.execute('''INSERT INTO addresses
+SELECT street_key(street), number_key(housenumber), housenumber, street, city, postcode,
+    ?, id, lat / ?, lon / ? FROM ({0});'''.format(sql), (element, scale, scale))
+    cur.execute('CREATE INDEX addresses_key ON addresses(street_key, number_key);')
+    conn.commit()
+
+
+class AddressIndex(object):
+    """Queries on the addresses table of a database built with create_db(addresses=True)."""
+
+    def __init__(self, sqlite_file):
+        self.conn = connect_read_only(sqlite_file)
+
+    def close(self):
+        self.conn.close()
+
+    def rows(self, cursor):
+        return [dict(zip(COLUMNS, row)) for row in cursor]
+
+    def lookup(self, housenumber, street, city=None, postcode=None):
+        """Return the addresses with this number and street, from one probe of the index.
+
+        city and postcode, if given, leave out rows that have a different one.
+        """
+        rows = self.rows(self.conn.execute(
+            'SELECT * FROM addresses WHERE street_key = ? AND number_key = ?;',
+            (street_key(street), number_key(housenumber))))
+        return [row for row in rows if matches(row, city, postcode)]
+
+    def geocode(self, text):
+        """Return the address row best matching a one line address, or None."""
+        housenumber, street, city, postcode = parse_address(text)
+        if street is None:
+            return None
+        rows = self.lookup(housenumber, street, city, postcode)
+        return rows[0] if rows else None
+
+    def lookup_many(self, addresses):
+        """Look up many (housenumber, street) pairs, BATCH per query.
+
+        Pairs are read and answered a batch at a time, so only one batch of rows
+        is held however many pairs are given.
+
+        Yields:
+            for each pair, in order, the list of its address rows
+        """
+        addresses = iter(addresses)
+        while True:
+            keys = [(street_key(street), number_key(housenumber))
+                    for housenumber, street in islice(addresses, BATCH)]
+            if not keys:
+                return
+            unique = sorted(set(keys))
+            # Joined rather than 'IN (VALUES ...)', which sqlite answers with a table scan
+            sql = '''SELECT a.* FROM (VALUES {0}) v JOIN addresses a
+ON a.street_key = v.column1 AND a.number_key = v.column2;'''.format(', '.join(['(?, ?)'] * len(unique)))
+            found = {}
+            for row in self.rows(self.conn.execute(sql, [value for key in unique for value in key])):
+                found.setdefault((row['street_key'], row['number_key']), []).append(row)
+            for key in keys:
+                yield found.get(key, [])
+
+    def geocode_many(self, texts):
+        """geocode for many one line addresses, looked up together."""
+        parsed = [parse_address(text) for text in texts]
+        results = self.lookup_many((housenumber, street or u'')
+                                   for housenumber, street, _, _ in parsed)
+        best = []
+        for i, rows in enumerate(results):
+            _, street, city, postcode = parsed[i]
+            rows = [row for row in rows if street is not None and matches(row, city, postcode)]
+            best.append(rows[0] if rows else None)
+        return best
+
+    def prefix(self, text, housenumber=None, limit=LIMIT):
+        """Return addresses whose normalized street starts with text, in street and number order."""
+        start = u' '.join(fold(text))
+        sql = 'SELECT * FROM addresses WHERE street_key >= ? AND street_key < ?'
+        params = [start, start + u'\uffff']
+        if housenumber is not None:
+            sql += ' AND number_key = ?'
+            params.append(number_key(housenumber))
+        sql += ' ORDER BY street_key, number_key LIMIT ?;'
+        return self.rows(self.conn.execute(sql, params + [limit]))
+
+
+def matches(row, city=None, postcode=None):
+    """False if the row has a city or postcode that differs from a given one."""
+    if city and row['city'] and fold(row['city']) != fold(city):
+        return False
+    if postcode and row['postcode'] and row['postcode'] != postcode:
+        return False
+    return True
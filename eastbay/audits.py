@@ -0,0 +1,349 @@
+# coding: utf-8
+
+"""Audits of the .osm file: tag and key counts, amenities, postcodes, users,
+street types and city names."""
+
+import re
+from collections import Counter, defaultdict
+
+from eastbay.clean import street_type_re
+from eastbay.osm import get_element, iterparse_clear
+
+
+def count_tags(filename):
+    """Return dictionary with tag name as key and 
+    number of times this tag can be encountered in map
+    as value.
+    
+    Use to process map file and find out what tags there
+    are and how many of each.
+    
+    Args:
+        filename (string): name of .osm file that is reviewed
+        
+    Returns:
+        dictionary with tags as keys, number of cases as value
+    """
+
+    tag_dict = {}
+    for event, elem in iterparse_clear(filename):
+        if elem.tag:
+            tag_dict[elem.tag] = tag_dict.get(elem.tag, 0) + 1
+
+    return tag_dict
+
+
+"""Check the "k" value for each "<tag>" and see if there are any potential problems.
+
+Use 3 regular expressions below to check for certain patterns
+in the tags. I will change the data model and expand the 
+"addr:street" type of keys to a dictionary like this:
+{"address": {"street": "Some value"}}
+So, I have to see if I have such tags, and if I have any tags with
+problematic characters.
+
+Reference: https://discussions.udacity.com/t/quiz-tag-types/170228/2
+"""
+
+lower = re.compile(r'^([a-z]|_)*$')
+lower_colon = re.compile(r'^([a-z]|_)*:([a-z]|_)*$')
+problemchars = re.compile(r'[=\+/&<>;\'"\?%#$@\,\. \t\r\n]')
+
+def key_type(element, keys):
+    """Return a count of each of four tag categories in a dictionary:
+    
+    "lower", for tags that contain only lowercase letters and are valid,
+    "lower_colon", for otherwise valid tags with a colon in their names,
+    "problemchars", for tags with problematic characters, and
+    "other", for other tags that do not fall into the other three categories.
+      
+    Function is only used as helper function within process_key_types function below.
+      
+    Args:
+        element (string): element from .osm file.
+        keys (dictionary): dictionary of keys and number of cases.
+          
+    Returns:
+        keys (dictionary): updated dictionary.
+    """
+    if element.tag == "tag":
+        k =  element.attrib['k']
+        #print k
+        if re.search(lower, k):
+            keys["lower"] += 1
+        elif re.search(lower_colon, k):
+            keys['lower_colon'] += 1
+        elif re.search(problemchars, k):
+            keys['problemchars'] += 1
+        else:
+            keys['other'] += 1      
+        pass    
+  
+    return keys
+
+def process_key_types(filename):
+    """Return a count of each of four tag categories in a dictionary
+    for specified osm file.
+    
+    Args:
+        filename (string): name of .osm file that will be parsed
+    
+    Returns:
+        keys (dictionary): dictionary of character types and number of cases in .osm file
+    """
+    keys = {"lower": 0, "lower_colon": 0, "problemchars": 0, "other": 0}
+    for _, element in iterparse_clear(filename):
+        keys = key_type(element, keys)
+
+    return keys
+
+
+"""
+Count total number of unique amenities
+Create dictionary of amenities and their frequency.
+Review to determine if there are problem amenity names to correct.
+
+Reference: https://discussions.udacity.com/t/quiz-tag-types/170228/2
+"""
+
+def find_amenity(element, amen_counts):
+    """Count the amenity of an element in a Counter.
+    Used in process_amenities function below.
+    
+    Args:
+        element (string): element in .osm file
+        amen_counts (Counter): amenities and number of cases so far
+    
+    Returns:
+        amen_counts (Counter): updated counter of amenities and number of cases
+    """
+    if element.tag == "tag":
+        k =  element.attrib['k']
+        if k == 'amenity':
+            amen_counts[element.attrib['v']] += 1
+            
+    return amen_counts
+
+def process_amenities(filename):
+    """Return total number of amenities and 
+    dictionary of amenities and their frequency
+    
+    Each amenity tag is counted as it is parsed, so the time is linear in the
+    file and the memory is one entry per distinct amenity.
+    
+    Args:
+        filename (string): name of .osm file
+    
+    Returns:
+        sum(amen_counts.values()) (int): Number of amenity tags found
+        amen_dic (dic): Dictionary of amenities and frequency of each
+    """
+    amen_counts = Counter()
+    for _, element in iterparse_clear(filename):
+        amen_counts = find_amenity(element, amen_counts)
+    return sum(amen_counts.values()), dict(amen_counts)
+
+
+"""
+Count total number of postal codes/zip codes.
+Create dictionary of zip codes and their frequency.
+Review to determine if there are problem amenity names to correct.
+
+Reference: https://discussions.udacity.com/t/quiz-tag-types/170228/2
+
+* Both functions edited per review #2 of project to increment zip_dic, exlude zip_list.
+"""
+
+def find_zip(element, zip_dic):    
+    """Create dictionary of zip codes and their frequency.
+  
+    Args:
+        element (string): element in .osm file
+        zip_dic (dic): dictionary of zip codes
+    
+    Returns:
+        zip_dic (dic): updated dictionary of zip codes and number of cases
+        """
+    if element.tag == "tag":
+        k =  element.attrib['k']
+        if k == 'addr:postcode':
+            v = element.attrib['v']
+            if v not in zip_dic:
+                zip_dic[v] = 1
+            else:
+                zip_dic[v] += 1      
+    return zip_dic    
+
+def process_zips(filename):
+    """Return total number of zip codes and 
+    dictionary of zip codes and their frequency
+    
+    Args:
+        filename (string): name of .osm file
+    
+    Returns:
+        sum(zip_dic.values()) (int): Number of total zip codes found
+        zip_dic (dic): Dictionary of zip codes and frequency of each
+    """
+    zip_dic = {}
+    for _, element in iterparse_clear(filename):
+        zip_dic = find_zip(element, zip_dic)
+        
+    return sum(zip_dic.values()), zip_dic
+
+
+def process_users(filename):
+    """Return a set of unique user IDs ("uid").
+    
+    Find out how many unique users have contributed to the map in this particular area.
+    
+    Args:
+        filename (string): name of .osm file
+    
+    Returns:
+        Set of unique user IDs
+    """
+    users = set()
+    for _, element in iterparse_clear(filename):
+        if 'uid' in element.attrib:
+            users.add(element.attrib['uid'])
+    return users
+
+
+"""
+Audit the OSMFILE and change the variable 'mapping' to reflect the changes needed to fix 
+the unexpected street types to the appropriate ones in the expected list.
+You have to add mappings only for the actual problems you find in this OSMFILE,
+not a generalized solution, since that may and will depend on the particular area you are auditing.
+
+"""
+
+expected = ["Street", "Avenue", "Boulevard", "Drive", "Court", "Center", "Place", "Square", "Lane", "Road", 
+            "Trail", "Parkway", "Plaza", "Commons", "Way", "Circle", "Loop"]
+
+
+def audit_street_type(street_types, street_name):
+    """ Update dictionary with problematic street type as key 
+    and full street name where found as value.
+    
+    Used in 'audit' function below
+    
+    Args: 
+        street_types (dic): default dictionary as applied in audit function
+        street_name (string): name of specific street 
+    
+    Returns:
+        street_types (dic) updated with street_type not in 'expected' list as key,
+            full street name as value
+            
+    """
+    m = street_type_re.search(street_name)
+    if m:
+        street_type = m.group() # returns the last word.
+        if street_type not in expected:
+            street_types[street_type] = street_name # MODIFIED FROM EXAMPLE
+            #if last word in street name is not in expected list, 
+            # add the street type as key in dictionary, with full street name as value
+
+def is_street_name(elem):
+    """Confirm that element reviewed is a street name."""
+    return (elem.attrib['k'] == "addr:street")
+
+def audit(osmfile):
+    """Return dictionary of problematic street types and street names where found for all streets in osm file
+    
+    Args:
+        osmfile (string): name of .osm file
+    
+    Returns:
+        street_types dictionary, updated for all unexpected street types in .osm file 
+            (see audit_street_type function)
+    """
+    osm_file = open(osmfile, "r")
+    street_types = defaultdict(set)
+    for elem in get_element(osm_file, tags=('node', 'way')):
+
+        if elem.tag == "node" or elem.tag == "way":
+            for tag in elem.iter("tag"):
+                # in the line below, the code is checking if the 'element' complies            
+                # with the code 'is_street_name()'            
+                # however, the outer conditions specify that
+                # 'element.tag' is 'way' or 'node'      
+                #  
+                # However, it is the children of the 'way' or 'node' elements      
+                #  that you are interested in, so code has named the children
+                #  tag in the statement  `for tag in element.iter("tag"):`
+                if is_street_name(tag):
+                    #  the same is true here: element.attrib['v']
+                    #  element.attrib['v'] refers to the attributes of 'node' or 'way'
+                    #  but 'node' or 'way' elements don't have an attribute 'v'
+                    #  So, tag.attrib['v'] refers to the children of 'node' or 'way'
+                    #  that have the tagname 'tag'
+                    audit_street_type(street_types, tag.attrib['v'])
+    osm_file.close()
+    return street_types
+
+
+"""
+Audit the OSMFILE and change the variable 'city_mapping' to reflect the changes needed to fix 
+the unexpected city names to the appropriate ones in the expected list
+"""
+
+city_re = re.compile(r'\b\S+\.?$', re.IGNORECASE)
+
+
+expected_cities = ['Berkeley', 'Piedmont', 'Oakland','Richmond','Albany','Alameda', 'El Cerrito', 'San Leandro','Emeryville',
+                   'Moraga','Lafayette', 'Castro Valley', 'Kensington', 'Orinda', 'Canyon', 'Walnut Creek']
+
+def audit_city(cities, city_name):
+    """ Update dictionary, 'cities', with problematic city name as key 
+    and full city name where found as value.
+    
+    Used in 'audit2' function below
+    
+    Args: 
+        cities (dic): default dictionary as applied in audit function
+        city_name (string): name of specific street 
+    
+    Returns:
+        cities (dic) updated with city not in 'expected_cities' list as key,
+            correct city name as value
+
+    """
+    city = city_re.search(city_name)
+    if city:
+        if city not in expected_cities:
+            cities[city] = city_name 
+
+def is_city_name(elem):
+    """Confirm element is listed as a city.
+    
+    Used in 'audit2' function.
+    
+    Arg:
+        elem (string): element in .osm file
+        
+    Result:
+        Boolean (True or False)
+    """
+    return (elem.attrib['k'] == "addr:city")
+
+def audit2(osmfile):
+    """Return dictionary of problematic city names in osm file
+    
+    Args:
+        osmfile (string): name of .osm file
+    
+    Returns:
+        cities dictionary, updated for all unexpected cities in .osm file 
+            (see audit_city function)
+    """
+    osm_file = open(osmfile, "r")
+    cities = defaultdict(set)
+    for elem in get_element(osm_file, tags=('node', 'way')):
+        if elem.tag == "node" or elem.tag == "way":
+            for tag in elem.iter("tag"):
+                if is_city_name(tag):
+                    audit_city(cities, tag.attrib['v'])
+    osm_file.close()
+    return cities
@@ -0,0 +1,188 @@
+# coding: utf-8
+
+"""Persistent cache of query results, for reports rerun on an unchanged database.
+
+Results are stored in their own sqlite file (.eastbay_query_cache.db), keyed
+on the database path, the query text with its whitespace normalized, and the
+parameters. Each entry also records the fingerprint of the database it was
+read from. create_db increments the load generation (PRAGMA user_version) on
+every load; together with the size and modification time of the database and
+of its write-ahead log, this changes whenever the database is reloaded or
+written to. An entry whose fingerprint no longer matches is a miss, and is
+deleted along with every other entry of the old fingerprint.
+
+The cache holds at most 'max_bytes' of results; when a new entry would go
+over, the least recently used entries are evicted first.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+
+from eastbay.reports import connect_read_only
+
+CACHE_PATH = '.eastbay_query_cache.db'
+MAX_BYTES = 32 * 1024 * 1024
+
+# Quoted strings and identifiers, whose whitespace is kept as it is
+QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+
+CREATE_SQL = '''
+CREATE TABLE IF NOT EXISTS results(
+    key TEXT PRIMARY KEY,
+    db TEXT,
+    fingerprint TEXT,
+    columns TEXT,
+    rows TEXT,
+    bytes INTEGER,
+    last_used INTEGER)'''
+
+
+def normalize_query(sql):
+    """Collapse runs of whitespace outside quotes and drop the trailing semicolon.
+
+    The same query written with other line breaks or indentation gets the same key.
+    """
+    parts = QUOTED.split(sql)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r'\s+', ' ', parts[i])
+    return ''.join(parts).strip().rstrip(';').strip()
+
+
+def fingerprint(sqlite_file):
+    """Return a string that changes whenever the database is reloaded or written to.
+
+    Args:
+        sqlite_file (string): name of database file
+
+    Returns:
+        load generation, then size and mtime of the database and of its -wal file
+    """
+    conn = connect_read_only(sqlite_file)
+    try:
+        generation = conn.execute('PRAGMA user_version;').fetchone()[0]
+    finally:
+        conn.close()
+    # Closing the last connection may checkpoint the -wal file, so stat after it
+    parts = [str(generation)]
+    for path in (sqlite_file, sqlite_file + '-wal'):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            parts.append('{0}:{1!r}'.format(stat.st_size, stat.st_mtime))
+        else:
+            parts.append('-')
+    return ' '.join(parts)
+
+
+class QueryCache(object):
+    """Size-bounded LRU cache of query results, stored in a sqlite file.
+
+    Args:
+        path (string): cache file, created if missing
+        max_bytes (int): most bytes of results (as JSON) to keep
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(CREATE_SQL)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used)')
+        self.conn.commit()
+
+    @staticmethod
+    def key(sqlite_file, sql, params=()):
+        """Return the cache key of a query on a database."""
+        text = json.dumps([os.path.abspath(sqlite_file), normalize_query(sql), list(params)])
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def next_use(self):
+        """Return a counter value later than that of every entry, for LRU order."""
+        return (self.conn.execute('SELECT MAX(last_used) FROM results').fetchone()[0] or 0) + 1
+
+    def get(self, sqlite_file, sql, params=(), current=None):
+        """Return (columns, rows) of a cached query, or None if it is missing or stale.
+
+        Args:
+            sqlite_file (string): name of database file
+            sql (string): query
+            params (tuple): query parameters
+            current (string): fingerprint of the database, if already known
+        """
+        current = current or fingerprint(sqlite_file)
+        key = self.key(sqlite_file, sql, params)
+        row = self.conn.execute('SELECT fingerprint, columns, rows FROM results WHERE key = ?',
+                                (key,)).fetchone()
+        if row is None or row[0] != current:
+            if row is not None:
+                self.invalidate(sqlite_file, current)
+            self.misses += 1
+            return None
+        self.conn.execute('UPDATE results SET last_used = ? WHERE key = ?', (self.next_use(), key))
+        self.conn.commit()
+        self.hits += 1
+        return json.loads(row[1]), [tuple(r) for r in json.loads(row[2])]
+
+    def put(self, sqlite_file, sql, params, columns, rows, current=None):
+        """Store the result of a query, evicting least recently used entries to make room.
+
+        A result larger than max_bytes on its own is not stored.
+        """
+        current = current or fingerprint(sqlite_file)
+        data = json.dumps([list(r) for r in rows])
+        size = len(data)
+        if size > self.max_bytes:
+            return
+        self.invalidate(sqlite_file, current)
+        key = self.key(sqlite_file, sql, params)
+        self.conn.execute('DELETE FROM results WHERE key = ?', (key,))
+        self.evict(self.max_bytes - size)
+        self.conn.execute('INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?)',
+                          (key, os.path.abspath(sqlite_file), current, json.dumps(list(columns)),
+                           data, size, self.next_use()))
+        self.conn.commit()
+
+    def invalidate(self, sqlite_file, current=None):
+        """Delete the entries of a database that were read from any other fingerprint."""
+        self.conn.execute('DELETE FROM results WHERE db = ? AND fingerprint != ?',
+                          (os.path.abspath(sqlite_file), current or ''))
+        self.conn.commit()
+
+    def evict(self, budget):
+        """Delete least recently used entries until the results take at most 'budget' bytes."""
+        total = self.conn.execute('SELECT COALESCE(SUM(bytes), 0) FROM results').fetchone()[0]
+        if total <= budget:
+            return
+        for key, size in self.conn.execute(
+                'SELECT key, bytes FROM results ORDER BY last_used').fetchall():
+            self.conn.execute('DELETE FROM results WHERE key = ?', (key,))
+            total -= size
+            if total <= budget:
+                break
+
+    def execute(self, sqlite_file, sql, params=()):
+        """Return the rows of a query, from the cache if the database has not changed since.
+
+        For analysis cells: cache.execute('eastbay.db', QUERY) in place of
+        c.execute(QUERY); c.fetchall().
+        """
+        current = fingerprint(sqlite_file)
+        cached = self.get(sqlite_file, sql, params, current)
+        if cached is not None:
+            return cached[1]
+        conn = connect_read_only(sqlite_file)
+        try:
+            cur = conn.execute(sql, params)
+            rows = cur.fetchall()
+            columns = [column[0] for column in cur.description]
+        finally:
+            conn.close()
+        self.put(sqlite_file, sql, params, columns, rows, current)
+        return rows
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,170 @@
+# coding: utf-8
+
+"""Checkpoints that let an interrupted process_map export resume where it stopped."""
+
+import json
+import mmap
+import os
+import re
+
+# Start of a top level element, skipping comments, CDATA and processing instructions
+SCAN_TOP_LEVEL = re.compile(br'<(?:!--.*?-->|!\[CDATA\[.*?\]\]>|\?.*?\?>|(node|way|relation)[\s/>])', re.DOTALL)
+SCAN_ROOT = re.compile(br'<osm\b[^>]*>')
+
+
+class ResumeReader(object):
+    """File-like object that reads the .osm header, then the input from a byte offset.
+    
+    The header is everything up to and including the <osm> start tag, so the
+    parser sees a well-formed document that starts at the checkpointed element.
+    tell() and fileno() are those of the input file, for ExportMetrics.
+    """
+
+    def __init__(self, osm_file, header, offset):
+        self.osm_file = osm_file
+        self.name = getattr(osm_file, 'name', None)
+        self.header = header
+        osm_file.seek(offset)
+
+    def read(self, size=-1):
+        if self.header:
+            if size is None or size < 0:
+                size = len(self.header)
+            data, self.header = self.header[:size], self.header[size:]
+            return data
+        return self.osm_file.read(size)
+
+    def tell(self):
+        return self.osm_file.tell()
+
+    def fileno(self):
+        return self.osm_file.fileno()
+
+
+class ExportCheckpoint(object):
+    """Save process_map progress every 'every' elements so an interrupted export can resume.
+    
+    A checkpoint records the byte offset of the next top level element in the
+    input, the id of the last element written and the size of each csv file.
+    The csv files are flushed to disk before the checkpoint is written, and the
+    checkpoint file is replaced atomically, so the recorded sizes always hold
+    whole rows. When process_map finds a checkpoint for the same input, it cuts
+    the csv files back to those sizes and parses from the recorded offset.
+    The checkpoint file is removed once the export finishes.
+    """
+
+    def __init__(self, path='export_checkpoint.json', every=100000):
+        self.path = path
+        self.every = every
+        self.state = None
+        self.elements = 0   # top level elements written so far
+        self.offset = 0     # byte offset of the next element to scan from
+        self.scanned = 0    # elements before self.offset
+        self.mm = None
+
+    def load(self, file_in, outputs):
+        """Read the checkpoint for file_in, if there is one, and cut the outputs back to it.
+        
+        Args:
+            file_in (string): name of .osm file being exported
+            outputs (list): csv file names, in the order used by save
+        
+        Returns:
+            True if the export resumes from a checkpoint, False if it starts over
+        """
+        self.input = os.path.abspath(file_in)
+        stat = os.stat(file_in)
+        self.input_id = {'input': self.input, 'input_bytes': stat.st_size,
+                         'input_mtime': int(stat.st_mtime)}
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            state = json.load(f)
+        for key, value in self.input_id.items():
+            if state[key] != value:
+                raise ValueError("Checkpoint {0} was written for a different {1} ({2}); "
+                                 "delete it to start over".format(self.path, key, state[key]))
+        for path in outputs:
+            if not os.path.exists(path) or os.path.getsize(path) < state['outputs'][path]:
+                raise ValueError("{0} is shorter than checkpoint {1} expects; "
+                                 "delete the checkpoint to start over".format(path, self.path))
+        for path in outputs:
+            with open(path, 'r+b') as f:
+                f.truncate(state['outputs'][path])
+        self.state = state
+        self.elements = self.scanned = state['elements']
+        self.offset = state['offset']
+        return True
+
+    def open(self, osm_file):
+        """Return the file for get_element to parse: osm_file, or a ResumeReader after a checkpoint."""
+        self.mm = mmap.mmap(osm_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.state is None:
+            return osm_file
+        header = self.mm[:SCAN_ROOT.search(self.mm).end()]
+        return ResumeReader(osm_file, header, self.offset)
+
+    def passed(self, element, output_files):
+        """Count one top level element, and save a checkpoint every 'every' elements."""
+        self.elements += 1
+        if self.elements % self.every == 0:
+            self.save(element, output_files)
+
+    def find_offset(self, element):
+        """Return the byte offset of the element after the one just written.
+        
+        Top level elements are counted from the last checkpoint onwards, so the
+        input is only scanned once over the whole export.
+        """
+        count = self.elements - self.scanned
+        last = None
+        for m in SCAN_TOP_LEVEL.finditer(self.mm, self.offset):
+            if m.group(1) is None:
+                continue
+            if count == 0:
+                offset = m.start()
+                break
+            last = m.start()
+            count -= 1
+        else:
+            offset = self.mm.rfind(b'</osm')
+        # The element just before the offset has to be the one process_map wrote last
+        element_id = element.attrib.get('id', '').encode('utf-8')
+        if last is None or not re.search(br'\sid=["\']' + re.escape(element_id) + br'["\']',
+                                         self.mm[last:offset]):
+            raise RuntimeError("Checkpoint scan lost track of the input at {0} {1}".format(
+                element.tag, element.attrib.get('id')))
+        return offset
+
+    def save(self, element, output_files):
+        """Flush the outputs to disk and write the checkpoint.
+        
+        Args:
+            element (Element): last element written
+            output_files (list): open csv files, in the same order as the names given to load
+        """
+        offset = self.find_offset(element)
+        sizes = {}
+        for f in output_files:
+            f.flush()
+            os.fsync(f.fileno())
+            sizes[f.name] = f.tell()
+        state = dict(self.input_id)
+        state.update({'elements': self.elements, 'offset': offset, 'last_element': element.tag,
+                      'last_id': element.attrib.get('id'), 'outputs': sizes})
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp, self.path)
+        self.state = state
+        self.offset = offset
+        self.scanned = self.elements
+
+    def finish(self):
+        """Remove the checkpoint after a complete export."""
+        if self.mm is not None:
+            self.mm.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
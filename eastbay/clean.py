@@ -0,0 +1,157 @@
+# coding: utf-8
+
+"""Cleaning functions applied by shape_element before the csv files are written."""
+
+import re
+
+# Last word of a street name, i.e. the street type
+street_type_re = re.compile(r'\b\S+\.?$', re.IGNORECASE)
+
+
+def clean_zip(zipcode):
+    """Clean zip codes: remove extra spaces, 'CA', extra postal code, zip codes less than 5 digits.
+    Ref on regular expressions: https://www.tutorialspoint.com/python/python_reg_expressions.htm
+    
+    Args:
+        zipcode (string): entry for zip code.
+        
+    Returns:
+        Cleaned zipcode (string).
+    """
+    zipcode = zipcode.replace(' ','')
+    if 'ca' in zipcode:        
+        zipcode = zipcode.replace('ca', '')
+        if re.search(r'\d{5}$', zipcode) == False:
+            return None
+            #pass
+    if 'CA' in zipcode:        
+        zipcode = zipcode.replace('CA', '')
+        if re.search(r'\d{5}$', zipcode) == False:
+            return None
+            #pass
+    if '-' in zipcode:
+        zipcode = zipcode.split('-',1)[0]
+        if re.search(r'\d{5}$', zipcode) == False:
+            return None
+            #pass
+    if re.search(r'\d{5}$', zipcode) == False:
+        return None
+        #pass
+    else:
+        return zipcode
+
+
+def clean_zip1(zipcode):
+    """Clean zip codes: remove extra spaces, 'CA', extra postal code, zip codes less than 5 digits.
+    Ref on regular expressions: https://www.tutorialspoint.com/python/python_reg_expressions.htm
+    
+    Args:
+        zipcode (string): entry for zip code.
+        
+    Returns:
+        Cleaned zipcode (string).
+    """
+    zipcode = zipcode.replace(' ','')
+    if 'ca' in zipcode:        
+        zipcode = zipcode.replace('ca', '')
+    if 'CA' in zipcode:        
+        zipcode = zipcode.replace('CA', '')
+    if '-' in zipcode:
+        zipcode = zipcode.split('-',1)[0]
+    
+    cleanzip = re.match(r'\d{5}$', zipcode)
+    if cleanzip:
+        return zipcode
+    else:
+        return None
+
+
+"""Create 'mapping' dictionary to fix street types; create 'special_map' dictionary for special cases to fix."""
+
+mapping = { "St": "Street",
+            "St.": "Street",
+            "street": "Street",
+            "st": "Street",
+            "Ave": "Avenue",
+            "Rd.": "Road",
+            "Rd": "Road",
+            "AVE": "Avenue",
+            "Ave.": "Avenue",
+            "Aveenue": "Avenue",
+            "Ave.": "Avenue",
+            "Avenie": "Avenue",
+            "Blvd": "Boulevard",
+            "Blvd.": "Boulevard",
+            "blvd": "Boulevard",
+            "Ct": "Court",
+            "Ctr": "Center",
+            "Dr": "Drive",
+            "Dr.": "Drive",
+            "Ln.": "Lane",
+            "square": "Square",
+            "Pl": "Plaza"
+          }
+
+special_map = { "Washington St 2nd Floor:": "Washington Street, 2nd Floor",
+               "Telegraph": "Telegraph Avenue", 
+               "San Francisco/Oakland Bridge Toll Pl": "San Francisco/Oakland Bridge Toll Plaza"
+               }
+
+
+def clean_st_name(name, mapping):
+    """Take a string with street name as an argument and return the fixed name,
+    as stated in mapping dictionary.
+    
+    Args:
+        name (string): name of street
+        mapping (dictionary): dictionary of incorrect street types as key, corrected names as value
+        
+    Returns:
+        Corrected street name (string)
+    
+    """
+    name = name.replace('  ', ' ')
+    if name in special_map:
+        name = special_map[name]
+    m = street_type_re.search(name)
+    if m.group() in mapping:
+        first_part = name.rsplit(' ', 1)[0]
+        # cut off last word in sentence 
+        #(http://stackoverflow.com/questions/6266727/python-cut-off-the-last-word-of-a-sentence)
+        name = first_part + ' ' + mapping[m.group()]
+    return name
+
+
+## Figure out if I can use regex to improve this function
+city_mapping = { "Alamda": "Alameda",
+            "alameda": "Alameda",
+            "Berkeley, CA": "Berkeley",
+            "berkeley": "Berkeley",
+            "Oakland ": "Oakland",
+            "oakland": "Oakland",
+            "Oakland CA": "Oakland",
+            "Oakland, CA": "Oakland",
+            "Oakland, Ca": "Oakland",
+            "Okaland": "Oakland",
+            "OAKLAND": "Oakland",
+            "Emeyville": "Emeryville"
+          }
+
+
+def clean_city_name(name, city_mapping):
+    """Take a string with city name as an argument and return the corrected name,
+    as stated in mapping dictionary.
+    
+    Args:
+        name (string): name of city
+        city_mapping (dictionary): dictionary of incorrect city names as key, corrected names as value
+        
+    Returns:
+        Corrected city name (string)
+    """
+    #name = name.replace('  ', ' ')
+    if name in city_mapping:
+        output = city_mapping[name]
+    else:
+        output = name
+    return output
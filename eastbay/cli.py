@@ -0,0 +1,634 @@
+# coding: utf-8
+
+"""Command line entry point: one subcommand per pipeline stage.
+
+    python -m eastbay sample eastbay.osm eastbay_samp1.osm -k 100
+    python -m eastbay extract eastbay.osm berkeley.osm --bbox 37.85,-122.32,37.90,-122.23
+    python -m eastbay audit eastbay.osm
+    python -m eastbay corrections eastbay.osm
+    python -m eastbay export eastbay.osm
+    python -m eastbay integrity
+    python -m eastbay geometry --memory-mb 256
+    python -m eastbay graph
+    python -m eastbay route 37.8716,-122.2727 37.8044,-122.2712   (after graph)
+    python -m eastbay load
+    python -m eastbay report
+    python -m eastbay search "telegraph cafe"   (after load --search)
+    python -m eastbay geocode "2020 Telegraph Ave, Berkeley"   (after load --addresses)
+    python -m eastbay nearest amenity=bicycle_parking 37.8716,-122.2727 --k 3
+    python -m eastbay all eastbay.osm
+
+Every stage writes a stamp file (<stage>.stamp.json) next to its outputs with
+content hashes of its inputs: the files it reads, the values it depends on
+(cleaning dictionaries, schema, table definitions, queries) and the source of
+the modules that do the work. A stage is skipped when its stamp matches the
+current inputs and its outputs have not been changed since; --force reruns it.
+
+File hashes are cached in .eastbay_hashes.json by size and modification time,
+so an unchanged .osm file is not read again to check it.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+
+from eastbay import (addresses, audits, cache, checkpoint, clean, corrections, database, export,
+                     extract, geometry, integrity, metrics, nearby, osm, pipeline, profiling, reports,
+                     routing, scan, search, sketches, tiles)
+
+HASH_CACHE = '.eastbay_hashes.json'
+AUDIT_PATH = 'audit.json'
+REPORT_PATH = 'report.json'
+INTEGRITY_PATH = 'integrity.json'
+CORRECTIONS_PATH = 'corrections.json'
+
+
+def module_source(module):
+    """Return the absolute path of the .py file a module was loaded from."""
+    return os.path.abspath(os.path.splitext(module.__file__)[0] + '.py')
+
+
+# Resolved at import: on Python 2 __file__ is relative to the directory the package
+# was imported from, which main() leaves for the work directory (-C)
+SOURCE_FILES = dict((module.__name__, module_source(module)) for module in (
+    addresses, audits, cache, checkpoint, clean, corrections, database, export, extract,
+    geometry, integrity, metrics, nearby, osm, pipeline, profiling, reports, routing, scan,
+    search, sketches, tiles))
+
+
+def source_file(module):
+    """Return the absolute path of the .py file a module was loaded from."""
+    if module.__name__ in SOURCE_FILES:
+        return SOURCE_FILES[module.__name__]
+    return module_source(module)
+
+
+class Artifacts(object):
+    """Content hashes of stage inputs, and stamps recording what each stage was built from.
+
+    All paths are relative to the current directory, like the csv and database
+    paths used by process_map and create_db.
+    """
+
+    def __init__(self, hash_cache=HASH_CACHE):
+        self.hash_cache = hash_cache
+        self.hashes = {}
+        if os.path.exists(hash_cache):
+            with open(hash_cache) as f:
+                self.hashes = json.load(f)
+
+    def file_digest(self, path):
+        """Return the sha1 of a file, reusing the cached one if its size and mtime have not changed."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        cached = self.hashes.get(path)
+        if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime:
+            return cached['sha1']
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha1.update(block)
+        self.hashes[path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha1': sha1.hexdigest()}
+        with open(self.hash_cache, 'w') as f:
+            json.dump(self.hashes, f, indent=2, sort_keys=True)
+        return sha1.hexdigest()
+
+    @staticmethod
+    def value_digest(value):
+        """Return the sha1 of a value (dictionaries, lists, SQL text); types in the schema hash by repr."""
+        return hashlib.sha1(json.dumps(value, sort_keys=True, default=repr).encode('utf-8')).hexdigest()
+
+    def digests(self, files=(), values=None, modules=()):
+        """Return the input hashes of a stage.
+
+        Args:
+            files (list): input files
+            values (dictionary): name and value of each non-file input
+            modules (list): modules whose source the stage depends on
+
+        Returns:
+            dictionary of input names and sha1 hashes
+        """
+        inputs = {}
+        for path in files:
+            inputs['file:' + os.path.abspath(path)] = self.file_digest(path)
+        for name, value in (values or {}).items():
+            inputs['value:' + name] = self.value_digest(value)
+        for module in modules:
+            inputs['code:' + module.__name__] = self.file_digest(source_file(module))
+        return inputs
+
+    @staticmethod
+    def stamp_path(stage, outputs):
+        """Stamps are written in the directory of the stage's first output."""
+        return os.path.join(os.path.dirname(os.path.abspath(outputs[0])), stage + '.stamp.json')
+
+    def up_to_date(self, stage, inputs, outputs):
+        """Return True if the outputs exist and were built from exactly these inputs."""
+        path = self.stamp_path(stage, outputs)
+        if not os.path.exists(path):
+            return False
+        with open(path) as f:
+            stamp = json.load(f)
+        if stamp['inputs'] != inputs:
+            return False
+        for output in outputs:
+            recorded = stamp['outputs'].get(os.path.abspath(output))
+            if not os.path.exists(output) or recorded is None:
+                return False
+            stat = os.stat(output)
+            if recorded['size'] != stat.st_size or recorded['mtime'] != stat.st_mtime:
+                return False
+        return True
+
+    def record(self, stage, inputs, outputs):
+        """Write the stamp of a stage that has just been run."""
+        recorded = {}
+        for output in outputs:
+            stat = os.stat(output)
+            recorded[os.path.abspath(output)] = {'size': stat.st_size, 'mtime': stat.st_mtime}
+        with open(self.stamp_path(stage, outputs), 'w') as f:
+            json.dump({'stage': stage, 'inputs': inputs, 'outputs': recorded}, f,
+                      indent=2, sort_keys=True)
+
+
+def run_stage(artifacts, stage, inputs, outputs, work, force=False):
+    """Run work() unless the outputs are up to date for the inputs; return True if it ran."""
+    if not force and artifacts.up_to_date(stage, inputs, outputs):
+        sys.stderr.write('{0}: up to date, skipped\n'.format(stage))
+        return False
+    sys.stderr.write('{0}: running\n'.format(stage))
+    work()
+    artifacts.record(stage, inputs, outputs)
+    return True
+
+
+def match_key(key):
+    """audit_city keys cities by their regex match; use the matched text for JSON."""
+    return key.group() if hasattr(key, 'group') else key
+
+
+def write_json(path, value):
+    with open(path, 'w') as f:
+        json.dump(value, f, indent=2, sort_keys=True)
+
+
+def cmd_sample(args, artifacts):
+    inputs = artifacts.digests(files=[args.osm_file], values={'k': args.k}, modules=[osm])
+    return run_stage(artifacts, 'sample', inputs, [args.sample_file],
+                     lambda: osm.create_sample(args.osm_file, args.sample_file, args.k), args.force)
+
+
+def cmd_extract(args, artifacts):
+    files = [args.osm_file] + ([args.polygon] if args.polygon else [])
+    inputs = artifacts.digests(files=files,
+                               values={'bbox': args.bbox, 'complete_ways': args.complete_ways,
+                                       'relations': not args.no_relations},
+                               modules=[extract, osm])
+
+    def work():
+        counts = extract.extract(
+            args.osm_file, args.out_file, bbox=args.bbox,
+            polygon=extract.read_poly(args.polygon) if args.polygon else None,
+            complete_ways=args.complete_ways, relations=not args.no_relations)
+        sys.stderr.write(''.join('{0}: {1}\n'.format(name, n) for name, n in sorted(counts.items())))
+
+    return run_stage(artifacts, 'extract', inputs, [args.out_file], work, args.force)
+
+
+def bbox_arg(text):
+    """'south,west,north,east' -> tuple of floats"""
+    bbox = tuple(float(part) for part in text.split(','))
+    if len(bbox) != 4:
+        raise argparse.ArgumentTypeError('expected south,west,north,east')
+    return bbox
+
+
+def cmd_audit(args, artifacts):
+    inputs = artifacts.digests(files=[args.osm_file],
+                               values={'expected': audits.expected,
+                                       'expected_cities': audits.expected_cities},
+                               modules=[audits, scan, osm])
+    if args.approx:
+        inputs.update(artifacts.digests(values={'distinct_error': args.distinct_error,
+                                                'frequency_error': args.frequency_error},
+                                        modules=[sketches]))
+
+    def work():
+        if args.approx:
+            write_json(args.out, {
+                'tags': scan.scan_tags(args.osm_file),
+                'key_types': scan.scan_key_types(args.osm_file),
+                'approx': sketches.approx_stats(args.osm_file, args.distinct_error,
+                                                args.frequency_error),
+                'street_types': dict((match_key(k), sorted(v) if isinstance(v, set) else v)
+                                     for k, v in audits.audit(args.osm_file).items()),
+                'cities': dict((match_key(k), v) for k, v in audits.audit2(args.osm_file).items()),
+            })
+            return
+        total_zips, zips = audits.process_zips(args.osm_file)
+        write_json(args.out, {
+            'tags': scan.scan_tags(args.osm_file),
+            'key_types': scan.scan_key_types(args.osm_file),
+            'postcodes': {'total': total_zips, 'counts': zips},
+            'unique_users': len(audits.process_users(args.osm_file)),
+            'street_types': dict((match_key(k), sorted(v) if isinstance(v, set) else v)
+                                 for k, v in audits.audit(args.osm_file).items()),
+            'cities': dict((match_key(k), v) for k, v in audits.audit2(args.osm_file).items()),
+        })
+
+    return run_stage(artifacts, 'audit', inputs, [args.out], work, args.force)
+
+
+def cmd_corrections(args, artifacts):
+    inputs = artifacts.digests(files=[args.osm_file],
+                               values={'expected': audits.expected,
+                                       'expected_cities': audits.expected_cities,
+                                       'mapping': clean.mapping, 'city_mapping': clean.city_mapping},
+                               modules=[corrections, audits, osm])
+    return run_stage(artifacts, 'corrections', inputs, [args.out],
+                     lambda: write_json(args.out, corrections.suggest_mappings(args.osm_file)),
+                     args.force)
+
+
+def cmd_export(args, artifacts):
+    values = {'mapping': clean.mapping, 'special_map': clean.special_map,
+              'city_mapping': clean.city_mapping, 'validate': args.validate}
+    if args.validate:
+        values['schema'] = export.load_schema()
+    modules = [clean, export, osm, pipeline]
+    outputs = list(export.CSV_PATHS)
+    if args.checkpoint:
+        modules.append(checkpoint)
+    if args.integrity:
+        modules += [integrity, extract]
+        outputs.append(args.integrity)
+    if args.metrics:
+        # A missing metrics file reruns the export, as for the integrity report
+        modules.append(metrics)
+        outputs.append(args.metrics)
+    inputs = artifacts.digests(files=[args.osm_file], values=values, modules=modules)
+
+    def work():
+        check = integrity.IntegrityCheck() if args.integrity else None
+        export.process_map(
+            args.osm_file, validate=args.validate, pipelined=args.pipelined,
+            metrics=metrics.ExportMetrics(args.metrics) if args.metrics else None,
+            checkpoint=checkpoint.ExportCheckpoint() if args.checkpoint else None,
+            integrity=check)
+        if check is not None:
+            write_integrity(args.integrity, check.finish())
+
+    return run_stage(artifacts, 'export', inputs, outputs, work, args.force)
+
+
+def write_integrity(path, report):
+    """Save an integrity report and print its counts."""
+    write_json(path, report)
+    sys.stderr.write(''.join('{0}: {1}\n'.format(check, report[check]['count'])
+                             for check in integrity.IntegrityCheck.CHECKS))
+
+
+def cmd_integrity(args, artifacts):
+    paths = [export.NODES_PATH, export.WAYS_PATH, export.WAY_NODES_PATH]
+    inputs = artifacts.digests(files=paths, modules=[integrity, extract])
+    return run_stage(artifacts, 'integrity', inputs, [args.out],
+                     lambda: write_integrity(args.out, integrity.check_csv(*paths)), args.force)
+
+
+def cmd_geometry(args, artifacts):
+    paths = [export.NODES_PATH, export.WAY_NODES_PATH]
+    inputs = artifacts.digests(files=paths, modules=[geometry])
+
+    def work():
+        stats = geometry.write_geometries(args.out, *paths, memory_mb=args.memory_mb,
+                                          tmpdir=args.tmpdir)
+        sys.stderr.write(''.join('{0}: {1}\n'.format(name, n) for name, n in sorted(stats.items())))
+    return run_stage(artifacts, 'geometry', inputs, [args.out], work, args.force)
+
+
+def cmd_load(args, artifacts):
+    layout = {'encode_tags': args.encode_tags, 'typed': args.typed,
+              'clustered': args.clustered, 'page_size': args.page_size, 'search': args.search,
+              'tiles': args.tiles, 'addresses': args.addresses}
+    inputs = artifacts.digests(files=export.CSV_PATHS,
+                               values={'tables': database.table_specs(
+                                           encode_tags=args.encode_tags, typed=args.typed,
+                                           clustered=args.clustered),
+                                       'layout': layout,
+                                       'search_keys': search.SEARCH_KEYS if args.search else None,
+                                       'tile_zooms': tiles.ZOOMS if args.tiles else None,
+                                       'street_types': addresses.STREET_TYPES if args.addresses
+                                       else None},
+                               modules=[database, search, tiles, addresses])
+    return run_stage(artifacts, 'load', inputs, [args.db],
+                     lambda: database.create_db(args.db, **layout), args.force)
+
+
+def cmd_report(args, artifacts):
+    layout = reports.layout_reports(args.db)
+    specs = [(spec.name, spec.sql, spec.params) for spec in layout]
+    inputs = artifacts.digests(files=[args.db], values={'reports': specs}, modules=[reports])
+    outputs = [args.out]
+    if args.profile:
+        # Profiling needs the queries run, so a missing profile reruns the reports
+        inputs.update(artifacts.digests(modules=[profiling]))
+        outputs.append(args.profile)
+
+    def work():
+        query_cache = cache.QueryCache() if args.cache else None
+        profiler = profiling.QueryProfiler() if args.profile else None
+        try:
+            write_json(args.out, reports.run_reports(args.db, layout, workers=args.workers,
+                                                     cache=query_cache, profiler=profiler))
+        finally:
+            if query_cache is not None:
+                query_cache.close()
+        if profiler is not None:
+            profiler.write(args.profile)
+            sys.stderr.write(profiler.text(plans=False) + '\n')
+
+    return run_stage(artifacts, 'report', inputs, outputs, work, args.force)
+
+
+def cmd_search(args, artifacts):
+    """Print the matching nodes and ways as JSON; not a stage, so nothing is stamped."""
+    searcher = search.TagSearch(args.db)
+    try:
+        results = searcher.search(args.text, keys=args.key, limit=args.limit, raw=args.raw)
+    finally:
+        searcher.close()
+    json.dump(results, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
+    return False
+
+
+def cmd_geocode(args, artifacts):
+    """Print the addresses matching each one line address (or street prefix) as JSON; not a stage."""
+    texts = list(args.address)
+    if args.file:
+        with open(args.file, 'rb') as f:
+            texts.extend(line.strip().decode('utf-8') for line in f if line.strip())
+    index = addresses.AddressIndex(args.db)
+    try:
+        if args.prefix:
+            results = [{'address': text, 'matches': index.prefix(text, limit=args.limit)}
+                       for text in texts]
+        else:
+            results = [{'address': text, 'match': row}
+                       for text, row in zip(texts, index.geocode_many(texts))]
+    finally:
+        index.close()
+    json.dump(results, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
+    return False
+
+
+def cmd_graph(args, artifacts):
+    paths = [export.NODES_PATH, export.WAY_NODES_PATH, export.WAY_TAGS_PATH]
+    inputs = artifacts.digests(files=paths,
+                               values={'highways': sorted(args.highway) if args.highway else None,
+                                       'excluded': routing.EXCLUDED_HIGHWAYS,
+                                       'oneway': not args.no_oneway,
+                                       'landmarks': args.landmarks},
+                               modules=[routing])
+
+    def work():
+        graph = routing.build_graph(*paths, highways=args.highway, oneway=not args.no_oneway)
+        if args.landmarks:
+            graph.add_landmarks(args.landmarks)
+        graph.save(args.out)
+        sys.stderr.write('nodes: {0}\nedges: {1}\n'.format(len(graph), graph.edges))
+    return run_stage(artifacts, 'graph', inputs, [args.out], work, args.force)
+
+
+def graph_node(graph, point):
+    """A node id, or the graph node nearest to 'lat,lon'."""
+    if ',' in point:
+        lat, lon = [float(value) for value in point.split(',')]
+        return graph.nearest(lat, lon)
+    return int(point)
+
+
+def cmd_route(args, artifacts):
+    """Print a shortest path, or distances to several targets, as JSON; not a stage."""
+    graph = routing.RoutingGraph.load(args.graph)
+    source = graph_node(graph, args.source)
+    targets = [graph_node(graph, point) for point in args.targets]
+    if len(targets) == 1:
+        length, path = graph.route(source, targets[0])
+        result = {'source': source, 'target': targets[0], 'length': length, 'nodes': path}
+    else:
+        distances = graph.distances(source, targets)
+        result = {'source': source,
+                  'distances': [[target, distances.get(target)] for target in targets]}
+    json.dump(result, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
+    return False
+
+
+def read_points(path):
+    """Return the lat and lon columns of a csv file."""
+    with open(path, 'rb') as f:
+        rows = [(float(row['lat']), float(row['lon'])) for row in csv.DictReader(f)]
+    return [lat for lat, _ in rows], [lon for _, lon in rows]
+
+
+def cmd_nearest(args, artifacts):
+    """Print the nearest nodes of a class to each point as JSON; not a stage."""
+    if args.points:
+        lat, lon = read_points(args.points)
+    else:
+        points = [[float(value) for value in point.split(',')] for point in args.point]
+        lat, lon = [p[0] for p in points], [p[1] for p in points]
+    index = nearby.AmenityIndex.from_db(args.db)
+    dist, ids = index.nearest(args.node_class, lat, lon, k=args.k)
+    results = [{'lat': lat[i], 'lon': lon[i],
+                'nearest': [[node_id, d] for node_id, d in zip(ids[i].tolist(), dist[i].tolist())
+                            if node_id != -1]}
+               for i in range(len(lat))]
+    json.dump(results, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
+    return False
+
+
+def cmd_all(args, artifacts):
+    """Audit, export, load and report, skipping every stage that is up to date."""
+    audit_args = argparse.Namespace(osm_file=args.osm_file, out=AUDIT_PATH, force=args.force,
+                                    approx=False)
+    report_args = argparse.Namespace(db=args.db, out=args.out, workers=args.workers,
+                                     cache=args.cache, profile=args.profile, force=args.force)
+    ran = [cmd_audit(audit_args, artifacts) if args.audit else False,
+           cmd_export(args, artifacts),
+           cmd_load(args, artifacts),
+           cmd_report(report_args, artifacts)]
+    return any(ran)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m eastbay', description=__doc__.split('\n')[0])
+    parser.add_argument('-C', '--workdir', help='run in this directory; all paths are relative to it')
+    parser.add_argument('--force', action='store_true', help='run even if outputs are up to date')
+    sub = parser.add_subparsers(dest='command')
+    sub.required = True
+
+    p = sub.add_parser('sample', help='write every k-th top level element to a sample file')
+    p.add_argument('osm_file')
+    p.add_argument('sample_file')
+    p.add_argument('-k', type=int, default=100, help='sample every k-th element (default 100)')
+    p.set_defaults(func=cmd_sample)
+
+    p = sub.add_parser('extract', help='clip to a bounding box or polygon, keeping the ways that cross it')
+    p.add_argument('osm_file')
+    p.add_argument('out_file')
+    area = p.add_mutually_exclusive_group(required=True)
+    area.add_argument('--bbox', type=bbox_arg, metavar='S,W,N,E', help='south,west,north,east in degrees')
+    area.add_argument('--polygon', metavar='POLY', help='Osmosis .poly file')
+    p.add_argument('--complete-ways', action='store_true',
+                   help='also keep the outside nodes of kept ways')
+    p.add_argument('--no-relations', action='store_true', help='leave out relations')
+    p.set_defaults(func=cmd_extract)
+
+    p = sub.add_parser('audit', help='tag, key, postcode, user, street and city audits as JSON')
+    p.add_argument('osm_file')
+    p.add_argument('--out', default=AUDIT_PATH)
+    p.add_argument('--approx', action='store_true',
+                   help='estimate users, keys and top postcodes, cities and amenities in fixed memory')
+    p.add_argument('--distinct-error', type=float, default=sketches.DISTINCT_ERROR,
+                   help='relative standard error of distinct counts (default {0})'.format(
+                       sketches.DISTINCT_ERROR))
+    p.add_argument('--frequency-error', type=float, default=sketches.FREQUENCY_ERROR,
+                   help='largest overestimate of a top count, as a fraction of its tags '
+                        '(default {0})'.format(sketches.FREQUENCY_ERROR))
+    p.set_defaults(func=cmd_audit)
+
+    def export_options(p):
+        p.add_argument('osm_file')
+        p.add_argument('--validate', action='store_true', help='check every element against schema.py')
+        p.add_argument('--metrics', metavar='JSON', help='save ExportMetrics to this file')
+        p.add_argument('--checkpoint', action='store_true', help='resume an interrupted export')
+        p.add_argument('--pipelined', action='store_true',
+                       help='parse, shape and write in separate threads (same output)')
+        p.add_argument('--integrity', metavar='JSON',
+                       help='check way node references while writing; save the report here')
+
+    p = sub.add_parser('corrections',
+                       help='suggest mapping and city_mapping entries for unexpected street types and cities')
+    p.add_argument('osm_file')
+    p.add_argument('--out', default=CORRECTIONS_PATH)
+    p.set_defaults(func=cmd_corrections)
+
+    p = sub.add_parser('export', help='write the five csv files')
+    export_options(p)
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser('integrity', help='check the way nodes in the csv files against the nodes')
+    p.add_argument('--out', default=INTEGRITY_PATH)
+    p.set_defaults(func=cmd_integrity)
+
+    p = sub.add_parser('geometry', help="write each way's coordinates as WKT, sorting on disk")
+    p.add_argument('--out', default=geometry.GEOMETRY_PATH)
+    p.add_argument('--memory-mb', type=float, default=geometry.MEMORY_MB,
+                   help='memory budget of the join, split among its sorts (default {0})'.format(geometry.MEMORY_MB))
+    p.add_argument('--tmpdir', help='directory for the sort run files (default: system temp)')
+    p.set_defaults(func=cmd_geometry)
+
+    def load_options(p):
+        p.add_argument('--db', default=database.sqlite_file)
+        p.add_argument('--encode-tags', action='store_true',
+                       help='store tag keys and types as integer codes, read through views')
+        p.add_argument('--typed', action='store_true',
+                       help='integer lat/lon (1e-7 degrees), versions and epoch timestamps; NULL if missing')
+        p.add_argument('--clustered', action='store_true',
+                       help='WITHOUT ROWID tag and way node tables, in element id order')
+        p.add_argument('--page-size', type=int, help='database page size in bytes (then VACUUM)')
+        p.add_argument('--search', action='store_true',
+                       help='build the full-text search index of tag values (see search)')
+        p.add_argument('--tiles', action='store_true',
+                       help='count nodes per map tile, in all and per amenity and shop (needs NumPy)')
+        p.add_argument('--addresses', action='store_true',
+                       help='build the addresses table of addr tags for geocode')
+
+    p = sub.add_parser('load', help='load the csv files into the database')
+    load_options(p)
+    p.set_defaults(func=cmd_load)
+
+    def report_options(p):
+        p.add_argument('--workers', type=int, default=reports.WORKERS,
+                       help='read-only connections running reports at once (default {0})'.format(
+                           reports.WORKERS))
+        p.add_argument('--cache', action='store_true',
+                       help='reuse query results while the database is unchanged ({0})'.format(
+                           cache.CACHE_PATH))
+        p.add_argument('--profile', metavar='JSON',
+                       help='save time, rows and query plan of each query, slowest first '
+                            '(with --workers 1 the times add up)')
+
+    p = sub.add_parser('report', help='run the report queries and save their rows as JSON')
+    p.add_argument('--db', default=database.sqlite_file)
+    p.add_argument('--out', default=REPORT_PATH)
+    report_options(p)
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser('search', help='find nodes and ways by the words in their tag values')
+    p.add_argument('text', help='words to find; each also matches as a prefix')
+    p.add_argument('--db', default=database.sqlite_file)
+    p.add_argument('--key', action='append',
+                   help='only match values of this full key (addr:street); may be repeated')
+    p.add_argument('--limit', type=int, default=search.LIMIT)
+    p.add_argument('--raw', action='store_true', help='text is an FTS5 query (cafe OR coffee)')
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser('geocode', help='find nodes and ways by street address (needs load --addresses)')
+    p.add_argument('address', nargs='*', help="one line address, e.g. '2020 Telegraph Ave, Berkeley'")
+    p.add_argument('--file', help='also look up each line of this file, all in batches')
+    p.add_argument('--db', default=database.sqlite_file)
+    p.add_argument('--prefix', action='store_true',
+                   help='list the addresses whose street starts with each text instead')
+    p.add_argument('--limit', type=int, default=addresses.LIMIT, help='rows per prefix')
+    p.set_defaults(func=cmd_geocode)
+
+    p = sub.add_parser('nearest', help='nearest amenities or shops of one kind to each point')
+    p.add_argument('node_class', help='<key>=<value>, e.g. amenity=bicycle_parking')
+    p.add_argument('point', nargs='*', help='lat,lon')
+    p.add_argument('--points', metavar='CSV', help='csv file with lat and lon columns')
+    p.add_argument('--db', default=database.sqlite_file)
+    p.add_argument('--k', type=int, default=nearby.K, help='nodes per point')
+    p.set_defaults(func=cmd_nearest)
+
+    p = sub.add_parser('graph', help='build the routing graph of the highway ways')
+    p.add_argument('--out', default=routing.GRAPH_PATH)
+    p.add_argument('--highway', action='append',
+                   help='only use ways with this highway value; may be repeated '
+                        '(default: all but {0})'.format(', '.join(routing.EXCLUDED_HIGHWAYS)))
+    p.add_argument('--no-oneway', action='store_true', help='ignore oneway tags (walking)')
+    p.add_argument('--landmarks', type=int, default=routing.LANDMARKS,
+                   help='landmarks for faster routes; 0 for none (default %(default)s)')
+    p.set_defaults(func=cmd_graph)
+
+    p = sub.add_parser('route', help='shortest path between nodes, or distances to several')
+    p.add_argument('source', help="node id, or 'lat,lon' for the nearest graph node")
+    p.add_argument('targets', nargs='+', help="node ids or 'lat,lon'")
+    p.add_argument('--graph', default=routing.GRAPH_PATH)
+    p.set_defaults(func=cmd_route)
+
+    p = sub.add_parser('all', help='audit (with --audit), export, load and report')
+    export_options(p)
+    p.add_argument('--audit', action='store_true', help='also run the audit stage')
+    load_options(p)
+    p.add_argument('--out', default=REPORT_PATH, help='report file')
+    report_options(p)
+    p.set_defaults(func=cmd_all)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Like make -C, every path is relative to the work directory
+    if args.workdir:
+        os.chdir(args.workdir)
+    args.func(args, Artifacts())
+    return 0
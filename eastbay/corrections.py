@@ -0,0 +1,246 @@
+# coding: utf-8
+
+"""Suggested mapping and city_mapping entries for unexpected street types and cities.
+
+audit and audit2 list the street types and city names that are not in
+expected and expected_cities; the typo mappings in clean.py were then written
+by hand. Corrector matches each such value against the expected list instead,
+trying in order:
+
+    1. case and punctuation only: 'street', 'OAKLAND', 'Oakland, CA'
+    2. edit distance (with swapped letters) at most len // 4, from a BK-tree of the
+       expected names: 'Avenie', 'Okaland', 'Emeyville'
+    3. abbreviation: the letters in order, from the same first letter: 'Blvd', 'Ave'.
+       Of several, the one with the same last letter too ('Ct' is Court, not Center)
+
+A value with two equally good matches is left out as ambiguous ('Pl': Place or
+Plaza). Results are memoized per distinct value, so a value is matched once
+however often it appears.
+
+    street_corrector = Corrector(expected)
+    street_corrector.correct('Aveenue')   # -> ('Avenue', 'distance 1')
+    suggestions = suggest_mappings('eastbay.osm')
+    suggestions['street_types']['new']    # {'Avenie': 'Avenue', ...}, not yet in mapping
+"""
+
+from collections import Counter
+from timeit import default_timer as timer
+
+from eastbay.audits import city_re, expected, expected_cities
+from eastbay.clean import city_mapping, mapping, street_type_re
+from eastbay.osm import iterparse_clear
+
+# Values shorter than this are only matched as abbreviations
+MIN_DISTANCE_LENGTH = 4
+# State names dropped from the end of a city ('Oakland, CA')
+STATES = ('ca', 'california')
+
+
+def edit_distance(a, b):
+    """Fewest edits (insert, delete, replace, swap two neighbours) turning a into b.
+
+    Damerau-Levenshtein with swaps anywhere (Lowrance-Wagner), not only of
+    untouched letters: unlike that restricted form it is a metric, which
+    BKTree relies on ('ca' -> 'abc' is 2, not 3).
+    """
+    far = len(a) + len(b)
+    n = len(b)
+    # rows[i + 1][j + 1]: distance from a[:i] to b[:j]; row and column 0 stand for 'too far'
+    rows = [[far] * (n + 2), [far] + list(range(n + 1))]
+    # Last row of a holding each letter
+    last_row = {}
+    for i in range(1, len(a) + 1):
+        letter = a[i - 1]
+        above = rows[i]
+        row = [far, i] + [0] * n
+        # Last column of b in this row matching letter
+        last_col = 0
+        for j in range(1, n + 1):
+            other = b[j - 1]
+            k, l = last_row.get(other, 0), last_col
+            if letter == other:
+                best = above[j]
+                last_col = j
+            else:
+                best = min(above[j], row[j], above[j + 1]) + 1
+            if k and l:
+                # Swap a[k - 1] and letter, deleting and inserting what is between them
+                swap = rows[k][l] + i - k + j - l - 1
+                if swap < best:
+                    best = swap
+            row[j + 1] = best
+        rows.append(row)
+        last_row[letter] = i
+    return rows[-1][-1]
+
+
+class BKTree(object):
+    """Words arranged by edit distance, to find all words within a distance of a query.
+
+    Each node keeps its children by their distance to it; by the triangle
+    inequality only the children between d - radius and d + radius of a node d
+    away from the query can be within radius.
+    """
+
+    def __init__(self, words=()):
+        self.root = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        if self.root is None:
+            self.root = (word, {})
+            return
+        node = self.root
+        while True:
+            d = edit_distance(word, node[0])
+            if d == 0:
+                return
+            if d not in node[1]:
+                node[1][d] = (word, {})
+                return
+            node = node[1][d]
+
+    def search(self, word, radius):
+        """Return [(distance, word)] of the words within radius, nearest first."""
+        found = []
+        nodes = [self.root] if self.root is not None else []
+        while nodes:
+            node_word, children = nodes.pop()
+            # The length difference is a lower bound of the distance; past radius
+            # and every child's distance plus radius, neither could be found
+            if abs(len(word) - len(node_word)) > radius + max(children or [0]):
+                continue
+            d = edit_distance(word, node_word)
+            if d <= radius:
+                found.append((d, node_word))
+            nodes.extend(child for distance, child in children.items()
+                         if d - radius <= distance <= d + radius)
+        return sorted(found)
+
+
+def fold(value):
+    """Lower case, without dots, commas and a final state: 'Oakland, CA' -> 'oakland'"""
+    words = value.replace('.', ' ').replace(',', ' ').lower().split()
+    if len(words) > 1 and words[-1] in STATES:
+        words.pop()
+    return ' '.join(words)
+
+
+def is_abbreviation(short, full):
+    """True if the letters of short appear in order in full, starting with its first."""
+    if len(short) < 2 or len(short) >= len(full) or short[0] != full[0]:
+        return False
+    rest = iter(full[1:])
+    return all(letter in rest for letter in short[1:])
+
+
+class Corrector(object):
+    """Match values against a list of expected names, remembering each value's result.
+
+    Args:
+        names (list): the expected names, e.g. audits.expected
+    """
+
+    def __init__(self, names):
+        self.names = dict((fold(name), name) for name in names)
+        self.tree = BKTree(self.names)
+        self.memo = {}
+
+    def correct(self, value):
+        """Return (expected name, how it matched), or (None, reason) if there is no single match."""
+        if value not in self.memo:
+            self.memo[value] = self.match(value)
+        return self.memo[value]
+
+    def match(self, value):
+        key = fold(value)
+        if not key:
+            return None, 'empty'
+        if key in self.names:
+            return self.names[key], 'case'
+        if len(key) >= MIN_DISTANCE_LENGTH:
+            found = self.tree.search(key, len(key) // 4)
+            if found:
+                best = [word for d, word in found if d == found[0][0]]
+                if len(best) > 1:
+                    return None, 'ambiguous: ' + ', '.join(sorted(self.names[w] for w in best))
+                return self.names[best[0]], 'distance {0}'.format(found[0][0])
+        found = [word for word in self.names if is_abbreviation(key, word)]
+        if len(found) > 1:
+            found = [word for word in found if word[-1] == key[-1]] or found
+        if len(found) > 1:
+            return None, 'ambiguous: ' + ', '.join(sorted(self.names[w] for w in found))
+        if found:
+            return self.names[found[0]], 'abbreviation'
+        return None, 'no match'
+
+    def suggest(self, counts, known=None):
+        """Correct each distinct value of a Counter.
+
+        Args:
+            counts (Counter): number of times each unexpected value was seen
+            known (dictionary, defaults to None): current mapping; its keys are not 'new'
+
+        Returns:
+            dictionary with 'mapping' (value: correction for every matched value),
+            'new' (those not in known), 'unmatched' ([value, count, reason], most
+            frequent first) and 'how' (value: how it matched)
+        """
+        known = known or {}
+        suggested, how, unmatched = {}, {}, []
+        for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+            name, reason = self.correct(value)
+            if name is None:
+                unmatched.append([value, count, reason])
+            elif name != value:
+                suggested[value] = name
+                how[value] = reason
+        return {'mapping': suggested,
+                'new': dict((value, name) for value, name in suggested.items() if value not in known),
+                'unmatched': unmatched, 'how': how}
+
+
+def unexpected_values(filename):
+    """Count the street types and cities of an .osm file that are not expected, in one pass.
+
+    Street types are the last word of addr:street as in audit; cities are the
+    whole addr:city value.
+
+    Returns:
+        (street type Counter, city Counter)
+    """
+    street_types, cities = Counter(), Counter()
+    for _, element in iterparse_clear(filename):
+        if element.tag != 'tag':
+            continue
+        k = element.attrib['k']
+        if k == 'addr:street':
+            m = street_type_re.search(element.attrib['v'])
+            if m and m.group() not in expected:
+                street_types[m.group()] += 1
+        elif k == 'addr:city':
+            city = element.attrib['v']
+            if city_re.search(city) and city not in expected_cities:
+                cities[city] += 1
+    return street_types, cities
+
+
+def suggest_mappings(filename):
+    """Return suggested mapping and city_mapping entries for an .osm file.
+
+    Args:
+        filename (string): name of .osm file
+
+    Returns:
+        dictionary with 'street_types' and 'cities' (see Corrector.suggest, against
+        clean.mapping and clean.city_mapping), the 'distinct' values of each and the
+        'seconds' spent matching them
+    """
+    street_types, cities = unexpected_values(filename)
+    start = timer()
+    result = {'street_types': Corrector(expected).suggest(street_types, mapping),
+              'cities': Corrector(expected_cities).suggest(cities, city_mapping)}
+    result['seconds'] = timer() - start
+    result['distinct'] = {'street_types': len(street_types), 'cities': len(cities)}
+    return result
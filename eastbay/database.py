@@ -0,0 +1,349 @@
+# coding: utf-8
+
+""" Uploading csv files to sql from python.
+Ref: https://discussions.udacity.com/t/creating-db-file-from-csv-files-with-non-ascii-unicode-characters/174958/7
+"""
+
+import calendar
+import csv
+import sqlite3
+
+from eastbay.export import (NODES_PATH, NODE_TAGS_PATH, WAYS_PATH, WAY_NODES_PATH, WAY_TAGS_PATH,
+                            ANONYMOUS_FIELDS, MISSING, MISSING_FIELDS)
+from eastbay.addresses import build_address_table, drop_address_table
+from eastbay.search import build_search_index, drop_search_index
+from eastbay.tiles import build_tile_counts, drop_tile_counts
+
+# Create database file in same file as notebook
+sqlite_file = 'eastbay.db'
+
+# Columns of each table, in the same order as its csv file.
+# Reference: https://discussions.udacity.com/t/upload-my-csv-files-sqlite/190795/5
+NODE_COLUMNS = [('id', 'INTEGER'), ('lat', 'NUMERIC'), ('lon', 'NUMERIC'), ('user', 'TEXT'),
+                ('uid', 'INTEGER'), ('version', 'TEXT'), ('changeset', 'INTEGER'),
+                ('timestamp', 'TIMESTAMP')]
+WAY_COLUMNS = [('id', 'INTEGER'), ('user', 'TEXT'), ('uid', 'INTEGER'), ('version', 'INTEGER'),
+               ('changeset', 'INTEGER'), ('timestamp', 'TIMESTAMP')]
+TAG_COLUMNS = [('id', 'INTEGER'), ('key', 'TEXT'), ('value', 'TEXT'), ('type', 'TEXT')]
+WAY_NODE_COLUMNS = [('id', 'INTEGER'), ('node_id', 'INTEGER'), ('position', 'INTEGER')]
+
+# Table name, csv file it is loaded from and columns, in load order.
+TABLE_COLUMNS = [
+    ('nodes_tags', NODE_TAGS_PATH, TAG_COLUMNS),
+    ('ways', WAYS_PATH, WAY_COLUMNS),
+    ('nodes', NODES_PATH, NODE_COLUMNS),
+    ('ways_tags', WAY_TAGS_PATH, TAG_COLUMNS),
+    ('ways_nodes', WAY_NODES_PATH, WAY_NODE_COLUMNS),
+]
+
+# One row per contributor; nodes and ways refer to it by uid
+USERS_SQL = 'CREATE TABLE users(uid INTEGER PRIMARY KEY, user TEXT)'
+
+# With encode_tags, the tag tables keep small integer codes for 'key' and 'type'
+# in <table>_data, and nodes_tags and ways_tags become views that look the text up.
+# Every code has a row in its lookup table, so LEFT JOIN returns the same rows as JOIN;
+# it lets sqlite skip the lookup of a column the query does not use.
+TAG_TABLES = ('nodes_tags', 'ways_tags')
+ENCODED_TAG_COLUMNS = [('id', 'INTEGER'), ('key_id', 'INTEGER'), ('value', 'TEXT'),
+                       ('type_id', 'INTEGER')]
+# Encoded csv field, lookup table and its CREATE statement
+TAG_CODES = [
+    ('key', 'tag_keys', 'CREATE TABLE tag_keys(key_id INTEGER PRIMARY KEY, key TEXT UNIQUE)'),
+    ('type', 'tag_types', 'CREATE TABLE tag_types(type_id INTEGER PRIMARY KEY, type TEXT UNIQUE)'),
+]
+TAG_VIEW_SQL = """CREATE VIEW {0} AS
+SELECT d.id AS id, tag_keys.key AS key, d.value AS value, tag_types.type AS type
+FROM {0}_data d
+    LEFT JOIN tag_keys ON tag_keys.key_id = d.key_id
+    LEFT JOIN tag_types ON tag_types.type_id = d.type_id"""
+
+# With typed, nodes and ways store versions as integers, timestamps as seconds since
+# 1970-01-01 UTC and lat/lon as integer units of 1e-7 degrees (OSM's own precision).
+COORD_SCALE = 10 ** 7
+TYPED_TABLES = ('nodes', 'ways')
+TYPED_COLUMNS = {'lat': 'INTEGER', 'lon': 'INTEGER', 'version': 'INTEGER',
+                 'timestamp': 'INTEGER'}
+
+def fixed_point(degrees):
+    """'37.8043514' -> 378043514"""
+    return int(round(float(degrees) * COORD_SCALE))
+
+def epoch_seconds(timestamp):
+    """'2016-03-05T19:43:26Z' -> 1457207006"""
+    return calendar.timegm((int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10]),
+                            int(timestamp[11:13]), int(timestamp[14:16]), int(timestamp[17:19])))
+
+def coord_scale(conn):
+    """Units per degree of nodes.lat and lon in a database: COORD_SCALE if typed, else 1."""
+    for _, name, column_type, _, _, _ in conn.execute('PRAGMA table_info(nodes);'):
+        if name == 'lat':
+            return COORD_SCALE if column_type == 'INTEGER' else 1
+    return 1
+
+# Converters for the typed columns; other columns keep their csv text and column affinity
+CONVERTERS = {'lat': fixed_point, 'lon': fixed_point, 'version': int,
+              'timestamp': epoch_seconds}
+
+# With clustered, these tables are WITHOUT ROWID tables stored in primary key order,
+# so the tags of an element and the nodes of a way are read from neighbouring pages.
+# (id, key) alone is not unique: 'street' and 'addr:street' both have key 'street'.
+CLUSTER_KEYS = {
+    'nodes_tags': ('id', 'key', 'type'),
+    'ways_tags': ('id', 'key', 'type'),
+    'ways_nodes': ('id', 'position'),
+}
+ENCODED_NAMES = {'key': 'key_id', 'type': 'type_id'}
+# Page size for clustered databases; small tag rows fit many to a page either way,
+# and larger pages make the full scans of the report queries read fewer pages.
+CLUSTERED_PAGE_SIZE = 8192
+
+def table_specs(users=True, encode_tags=False, typed=False, clustered=False):
+    """Return (table, csv file, CREATE statement, csv fields) for each table, in load order.
+    
+    Args:
+        users (Boolean, defaults to True): leave the 'user' column out of nodes and ways;
+            create_db stores the names once in the users table instead
+        encode_tags (Boolean, defaults to False): load the tag tables into
+            nodes_tags_data and ways_tags_data, with integer key_id and type_id columns
+        typed (Boolean, defaults to False): integer lat, lon, version and timestamp
+            columns on nodes and ways
+        clustered (Boolean, defaults to False): WITHOUT ROWID tag and way node tables
+            with the primary keys in CLUSTER_KEYS
+    """
+    specs = []
+    for table, csv_path, columns in TABLE_COLUMNS:
+        if users:
+            columns = [column for column in columns if column[0] != 'user']
+        if typed and table in TYPED_TABLES:
+            columns = [(name, TYPED_COLUMNS.get(name, kind)) for name, kind in columns]
+        fields = [name for name, _ in columns]
+        key = CLUSTER_KEYS.get(table)
+        if encode_tags and table in TAG_TABLES:
+            table, columns = table + '_data', ENCODED_TAG_COLUMNS
+            key = tuple(ENCODED_NAMES.get(name, name) for name in key)
+        create_sql = 'CREATE TABLE {0}({1})'.format(
+            table, ', '.join('{0} {1}'.format(name, kind) for name, kind in columns))
+        if clustered and key:
+            create_sql = '{0}, PRIMARY KEY ({1})) WITHOUT ROWID'.format(create_sql[:-1], ', '.join(key))
+        specs.append((table, csv_path, create_sql, fields))
+    return specs
+
+TABLES = table_specs()
+
+def drop(cur, name):
+    """Drop a table or view if it exists; switching layouts turns one into the other."""
+    cur.execute("SELECT type FROM sqlite_master WHERE name = ? AND type IN ('table', 'view')",
+                (name,))
+    row = cur.fetchone()
+    if row:
+        cur.execute('DROP {0} {1};'.format(row[0].upper(), name))
+
+def collect_users(rows, names):
+    """Yield each csv row, recording its uid and user name in 'names' on the way."""
+    for row in rows:
+        names[row['uid']] = row['user']
+        yield row
+
+def encode_fields(rows, codes):
+    """Yield each csv row with the values of the fields in 'codes' replaced by integer codes.
+    
+    Args:
+        rows (iterator): csv rows as dictionaries
+        codes (dictionary): field name: dictionary of value: code, extended with new values
+    """
+    for row in rows:
+        for field, values in codes.items():
+            row[field] = values.setdefault(row[field], len(values) + 1)
+        yield row
+
+def convert_fields(rows):
+    """Yield each csv row with missing attributes as None and the typed columns converted.
+
+    Only MISSING_FIELDS, and ANONYMOUS_FIELDS when all of them are MISSING, are
+    taken as missing; other MISSING values (changeset 99999999) are kept.
+    """
+    for row in rows:
+        if all(row[field] == MISSING for field in ANONYMOUS_FIELDS):
+            for field in ANONYMOUS_FIELDS:
+                row[field] = None
+        for field in MISSING_FIELDS:
+            if row[field] == MISSING:
+                row[field] = None
+        for field, convert in CONVERTERS.items():
+            if field in row and row[field] is not None:
+                row[field] = convert(row[field])
+        yield row
+
+def db_value(value):
+    """Decode csv text for sqlite; integer codes and typed values are inserted as they are."""
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+def chain(transforms):
+    """Return one transform for load_table that applies each of 'transforms' in turn."""
+    if not transforms:
+        return None
+    def transform(rows):
+        for t in transforms:
+            rows = t(rows)
+        return rows
+    return transform
+
+def load_table(conn, table, csv_path, create_sql, fields, transform=None):
+    """Drop and recreate a table, then insert every row of its csv file.
+    
+    Args:
+        conn (sqlite3 connection): connection to the database
+        table (string): name of table
+        csv_path (string): csv file written by process_map
+        create_sql (string): CREATE TABLE statement, with one column per field
+        fields (list): csv fields, in the same order as the table's columns
+        transform (function, defaults to None): takes the iterator of csv rows
+            (dictionaries) and returns the rows to insert
+    """
+    cur = conn.cursor()
+
+    # Check if the table already exists, drop it if it does
+    drop(cur, table)
+    cur.execute(create_sql)
+    conn.commit()
+
+    # Read in the csv file as a dictionary and insert the rows as tuples.
+    # A generator keeps only one row in memory at a time.
+    with open(csv_path, 'rb') as fin:
+        dr = csv.DictReader(fin) # comma is default delimiter
+        if transform is not None:
+            dr = transform(dr)
+        to_db = (tuple(db_value(i[field]) for field in fields) for i in dr)
+        # include the '.decode("utf-8")' if I get long error about 8-bit bytestrings.
+
+        # Insert the formatted data
+        cur.executemany("INSERT INTO {0} VALUES ({1});".format(
+            table, ', '.join('?' * len(fields))), to_db)
+        # rowcount stays -1 if the csv file has no rows
+        inserted = max(cur.rowcount, 0)
+    conn.commit()
+
+    # Check that data imported properly, without reading every row back
+    cur.execute('SELECT COUNT(*) FROM {0}'.format(table))
+    count = cur.fetchone()[0]
+    if count != inserted:
+        raise ValueError("{0}: inserted {1} rows but table has {2}".format(table, inserted, count))
+
+def load_users(conn, names):
+    """Drop and recreate the users table from a dictionary of uid: user name."""
+    cur = conn.cursor()
+    drop(cur, 'users')
+    cur.execute(USERS_SQL)
+    cur.executemany('INSERT INTO users(uid, user) VALUES (?, ?);',
+                    ((uid.decode('utf-8'), user.decode('utf-8')) for uid, user in names.items()))
+    conn.commit()
+
+def load_tag_codes(conn, codes):
+    """Create the tag_keys and tag_types lookup tables, and the nodes_tags and ways_tags views.
+    
+    Args:
+        conn (sqlite3 connection): connection to the database
+        codes (dictionary): csv field: dictionary of value: code, as filled in by encode_fields
+    """
+    cur = conn.cursor()
+    for field, table, create_sql in TAG_CODES:
+        drop(cur, table)
+        cur.execute(create_sql)
+        cur.executemany('INSERT INTO {0} VALUES (?, ?);'.format(table),
+                        ((code, value.decode('utf-8')) for value, code in codes[field].items()))
+    for table in TAG_TABLES:
+        drop(cur, table)
+        cur.execute(TAG_VIEW_SQL.format(table))
+    conn.commit()
+
+def create_db(sqlite_file, users=True, encode_tags=False, typed=False, clustered=False,
+              page_size=None, search=False, tiles=False, addresses=False):
+    """Create the database with all five tables from the csv files.
+    
+    Args:
+        sqlite_file (string): name of database file
+        users (Boolean, defaults to True): store each user name once, in a users(uid, user)
+            table, and only the integer uid on nodes and ways. A uid whose name changed
+            between edits keeps the last name loaded. With users=False, nodes and ways
+            keep the 'user' column as in the csv files, and run_reports groups the
+            user reports on it (reports.USER_TEXT_REPORTS).
+        encode_tags (Boolean, defaults to False): store tag keys and types as integer
+            codes into the tag_keys and tag_types tables. nodes_tags and ways_tags are
+            then read-only views with the same columns, so queries on them still work;
+            run_reports runs the reports that filter on a key as
+            reports.ENCODED_TAG_REPORTS, which compare the integer key_id instead.
+        typed (Boolean, defaults to False): store lat and lon as integer 1e-7 degrees
+            (divide by COORD_SCALE), version as an integer, timestamp as epoch seconds
+            (datetime(timestamp, 'unixepoch') reads it back) on nodes and ways, and
+            attributes missing from the .osm file as NULL instead of MISSING (see
+            export.MISSING_FIELDS; a changeset of 99999999 is kept).
+        clustered (Boolean, defaults to False): store nodes_tags, ways_tags and ways_nodes
+            as WITHOUT ROWID tables ordered by element id (see CLUSTER_KEYS). A repeated
+            key on one element raises sqlite3.IntegrityError.
+        page_size (int, defaults to None): database page size in bytes, a power of two
+            from 512 to 65536; CLUSTERED_PAGE_SIZE if clustered, else sqlite's default.
+            The database is vacuumed after loading when either option is given, which
+            also applies a new page size to an existing file (taken out of WAL mode for
+            the VACUUM).
+        search (Boolean, defaults to False): build the full-text search index of tag
+            values (search_tags and tag_search, see search.py) after loading.
+        tiles (Boolean, defaults to False): count the nodes in each map tile, in all and
+            per amenity and shop, into tile_counts (see tiles.py; needs NumPy).
+        addresses (Boolean, defaults to False): pivot the addr tags of nodes and ways into
+            the addresses table, indexed by normalized street and number (see addresses.py).
+    """
+    conn = sqlite3.connect(sqlite_file)
+    cur = conn.cursor()
+    if clustered and page_size is None:
+        page_size = CLUSTERED_PAGE_SIZE
+    if page_size:
+        # A WAL database (every earlier load, see below) keeps its page size through
+        # VACUUM, so leave WAL first; it is turned back on at the end
+        cur.execute('PRAGMA journal_mode = DELETE;')
+        # Takes effect at once on a new file, and at the VACUUM below on an existing one
+        cur.execute('PRAGMA page_size = {0:d};'.format(page_size))
+    names = {}
+    codes = dict((field, {}) for field, _, _ in TAG_CODES)
+    for table, csv_path, create_sql, fields in table_specs(users, encode_tags, typed, clustered):
+        transforms = []
+        if typed and table in TYPED_TABLES:
+            transforms.append(convert_fields)
+        if users and table in ('nodes', 'ways'):
+            transforms.append(lambda rows: collect_users(rows, names))
+        if table.endswith('_data'):
+            transforms.append(lambda rows: encode_fields(rows, codes))
+        load_table(conn, table, csv_path, create_sql, fields, chain(transforms))
+    if users:
+        if typed:
+            # Anonymous edits have a NULL uid, not a user
+            names.pop(None, None)
+        load_users(conn, names)
+    else:
+        drop(cur, 'users')
+    if encode_tags:
+        load_tag_codes(conn, codes)
+    else:
+        for table in [t + '_data' for t in TAG_TABLES] + [t for _, t, _ in TAG_CODES]:
+            drop(cur, table)
+    conn.commit()
+    if search:
+        build_search_index(conn)
+    else:
+        drop_search_index(conn)
+    if tiles:
+        build_tile_counts(conn, scale=COORD_SCALE if typed else 1)
+    else:
+        drop_tile_counts(conn)
+    if addresses:
+        build_address_table(conn, scale=COORD_SCALE if typed else 1)
+    else:
+        drop_address_table(conn)
+    if clustered or page_size:
+        # Rebuild the file without the free pages left by dropped tables
+        cur.execute('VACUUM;')
+    # Count loads, so cached query results from an earlier load are not reused (see cache.py)
+    generation = cur.execute('PRAGMA user_version;').fetchone()[0]
+    cur.execute('PRAGMA user_version = {0:d};'.format(generation + 1))
+    # Readers of a WAL database do not block each other or a writer (see reports.run_reports)
+    cur.execute('PRAGMA journal_mode = WAL;')
+    conn.close()
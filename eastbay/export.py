@@ -0,0 +1,341 @@
+# coding: utf-8
+
+"""Shape the .osm elements into rows and write the five csv files.
+
+cerberus and schema.py are only imported when an export is validated.
+"""
+
+import csv
+import codecs
+import re
+from timeit import default_timer as timer
+
+from eastbay.clean import clean_city_name, clean_st_name, clean_zip, clean_zip1, city_mapping, mapping
+from eastbay.osm import get_element
+from eastbay.pipeline import Pipeline, QUEUE_SIZE
+
+#OSM_PATH = "example2_osm.xml" #revised to use the right file.
+
+NODES_PATH = "nodes.csv"
+NODE_TAGS_PATH = "nodes_tags.csv"
+WAYS_PATH = "ways.csv"
+WAY_NODES_PATH = "ways_nodes.csv"
+WAY_TAGS_PATH = "ways_tags.csv"
+CSV_PATHS = [NODES_PATH, NODE_TAGS_PATH, WAYS_PATH, WAY_NODES_PATH, WAY_TAGS_PATH]
+
+LOWER_COLON = re.compile(r'^([a-z]|_)+:([a-z]|_)+')
+PROBLEMCHARS = re.compile(r'[=\+/&<>;\'"\?%#$@\,\. \t\r\n]')
+
+# Make sure the fields order in the csvs matches the column order in the sql table schema
+NODE_FIELDS = ['id', 'lat', 'lon', 'user', 'uid', 'version', 'changeset', 'timestamp']
+NODE_TAGS_FIELDS = ['id', 'key', 'value', 'type']
+WAY_FIELDS = ['id', 'user', 'uid', 'version', 'changeset', 'timestamp']
+WAY_TAGS_FIELDS = ['id', 'key', 'value', 'type']
+WAY_NODES_FIELDS = ['id', 'node_id', 'position']
+
+# Written for attributes missing from an element (anonymous edits have no user or uid);
+# the schema requires every field. create_db(typed=True) loads it as NULL where it
+# cannot be a real value: in the MISSING_FIELDS, and in the ANONYMOUS_FIELDS when both
+# are MISSING. A real uid or changeset can be 99999999, so it is never NULL on its own.
+MISSING = "99999999"
+MISSING_FIELDS = frozenset(['version', 'timestamp'])
+ANONYMOUS_FIELDS = ('user', 'uid')
+
+## Trying to add cleaning of zips and addresses
+def shape_element(element, node_attr_fields=NODE_FIELDS, way_attr_fields=WAY_FIELDS,
+                  problem_chars=PROBLEMCHARS, default_tag_type='regular', metrics=None):
+    """Clean and shape node or way XML element to Python dict.
+    
+    Calls on 'clean_st_name', 'clean_city_name', and 'clean_zip' functions to clean 
+    street names, city name, and zip code before including in database.
+    
+    Args:
+        element (string):
+        node_attr_fields (list, defaults to NODE_FIELDS): list of fields for 'node' elements
+        way_attr_fields (list, defaults to WAY_FIELDS): list of fields for 'way' elements
+        problem_chars (re expression, defaults to PROBLEMCHARS): problematic characters, as defined by regex
+        default_tag_type (string, defaults to 'regular'): unless specified, tag type is 'regular'
+        metrics (ExportMetrics, defaults to None): if given, time the cleaning functions
+            and count cleaned and rejected values
+        
+    Returns:
+        Dictionary 
+    """
+    if metrics is None:
+        st_name, city_name, zip_check, zip_clean = clean_st_name, clean_city_name, clean_zip, clean_zip1
+    else:
+        st_name, city_name, zip_check, zip_clean = metrics.cleaners
+
+    node_attribs = {}
+    way_attribs = {}
+    way_nodes = []
+    tags = []  # Handle secondary tags the same way for both node and way elements
+
+    if element.tag == 'node': #https://discussions.udacity.com/t/help-cleaning-data/169833/6
+        for node in NODE_FIELDS: 
+            try:
+                node_attribs[node] = element.attrib[node]
+            except:
+                #print {'node':node_attribs, 'node_tags':tags}
+                node_attribs[node] = MISSING
+                #https://discussions.udacity.com/t/project-problem-cant-get-through-validate-element-el-validator/179544/28
+        
+        for tag in element.iter("tag"):
+            key = tag.attrib['k']
+            if re.search(PROBLEMCHARS, key):
+                pass            
+            else:
+                tagdic = {}
+                tagdic['id'] = node_attribs['id']
+                # If there's a colon, use only text after colon - only applies to first colon
+                if ':' in key: 
+                    #Split once on a colon, take string after the split; assign before the split to 'type'
+                    ## Added this section to clean street name and zip code.
+                    if key == "addr:street":
+                        tagdic['value'] = st_name(tag.attrib['v'], mapping)
+                        tagdic['key'] = key.split(':',1)[1]
+                        tagdic['type'] = key.split(':',1)[0]
+                    elif key == "addr:city":
+                        tagdic['value'] = city_name(tag.attrib['v'], city_mapping)
+                        tagdic['key'] = key.split(':',1)[1]
+                        tagdic['type'] = key.split(':',1)[0]
+                    elif key == "addr:postcode":
+                        value = tag.attrib['v'].strip()
+                        if zip_check(value):
+                            tagdic['value'] = zip_clean(value)
+                            tagdic['key'] = key.split(':',1)[1]
+                            tagdic['type'] = key.split(':',1)[0]
+                        else:
+                            continue 
+                            #https://discussions.udacity.com/t/project-problem-cant-get-through-validate-element-el-validator/179544/43
+                    else: # 'key' has a colon but is not "addr:street" or "addr:postcode"
+                        tagdic['key'] = key.split(':',1)[1]
+                        tagdic['type'] = key.split(':',1)[0]
+                        tagdic['value'] = tag.attrib['v']
+    
+                else:
+                    tagdic['key'] = key
+                    tagdic['type'] = "regular"
+                    tagdic['value'] = tag.attrib['v']
+                
+                if tagdic: 
+                    if tagdic['key']:
+                        tags.append(tagdic)
+        return {'node': node_attribs, 'node_tags': tags}
+    
+    elif element.tag == 'way':
+        for way in WAY_FIELDS:
+            try:
+                way_attribs[way] = element.attrib[way]
+            except:
+                #print(way)
+                way_attribs[way] = MISSING
+                #https://discussions.udacity.com/t/project-problem-cant-get-through-validate-element-el-validator/179544/28
+        
+        for tag in element.iter("tag"):
+            key = tag.attrib['k']
+            if re.search(PROBLEMCHARS, key):
+                pass            
+            else:
+                tagdic = {}
+                tagdic['id'] = way_attribs['id']
+                # If there's a colon, use only text after colon - only applies to first colon
+                if ':' in key: 
+                    #Split once on a colon, take string after the split; assign before the split to 'type'
+                    ## Added this section to clean street name and zip code.
+                    if key == "addr:street":
+                        tagdic['value'] = st_name(tag.attrib['v'], mapping)
+                        tagdic['key'] = key.split(':',1)[1]
+                        tagdic['type'] = key.split(':',1)[0]
+                    elif key == "addr:city":
+                        tagdic['value'] = city_name(tag.attrib['v'], city_mapping)
+                        tagdic['key'] = key.split(':',1)[1]
+                        tagdic['type'] = key.split(':',1)[0]
+                    elif key == "addr:postcode":
+                        value = tag.attrib['v'].strip()
+                        if zip_check(value):
+                            tagdic['value'] = zip_check(value)
+                            tagdic['key'] = key.split(':',1)[1]
+                            tagdic['type'] = key.split(':',1)[0]
+                        else:
+                            continue 
+
+                    else: # 'key' has a colon but is not "addr:street" or "addr:postcode"
+                        tagdic['key'] = key.split(':',1)[1]
+                        tagdic['type'] = key.split(':',1)[0]
+                        tagdic['value'] = tag.attrib['v']
+    
+                else:
+                    tagdic['key'] = key
+                    tagdic['type'] = "regular"
+                    tagdic['value'] = tag.attrib['v']
+                
+                if tagdic: 
+                    if tagdic['key']:
+                        tags.append(tagdic)
+        
+        tag_num = 0
+        for tag in element.iter("nd"):
+            nd_dic = {}
+            nd_dic['id'] = way_attribs['id']
+            nd_dic['node_id'] = tag.attrib['ref']
+            nd_dic['position'] = tag_num
+            tag_num += 1
+            way_nodes.append(nd_dic)
+        
+        return {'way': way_attribs, 'way_nodes': way_nodes, 'way_tags': tags}
+
+# ================================================== #
+#               Helper Functions                     #
+# ================================================== #
+def load_schema():
+    """Return the schema from schema.py (saved in the working directory)."""
+    # Reference: https://discussions.udacity.com/t/final-project-importing-cerberus-and-schema/177231/2
+    import schema
+    return schema.schema
+
+
+def validate_element(element, validator, schema=None):
+    """Raise ValidationError if element does not match schema (defaults to load_schema())"""
+    import cerberus
+
+    if schema is None:
+        schema = load_schema()
+    if validator.validate(element, schema) is not True:
+        field, errors = next(validator.errors.iteritems())
+        message_string = "\nElement of type '{0}' has the following errors:\n{1}"
+        error_strings = (
+            "{0}: {1}".format(k, v if isinstance(v, str) else ", ".join(v))
+            for k, v in errors.iteritems()
+        )
+        raise cerberus.ValidationError(
+            message_string.format(field, "\n".join(error_strings))
+        )
+
+
+class UnicodeDictWriter(csv.DictWriter, object):
+    """Extend csv.DictWriter to handle Unicode input"""
+
+    def writerow(self, row):
+        super(UnicodeDictWriter, self).writerow({
+            k: (v.encode('utf-8') if isinstance(v, unicode) else v) for k, v in row.iteritems()
+        })
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+
+def shape_elements(elements, validate, metrics=None):
+    """Yield (element, shaped element) for each element; relations are shaped to None.
+    
+    Args:
+        elements (iterator): elements from get_element
+        validate (Boolean): check each shaped element against the schema
+        metrics (ExportMetrics, defaults to None): if given, time shaping and validation
+    """
+    if validate is True:
+        import cerberus
+        validator = cerberus.Validator()
+        schema = load_schema()
+
+    for element in elements:
+        if metrics is not None:
+            start = timer()
+        el = shape_element(element, metrics=metrics)
+        if metrics is not None:
+            start = metrics.done('shape', start)
+        if el and validate is True:
+            validate_element(el, validator, schema)
+            if metrics is not None:
+                metrics.done('validate', start)
+        yield element, el
+
+
+# ================================================== #
+#               Main Function                        #
+# ================================================== #
+def process_map(file_in, validate, metrics=None, checkpoint=None, pipelined=False,
+                queue_size=QUEUE_SIZE, integrity=None):
+    """Iteratively process each XML element and write to csv(s)
+    
+    Args:
+        file_in (string): name of .osm file to be processed and written to csv files
+        validate (Boolean): determines if function is validated throughout processing
+        metrics (ExportMetrics, defaults to None): if given, time each stage and report progress
+        checkpoint (ExportCheckpoint, defaults to None): if given, save progress regularly
+            and resume from the last checkpoint of an interrupted export
+        pipelined (Boolean, defaults to False): parse, shape and write in three threads
+            connected by bounded queues (see eastbay.pipeline); the csv files are the same
+        queue_size (int): batches of elements each queue holds when pipelined
+        integrity (IntegrityCheck, defaults to None): if given, check the way nodes
+            against the nodes as they are written; integrity.finish() has the report.
+            After a resumed checkpoint it only sees the elements written since.
+    
+    Returns:
+        metrics report (dictionary) if metrics is given, else None
+    """
+
+    # Append to the csv files if they were cut back to a checkpoint
+    mode = 'w'
+    if checkpoint is not None and checkpoint.load(file_in, CSV_PATHS):
+        mode = 'a'
+
+    with open(file_in, 'rb') as osm_file,          codecs.open(NODES_PATH, mode) as nodes_file,          codecs.open(NODE_TAGS_PATH, mode) as nodes_tags_file,          codecs.open(WAYS_PATH, mode) as ways_file,          codecs.open(WAY_NODES_PATH, mode) as way_nodes_file,          codecs.open(WAY_TAGS_PATH, mode) as way_tags_file:
+
+        nodes_writer = UnicodeDictWriter(nodes_file, NODE_FIELDS, lineterminator = '\n')
+        node_tags_writer = UnicodeDictWriter(nodes_tags_file, NODE_TAGS_FIELDS, lineterminator = '\n')
+        ways_writer = UnicodeDictWriter(ways_file, WAY_FIELDS, lineterminator = '\n')
+        way_nodes_writer = UnicodeDictWriter(way_nodes_file, WAY_NODES_FIELDS, lineterminator = '\n')
+        way_tags_writer = UnicodeDictWriter(way_tags_file, WAY_TAGS_FIELDS, lineterminator = '\n')
+        
+        ## Added 'lineterminator' to remove spaces between rows in csv file,
+        # Ref: http://stackoverflow.com/questions/11652806/csv-write-skipping-lines-when-writing-to-csv
+
+        if mode == 'w':
+            nodes_writer.writeheader()
+            node_tags_writer.writeheader()
+            ways_writer.writeheader()
+            way_nodes_writer.writeheader()
+            way_tags_writer.writeheader()
+
+        # Relations are not written, but they are counted for checkpoints
+        source = osm_file if checkpoint is None else checkpoint.open(osm_file)
+        elements = get_element(source, tags=('node', 'way', 'relation'))
+        if metrics is not None:
+            elements = metrics.parsed(elements, source)
+
+        if pipelined:
+            # Parse in one thread and shape in another while this one writes
+            shaped = Pipeline(elements, [iter, lambda items: shape_elements(items, validate, metrics)],
+                              queue_size=queue_size)
+        else:
+            shaped = shape_elements(elements, validate, metrics)
+
+        for element, el in shaped:
+            if el:
+                if metrics is not None:
+                    start = timer()
+                if element.tag == 'node':
+                    nodes_writer.writerow(el['node'])
+                    node_tags_writer.writerows(el['node_tags'])
+                    if integrity is not None:
+                        integrity.node(el['node'])
+                elif element.tag == 'way':
+                    ways_writer.writerow(el['way'])
+                    way_nodes_writer.writerows(el['way_nodes'])
+                    way_tags_writer.writerows(el['way_tags'])
+                    if integrity is not None:
+                        integrity.way(el['way'])
+                        integrity.way_nodes(int(el['way']['id']), el['way_nodes'])
+                if metrics is not None:
+                    metrics.done('write', start)
+            if checkpoint is not None:
+                checkpoint.passed(element, (nodes_file, nodes_tags_file, ways_file,
+                                            way_nodes_file, way_tags_file))
+
+        if checkpoint is not None:
+            checkpoint.finish()
+        if metrics is not None:
+            return metrics.finish()
+    
@@ -0,0 +1,230 @@
+# coding: utf-8
+
+"""Clip an .osm file to a bounding box or polygon, keeping the ways that cross it whole.
+
+create_sample keeps every k-th element, so most sampled ways refer to nodes
+that are not in the sample. extract reads the file twice instead:
+
+    1. mark the ids of the nodes inside the area, then of the ways with at
+       least one inside node (and, with complete_ways, of their outside nodes),
+       then of the relations with a kept node or way as a member
+    2. write every marked element, in the order of the input
+
+Ids are kept in IdSet, a sorted array of 8 byte integers, so memory grows
+with the size of the extract, not of the input (OSM ids are spread over
+billions of values, too sparse for a plain bitmap). The input must list nodes
+before the ways that use them, as .osm files do.
+
+    extract('eastbay.osm', 'berkeley.osm', bbox=(37.85, -122.32, 37.90, -122.23))
+    extract('eastbay.osm', 'oakland.osm', polygon=read_poly('oakland.poly'), complete_ways=True)
+"""
+
+import bisect
+import heapq
+from array import array
+
+from eastbay.osm import ET, get_element
+
+try:
+    ID_TYPECODE = array('q').typecode
+except ValueError:
+    # Python 2 has no 'q'; 'l' is 8 bytes on 64 bit Linux and macOS
+    ID_TYPECODE = 'l'
+# Ids sorted in memory at once by IdSet.freeze, as a list of Python ints
+FREEZE_CHUNK = 1 << 20
+
+
+class IdSet(object):
+    """Set of element ids, stored as a sorted array of integers.
+
+    Ids added in increasing order (as .osm files list them) are appended; the
+    array is sorted and deduplicated once before the next lookup otherwise,
+    FREEZE_CHUNK ids at a time, so memory stays near 16 bytes per id.
+    Ids added more than once are counted in 'repeated', and the first
+    'sample' of them kept in 'repeats'.
+    """
+
+    def __init__(self, sample=10):
+        self.ids = array(ID_TYPECODE)
+        self.sorted = True
+        self.repeated = 0
+        self.repeats = []
+        self.sample = sample
+
+    def add(self, element_id):
+        if self.ids and element_id <= self.ids[-1]:
+            self.sorted = False
+        self.ids.append(element_id)
+
+    def freeze(self):
+        """Sort and deduplicate the ids, if they were not added in increasing order."""
+        if self.sorted:
+            return
+        # Move the ids into sorted arrays of FREEZE_CHUNK, shrinking the input as
+        # they go, then merge them: sorting them all as one list of Python ints
+        # would take several times the memory of the array
+        ids, self.ids = self.ids, None
+        chunks = []
+        while ids:
+            chunks.append(array(ID_TYPECODE, sorted(ids[-FREEZE_CHUNK:])))
+            del ids[-FREEZE_CHUNK:]
+        unique = array(ID_TYPECODE)
+        for element_id in heapq.merge(*chunks):
+            if unique and element_id == unique[-1]:
+                self.repeated += 1
+                if len(self.repeats) < self.sample:
+                    self.repeats.append(element_id)
+            else:
+                unique.append(element_id)
+        self.ids = unique
+        self.sorted = True
+
+    def __contains__(self, element_id):
+        self.freeze()
+        i = bisect.bisect_left(self.ids, element_id)
+        return i < len(self.ids) and self.ids[i] == element_id
+
+    def __len__(self):
+        self.freeze()
+        return len(self.ids)
+
+
+def in_bbox(bbox):
+    """Return a function of (lat, lon) that is True inside (south, west, north, east)."""
+    south, west, north, east = bbox
+
+    def inside(lat, lon):
+        return south <= lat <= north and west <= lon <= east
+    return inside
+
+
+def in_ring(lat, lon, ring):
+    """Ray casting: True if the point is inside a ring of (lat, lon) vertices."""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        lat_i, lon_i = ring[i]
+        lat_j, lon_j = ring[j]
+        if (lat_i > lat) != (lat_j > lat) and \
+                lon < (lon_j - lon_i) * (lat - lat_i) / (lat_j - lat_i) + lon_i:
+            inside = not inside
+        j = i
+    return inside
+
+
+def in_polygon(polygon):
+    """Return a function of (lat, lon) that is True inside a polygon.
+
+    Args:
+        polygon (list): (ring, hole) pairs, as returned by read_poly; a point is
+            inside if it is in an odd number of outer rings and no hole
+    """
+    rings = [ring for ring, hole in polygon if not hole]
+    holes = [ring for ring, hole in polygon if hole]
+    points = [point for ring, _ in polygon for point in ring]
+    inside_bbox = in_bbox((min(p[0] for p in points), min(p[1] for p in points),
+                           max(p[0] for p in points), max(p[1] for p in points)))
+
+    def inside(lat, lon):
+        if not inside_bbox(lat, lon):
+            return False
+        if any(in_ring(lat, lon, ring) for ring in holes):
+            return False
+        return sum(1 for ring in rings if in_ring(lat, lon, ring)) % 2 == 1
+    return inside
+
+
+def read_poly(poly_file):
+    """Read an Osmosis .poly file into (ring, hole) pairs of (lat, lon) vertices.
+
+    The file has a name line, then one section per ring (a name line, one
+    'lon lat' line per vertex and END), then END; a ring whose name starts with
+    '!' is a hole. Reference: https://wiki.openstreetmap.org/wiki/Osmosis/Polygon_Filter_File_Format
+    """
+    polygon = []
+    with open(poly_file) as f:
+        lines = [line.strip() for line in f if line.strip()]
+    ring = None
+    for line in lines[1:]:
+        if ring is None:
+            if line == 'END':
+                break
+            ring, hole = [], line.startswith('!')
+        elif line == 'END':
+            polygon.append((ring, hole))
+            ring = None
+        else:
+            lon, lat = line.split()[:2]
+            ring.append((float(lat), float(lon)))
+    return polygon
+
+
+def mark(osm_file, inside, complete_ways=False, relations=True):
+    """First pass: return IdSets of the nodes, ways and relations to keep.
+
+    Returns:
+        dictionary of element name: IdSet; 'node' holds the inside nodes and
+        'outside' the outside nodes of kept ways (empty without complete_ways)
+    """
+    keep = dict((name, IdSet()) for name in ('node', 'outside', 'way', 'relation'))
+    for element in get_element(osm_file):
+        element_id = int(element.attrib['id'])
+        if element.tag == 'node':
+            if inside(float(element.attrib['lat']), float(element.attrib['lon'])):
+                keep['node'].add(element_id)
+        elif element.tag == 'way':
+            refs = [int(nd.attrib['ref']) for nd in element.iter('nd')]
+            if any(ref in keep['node'] for ref in refs):
+                keep['way'].add(element_id)
+                if complete_ways:
+                    for ref in refs:
+                        if ref not in keep['node']:
+                            keep['outside'].add(ref)
+        elif element.tag == 'relation' and relations:
+            for member in element.iter('member'):
+                kind, ref = member.attrib['type'], int(member.attrib['ref'])
+                if (kind == 'node' and ref in keep['node']) or (kind == 'way' and ref in keep['way']):
+                    keep['relation'].add(element_id)
+                    break
+    return keep
+
+
+def extract(osm_file, out_file, bbox=None, polygon=None, complete_ways=False, relations=True):
+    """Write the nodes inside an area, the ways that use them and their relations to a new .osm file.
+
+    Args:
+        osm_file (string): name of .osm file to clip
+        out_file (string): name of .osm file to write
+        bbox (tuple, defaults to None): (south, west, north, east) in degrees
+        polygon (list, defaults to None): (ring, hole) pairs of (lat, lon) vertices
+            (see read_poly); used instead of bbox if both are given
+        complete_ways (Boolean, defaults to False): also write the nodes outside the
+            area that kept ways refer to, so every way is whole. Without it, kept
+            ways keep all their <nd> references, some to nodes not in the extract.
+        relations (Boolean, defaults to True): write relations with a kept node or way
+            as a member; their other members are not added
+
+    Returns:
+        dictionary with the number of nodes, outside nodes, ways and relations written
+    """
+    if polygon is not None:
+        inside = in_polygon(polygon)
+    elif bbox is not None:
+        inside = in_bbox(bbox)
+    else:
+        raise ValueError('extract needs a bbox or a polygon')
+    keep = mark(osm_file, inside, complete_ways, relations)
+
+    with open(out_file, 'wb') as output:
+        output.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+        output.write(b'<osm version="0.6" generator="eastbay extract">\n  ')
+        if bbox is not None and polygon is None:
+            output.write('<bounds minlat="{0}" minlon="{1}" maxlat="{2}" maxlon="{3}"/>\n  '.format(
+                *bbox).encode('utf-8'))
+        for element in get_element(osm_file):
+            element_id = int(element.attrib['id'])
+            if element_id in keep[element.tag] or \
+                    (element.tag == 'node' and element_id in keep['outside']):
+                output.write(ET.tostring(element, encoding='utf-8'))
+        output.write(b'</osm>\n')
+    return dict((name, len(ids)) for name, ids in keep.items())
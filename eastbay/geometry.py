@@ -0,0 +1,229 @@
+# coding: utf-8
+
+"""Way geometries from the csv files, in bounded memory, by external sorting.
+
+Joining ways_nodes to the coordinates of nodes in sqlite or a dictionary
+needs every node in memory or an index over it. Here the join is done by
+sorting instead:
+
+    1. sort ways_nodes by node_id, and nodes by id
+    2. walk both sorted streams together (merge join), giving each
+       (way id, position) the lat/lon of its node, or NaN if it is missing
+    3. sort the result by (way id, position) and yield each way's coordinates
+       and its number of missing nodes
+
+Each sort reads its input in runs of records, sorts each run in memory and
+writes it to a temporary file of fixed-size binary records, then merges the
+runs with heapq.merge (MAX_FAN_IN at a time, in several rounds if there are
+more). The three sorts are active together (the first two are merged lazily
+while the third fills its runs, and an input that fits in one run is kept in
+memory), so each gets a third of 'memory_mb': at most one run per sort, plus
+one buffered block per merged file, is in memory at a time.
+
+    for way_id, coords, missing in way_geometries(memory_mb=64, tmpdir='/scratch'):
+        ...   # coords: [(lat, lon), ...] of the known nodes, in position order
+    write_geometries('way_geometries.csv')   # id,nodes,missing,wkt
+"""
+
+import csv
+import heapq
+import itertools
+import math
+import os
+import shutil
+import struct
+import tempfile
+
+from eastbay.export import NODES_PATH, WAY_NODES_PATH
+
+GEOMETRY_PATH = 'way_geometries.csv'
+MEMORY_MB = 64
+# Estimated bytes per record held in memory (tuple, its numbers and the list slot)
+RECORD_BYTES = 200
+# Run files merged at once
+MAX_FAN_IN = 64
+# Records read from a run file at a time
+READ_RECORDS = 4096
+# Sorts active at once in way_geometries, sharing its memory budget
+SORTS = 3
+
+# Records sort by their first fields, so each sort key comes first
+WAY_NODE = struct.Struct('<qqq')    # node_id, way id, position
+NODE = struct.Struct('<qdd')        # id, lat, lon
+WAY_POINT = struct.Struct('<qqdd')  # way id, position, lat, lon
+# lat and lon of a way node whose node is missing
+NAN = float('nan')
+
+
+def write_run(records, record, tmpdir):
+    """Sort records in memory and write them to a new temporary file; return its path."""
+    records.sort()
+    fd, path = tempfile.mkstemp(suffix='.run', dir=tmpdir)
+    with os.fdopen(fd, 'wb') as f:
+        for i in range(0, len(records), READ_RECORDS):
+            f.write(b''.join(record.pack(*r) for r in records[i:i + READ_RECORDS]))
+    return path
+
+
+def read_run(path, record):
+    """Yield the records of a run file, reading READ_RECORDS at a time."""
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(record.size * READ_RECORDS)
+            if not block:
+                return
+            for offset in range(0, len(block), record.size):
+                yield record.unpack_from(block, offset)
+
+
+def external_sort(records, record, tmpdir, memory_mb=MEMORY_MB, stats=None):
+    """Yield records in sorted order, holding at most about memory_mb of them in memory.
+
+    Args:
+        records (iterator): tuples matching 'record'
+        record (struct.Struct): binary layout of a record in the run files
+        tmpdir (string): directory for the run files; they are deleted as they are merged
+        memory_mb (float): memory budget for one run
+        stats (dictionary, defaults to None): 'runs' is increased by the runs written
+    """
+    run_size = max(int(memory_mb * 1024 * 1024 // RECORD_BYTES), 1)
+    runs = []
+    run = []
+    for r in records:
+        run.append(r)
+        if len(run) >= run_size:
+            runs.append(write_run(run, record, tmpdir))
+            run = []
+    if stats is not None:
+        stats['runs'] = stats.get('runs', 0) + len(runs) + (1 if run and runs else 0)
+    if not runs:
+        # Everything fit in one run
+        run.sort()
+        for r in run:
+            yield r
+        return
+    if run:
+        runs.append(write_run(run, record, tmpdir))
+    del run
+    # Merge rounds, until few enough runs are left to merge in one
+    while len(runs) > MAX_FAN_IN:
+        merged = []
+        for i in range(0, len(runs), MAX_FAN_IN):
+            group = runs[i:i + MAX_FAN_IN]
+            fd, path = tempfile.mkstemp(suffix='.run', dir=tmpdir)
+            with os.fdopen(fd, 'wb') as f:
+                for r in heapq.merge(*[read_run(p, record) for p in group]):
+                    f.write(record.pack(*r))
+            for p in group:
+                os.remove(p)
+            merged.append(path)
+        runs = merged
+    for r in heapq.merge(*[read_run(p, record) for p in runs]):
+        yield r
+    for p in runs:
+        os.remove(p)
+
+
+def read_way_nodes(path):
+    """Yield (node_id, way id, position) for each row of ways_nodes.csv."""
+    with open(path, 'rb') as f:
+        for row in csv.DictReader(f):
+            yield int(row['node_id']), int(row['id']), int(row['position'])
+
+
+def read_nodes(path):
+    """Yield (id, lat, lon) for each row of nodes.csv."""
+    with open(path, 'rb') as f:
+        for row in csv.DictReader(f):
+            yield int(row['id']), float(row['lat']), float(row['lon'])
+
+
+def merge_join(way_nodes, nodes, stats):
+    """Yield (way id, position, lat, lon) for node_id-sorted way nodes and id-sorted nodes.
+
+    Way nodes whose node is missing are counted in stats['missing'] and given
+    NaN coordinates, so they are counted per way after the last sort.
+    """
+    nodes = iter(nodes)
+    node = next(nodes, None)
+    for node_id, way_id, position in way_nodes:
+        while node is not None and node[0] < node_id:
+            node = next(nodes, None)
+        if node is not None and node[0] == node_id:
+            yield way_id, position, node[1], node[2]
+        else:
+            stats['missing'] += 1
+            yield way_id, position, NAN, NAN
+
+
+def way_geometries(nodes_path=NODES_PATH, way_nodes_path=WAY_NODES_PATH, memory_mb=MEMORY_MB,
+                   tmpdir=None, stats=None):
+    """Yield (way id, [(lat, lon), ...], missing nodes) for each way in ways_nodes, by way id.
+
+    The coordinates are those of the known nodes; a way whose nodes are all
+    missing has none.
+
+    Args:
+        nodes_path, way_nodes_path (string): csv files written by process_map
+        memory_mb (int, defaults to MEMORY_MB): memory budget of the join, split
+            evenly among its SORTS sorts
+        tmpdir (string, defaults to None): where run files go (the system default if None);
+            a directory of its own is made in it and removed afterwards
+        stats (dictionary, defaults to None): filled in with ways, way_nodes, missing
+            (way nodes without a node), empty_ways (ways with no known node) and runs
+    """
+    stats = stats if stats is not None else {}
+    stats.update({'ways': 0, 'way_nodes': 0, 'missing': 0, 'empty_ways': 0, 'runs': 0})
+    sort_mb = float(memory_mb) / SORTS
+    workdir = tempfile.mkdtemp(prefix='eastbay_geometry_', dir=tmpdir)
+    try:
+        def counted(rows):
+            for row in rows:
+                stats['way_nodes'] += 1
+                yield row
+
+        by_node = external_sort(counted(read_way_nodes(way_nodes_path)), WAY_NODE, workdir,
+                                sort_mb, stats)
+        nodes = external_sort(read_nodes(nodes_path), NODE, workdir, sort_mb, stats)
+        points = external_sort(merge_join(by_node, nodes, stats), WAY_POINT, workdir,
+                               sort_mb, stats)
+        for way_id, group in itertools.groupby(points, key=lambda point: point[0]):
+            coords, missing = [], 0
+            for _, _, lat, lon in group:
+                if math.isnan(lat):
+                    missing += 1
+                else:
+                    coords.append((lat, lon))
+            stats['ways'] += 1
+            if not coords:
+                stats['empty_ways'] += 1
+            yield way_id, coords, missing
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def wkt(coords):
+    """[(lat, lon), ...] -> 'LINESTRING (lon lat, ...)', POINT for a single node, or LINESTRING EMPTY."""
+    if not coords:
+        return 'LINESTRING EMPTY'
+    points = ', '.join('{0!r} {1!r}'.format(lon, lat) for lat, lon in coords)
+    return ('POINT ({0})' if len(coords) == 1 else 'LINESTRING ({0})').format(points)
+
+
+def write_geometries(out_path=GEOMETRY_PATH, nodes_path=NODES_PATH, way_nodes_path=WAY_NODES_PATH,
+                     memory_mb=MEMORY_MB, tmpdir=None):
+    """Write id, number of known nodes, number of missing nodes and WKT of each way to a csv file.
+
+    Ways with no known node are written with nodes 0 and LINESTRING EMPTY.
+
+    Returns:
+        dictionary with the ways written, way nodes read, missing nodes, empty ways and sort runs
+    """
+    stats = {}
+    with open(out_path, 'w') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(['id', 'nodes', 'missing', 'wkt'])
+        for way_id, coords, missing in way_geometries(nodes_path, way_nodes_path, memory_mb, tmpdir,
+                                                      stats):
+            writer.writerow([way_id, len(coords), missing, wkt(coords)])
+    return stats
@@ -0,0 +1,140 @@
+# coding: utf-8
+
+"""Referential integrity of the exported way nodes, checked in one streaming pass.
+
+IntegrityCheck keeps the node and way ids in IdSets (sorted 8 byte integer
+arrays, see extract.py) and checks each way's rows as they go by:
+
+    dangling        ways_nodes rows whose node_id is not a node
+    duplicate       node or way ids that occur more than once
+    positions       ways whose positions are not 0, 1, 2, ... in order (csv files
+                    only: shape_element always numbers them so)
+    unknown_ways    ways_nodes rows whose id is not a way (csv files only)
+
+Each check reports a count and the first few offenders. Nodes must come
+before the ways that use them, as in .osm files and the csv files.
+
+    check = IntegrityCheck()
+    process_map('eastbay.osm', validate=False, integrity=check)
+    report = check.finish()
+
+or, on csv files written earlier, check_csv() (python -m eastbay integrity).
+"""
+
+import csv
+import itertools
+import json
+
+from eastbay.export import NODES_PATH, WAYS_PATH, WAY_NODES_PATH
+from eastbay.extract import IdSet
+
+# Offenders kept per check
+SAMPLE = 10
+
+
+class IntegrityCheck(object):
+    """Checks node and way rows, as written by process_map or read back from the csv files.
+
+    Args:
+        sample (int): offenders kept per check
+    """
+
+    CHECKS = ('dangling', 'duplicate_nodes', 'duplicate_ways', 'positions', 'unknown_ways')
+
+    def __init__(self, sample=SAMPLE):
+        self.sample = sample
+        self.nodes = IdSet(sample)
+        self.ways = IdSet(sample)
+        self.rows = {'nodes': 0, 'ways': 0, 'way_nodes': 0}
+        self.counts = dict((check, 0) for check in self.CHECKS)
+        self.samples = dict((check, []) for check in self.CHECKS)
+        self.dangling_ways = 0
+
+    def offend(self, check, offender):
+        self.counts[check] += 1
+        if len(self.samples[check]) < self.sample:
+            self.samples[check].append(offender)
+
+    def node(self, row):
+        """Record a nodes row (dictionary with an 'id')."""
+        self.rows['nodes'] += 1
+        self.nodes.add(int(row['id']))
+
+    def way(self, row):
+        """Record a ways row (dictionary with an 'id')."""
+        self.rows['ways'] += 1
+        self.ways.add(int(row['id']))
+
+    def way_nodes(self, way_id, rows, known=True, positions=False):
+        """Check the ways_nodes rows of one way.
+
+        Args:
+            way_id (int): id of the way
+            rows (list): its ways_nodes rows (dictionaries with node_id and position), in order
+            known (Boolean, defaults to True): the way is known to have a ways row;
+                if False, it is looked up
+            positions (Boolean, defaults to False): check the positions, for rows
+                not numbered by shape_element
+        """
+        self.rows['way_nodes'] += len(rows)
+        if not known and way_id not in self.ways:
+            self.offend('unknown_ways', way_id)
+        if positions:
+            numbers = [int(row['position']) for row in rows]
+            if numbers != list(range(len(numbers))):
+                self.offend('positions', [way_id, numbers[:self.sample]])
+        dangling = 0
+        for row in rows:
+            node_id = int(row['node_id'])
+            if node_id not in self.nodes:
+                dangling += 1
+                self.offend('dangling', [way_id, node_id])
+        if dangling:
+            self.dangling_ways += 1
+
+    def finish(self):
+        """Return the row counts and, for each check, the count and first offenders."""
+        # Duplicates are found when the ids are sorted
+        self.nodes.freeze()
+        self.ways.freeze()
+        self.counts['duplicate_nodes'] = self.nodes.repeated
+        self.samples['duplicate_nodes'] = self.nodes.repeats
+        self.counts['duplicate_ways'] = self.ways.repeated
+        self.samples['duplicate_ways'] = self.ways.repeats
+        report = {'rows': dict(self.rows), 'ways_with_dangling': self.dangling_ways,
+                  'ok': not any(self.counts.values())}
+        for check in self.CHECKS:
+            report[check] = {'count': self.counts[check], 'sample': self.samples[check]}
+        return report
+
+
+def check_csv(nodes_path=NODES_PATH, ways_path=WAYS_PATH, way_nodes_path=WAY_NODES_PATH,
+              sample=SAMPLE, report_path=None):
+    """Check the csv files written by process_map, reading each once.
+
+    ways_nodes rows are grouped by consecutive id, as process_map writes them;
+    a way whose rows are split up is checked once per group.
+
+    Args:
+        nodes_path, ways_path, way_nodes_path (string): csv files
+        sample (int): offenders kept per check
+        report_path (string, defaults to None): also save the report as JSON
+
+    Returns:
+        report dictionary (see IntegrityCheck.finish)
+    """
+    check = IntegrityCheck(sample)
+    with open(nodes_path, 'rb') as f:
+        for row in csv.DictReader(f):
+            check.node(row)
+    with open(ways_path, 'rb') as f:
+        for row in csv.DictReader(f):
+            check.way(row)
+    with open(way_nodes_path, 'rb') as f:
+        for way_id, rows in itertools.groupby(csv.DictReader(f), key=lambda row: row['id']):
+            check.way_nodes(int(way_id), list(rows), known=False, positions=True)
+    report = check.finish()
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    return report
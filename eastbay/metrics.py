@@ -0,0 +1,149 @@
+# coding: utf-8
+
+"""Optional timing, throughput and progress reporting for process_map."""
+
+import json
+import os
+import sys
+from timeit import default_timer as timer
+
+from eastbay.clean import clean_city_name, clean_st_name, clean_zip, clean_zip1
+
+
+class ExportMetrics(object):
+    """Collect wall time per stage, throughput and cleaning counts for process_map.
+
+    Stages are parse, shape, clean, validate and write; 'shape' does not include
+    the time spent in the cleaning functions, which is counted under 'clean'.
+    Progress is written to 'stream' every 'progress_every' elements, and finish()
+    returns the metrics (and saves them as JSON if 'report_path' is given).
+    Without an ExportMetrics instance, process_map does no timing at all.
+    When process_map is pipelined the stages run at the same time, so their
+    seconds can add up to more than the wall time.
+
+    Of the postcodes, 'postcodes_dropped' counts the tags shape_element leaves
+    out (clean_zip returned an empty value) and 'postcodes_blank' those written
+    with no value (clean_zip1 returned None).
+    """
+
+    STAGES = ('parse', 'shape', 'clean', 'validate', 'write')
+
+    def __init__(self, report_path=None, progress_every=100000, stream=sys.stderr):
+        self.report_path = report_path
+        self.progress_every = progress_every
+        self.stream = stream
+        self.seconds = dict((stage, 0.0) for stage in self.STAGES)
+        self.counts = {'nodes': 0, 'ways': 0, 'relations': 0, 'streets_cleaned': 0,
+                       'cities_cleaned': 0, 'postcodes_dropped': 0, 'postcodes_blank': 0}
+        self.elements = 0
+        self.filename = None
+        self.total_bytes = None
+        self.position = None
+        self.started = None
+        # Used by shape_element in place of clean_st_name, clean_city_name, clean_zip, clean_zip1
+        self.cleaners = (self.clean_street, self.clean_city, self.check_zip, self.clean_zip)
+
+    def done(self, stage, start):
+        """Add the time since 'start' to a stage and return the current time."""
+        now = timer()
+        self.seconds[stage] += now - start
+        return now
+
+    def clean_street(self, name, mapping):
+        start = timer()
+        cleaned = clean_st_name(name, mapping)
+        self.done('clean', start)
+        if cleaned != name:
+            self.counts['streets_cleaned'] += 1
+        return cleaned
+
+    def clean_city(self, name, city_mapping):
+        start = timer()
+        cleaned = clean_city_name(name, city_mapping)
+        self.done('clean', start)
+        if cleaned != name:
+            self.counts['cities_cleaned'] += 1
+        return cleaned
+
+    def check_zip(self, zipcode):
+        start = timer()
+        cleaned = clean_zip(zipcode)
+        self.done('clean', start)
+        # shape_element writes the tag only if this is true
+        if not cleaned:
+            self.counts['postcodes_dropped'] += 1
+        return cleaned
+
+    def clean_zip(self, zipcode):
+        start = timer()
+        cleaned = clean_zip1(zipcode)
+        self.done('clean', start)
+        # The tag is still written, with an empty value
+        if cleaned is None:
+            self.counts['postcodes_blank'] += 1
+        return cleaned
+
+    def parsed(self, elements, osm_file):
+        """Yield each element from 'elements', timing the parser and reporting progress.
+        
+        Args:
+            elements (iterator): elements from get_element
+            osm_file (file): open .osm file the elements are parsed from
+        """
+        self.filename = getattr(osm_file, 'name', None)
+        self.total_bytes = os.fstat(osm_file.fileno()).st_size
+        self.position = osm_file.tell
+        self.started = timer()
+        elements = iter(elements)
+        while True:
+            start = timer()
+            try:
+                element = next(elements)
+            except StopIteration:
+                self.done('parse', start)
+                return
+            self.done('parse', start)
+            self.elements += 1
+            self.counts[element.tag + 's'] += 1
+            if self.elements % self.progress_every == 0:
+                self.progress()
+            yield element
+
+    def progress(self):
+        """Write one progress line to the stream."""
+        elapsed = timer() - self.started
+        self.stream.write('{0:,} elements, {1:.1f}% of {2:,.0f} MB, {3:,.0f} elements/s, {4:.0f} s\n'.format(
+            self.elements, 100.0 * self.position() / self.total_bytes if self.total_bytes else 100.0,
+            self.total_bytes / 1e6, self.elements / elapsed if elapsed else 0, elapsed))
+        self.stream.flush()
+
+    def report(self):
+        """Return the metrics collected so far as a dictionary."""
+        wall = timer() - self.started
+        seconds = dict(self.seconds)
+        seconds['shape'] -= seconds['clean']
+        stages = {}
+        for stage in self.STAGES:
+            stages[stage] = {
+                'seconds': seconds[stage],
+                'elements_per_sec': self.elements / seconds[stage] if seconds[stage] else None,
+            }
+        return {
+            'input': self.filename,
+            'bytes': self.total_bytes,
+            'elements': self.elements,
+            'wall_seconds': wall,
+            'elements_per_sec': self.elements / wall if wall else None,
+            'other_seconds': wall - sum(seconds.values()),
+            'stages': stages,
+            'counts': dict(self.counts),
+        }
+
+    def finish(self):
+        """Write the final progress line and the JSON report; return the report."""
+        self.progress()
+        report = self.report()
+        if self.report_path:
+            with open(self.report_path, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+        return report
@@ -0,0 +1,269 @@
+# coding: utf-8
+
+"""Nearest amenities and shops to many points at once, from a grid index.
+
+AmenityIndex reads the nodes tagged with CLASS_KEYS from eastbay.db and keeps
+one PointGrid per class ('amenity=bicycle_parking', 'shop=bicycle', ...,
+named as in tiles.py). Coordinates are projected to metres on a plane
+tangent at the mean latitude (equirectangular), which is well within 0.1% of
+the great circle distance across the East Bay.
+
+A PointGrid sorts its points by square cell, about CELL_POINTS points per
+occupied cell. Queries are answered in batches, all points together in
+NumPy: the points in the square of cells within r of each query's cell are
+candidates, and a query is done once its k-th nearest candidate is no farther
+than the nearest cell outside the square (r cells away for a query inside the
+grid). The rest try again with 2r. Queries outside the grid are compared with
+every point instead, as their squares would have to cover most of it.
+
+    index = AmenityIndex.from_db('eastbay.db')
+    dist, ids = index.nearest('amenity=bicycle_parking', lat, lon, k=3)
+    # lat, lon: arrays of n query points; dist (metres) and ids (node ids): n x k arrays,
+    # nearest first, inf and -1 where the class has fewer than k nodes
+
+NumPy is imported when an index is built, not with the package.
+"""
+
+import math
+from array import array
+
+from eastbay.database import coord_scale
+from eastbay.extract import ID_TYPECODE
+from eastbay.reports import connect_read_only
+from eastbay.tiles import CLASS_KEYS
+
+EARTH_RADIUS = 6371008.8
+# Average points per occupied cell the grid is sized for
+CELL_POINTS = 4
+# Largest number of cells along a side
+MAX_CELLS = 4096
+# Queries answered together, and candidate points compared at once
+BATCH = 10000
+MAX_CANDIDATES = 200000
+K = 1
+
+
+class PointGrid(object):
+    """Points of one class, sorted by grid cell, for k nearest neighbour queries.
+
+    Args:
+        x, y (NumPy arrays): projected coordinates in metres
+        ids (NumPy array): id of each point
+    """
+
+    def __init__(self, x, y, ids):
+        import numpy as np
+
+        self.size = len(ids)
+        if self.size:
+            self.x0, self.y0 = x.min(), y.min()
+            width, height = max(x.max() - self.x0, 1.0), max(y.max() - self.y0, 1.0)
+            # Cells of the size that would hold CELL_POINTS points if they were spread evenly
+            self.cell = max(math.sqrt(width * height * CELL_POINTS / self.size),
+                            max(width, height) / MAX_CELLS)
+        else:
+            self.x0 = self.y0 = 0.0
+            self.cell = 1.0
+        self.nx = int((x.max() - self.x0) / self.cell) + 1 if self.size else 1
+        self.ny = int((y.max() - self.y0) / self.cell) + 1 if self.size else 1
+        cx, cy = self.cells(x, y)
+        order = np.argsort(cy * self.nx + cx, kind='mergesort')
+        self.x, self.y, self.ids = x[order], y[order], ids[order]
+        # Points of cell c are [start[c], start[c + 1])
+        self.start = np.zeros(self.nx * self.ny + 1, np.int64)
+        np.cumsum(np.bincount(cy * self.nx + cx, minlength=self.nx * self.ny), out=self.start[1:])
+
+    def cells(self, x, y):
+        """Return the cell column and row of each point, clipped to the grid."""
+        import numpy as np
+
+        cx = np.clip(np.floor((x - self.x0) / self.cell), 0, self.nx - 1).astype(np.int64)
+        cy = np.clip(np.floor((y - self.y0) / self.cell), 0, self.ny - 1).astype(np.int64)
+        return cx, cy
+
+    def ranges(self, cx, cy, r):
+        """Return (query, first point, number of points) for each row of cells within r of each query.
+
+        The cells of one row are next to each other in the sorted points, so
+        each query has one range of points per row.
+        """
+        import numpy as np
+
+        queries, first, count = [], [], []
+        lo = np.clip(cx - r, 0, self.nx - 1)
+        hi = np.clip(cx + r, 0, self.nx - 1)
+        for dy in range(max(-r, -self.ny), min(r, self.ny) + 1):
+            row = cy + dy
+            inside = (row >= 0) & (row < self.ny)
+            row = np.clip(row, 0, self.ny - 1)
+            start = self.start[row * self.nx + lo]
+            queries.append(np.arange(len(cx)))
+            first.append(start)
+            count.append(np.where(inside, self.start[row * self.nx + hi + 1] - start, 0))
+        return [np.concatenate(parts) for parts in (queries, first, count)]
+
+    def resolve(self, x, y, cx, cy, r, k, dist, ids, rows):
+        """Find the k nearest candidates within r cells of the queries 'rows'.
+
+        Fills in dist and ids for the queries whose k-th candidate is closer than r
+        cells (or that see the whole grid) and returns a mask of them.
+        """
+        import numpy as np
+
+        queries, first, count = self.ranges(cx[rows], cy[rows], r)
+        # Expand each range into (query, point) pairs
+        query = np.repeat(queries, count)
+        point = np.repeat(first, count) + np.arange(len(query)) - \
+            np.repeat(np.cumsum(count) - count, count)
+        d = np.hypot(self.x[point] - x[rows][query], self.y[point] - y[rows][query])
+        order = np.lexsort((d, query))
+        query, point, d = query[order], point[order], d[order]
+        # Rank of each candidate within its query, nearest first
+        rank = np.arange(len(query)) - np.searchsorted(query, np.arange(len(rows)))[query]
+        top = rank < k
+        kth = np.full(len(rows), np.inf)
+        kth[query[rank == k - 1]] = d[rank == k - 1]
+        # No point outside the searched cells is closer than r cells
+        done = (kth <= r * self.cell) | (r >= max(self.nx, self.ny))
+        keep = top & done[query]
+        dist[rows[query[keep]], rank[keep]] = d[keep]
+        ids[rows[query[keep]], rank[keep]] = self.ids[point[keep]]
+        return done
+
+    def compare_all(self, x, y, k, dist, ids, rows):
+        """Fill in the k nearest points of the queries 'rows' by comparing them with every point."""
+        import numpy as np
+
+        k = min(k, self.size)
+        step = max(MAX_CANDIDATES // self.size, 1)
+        for i in range(0, len(rows), step):
+            part = rows[i:i + step]
+            d = np.hypot(x[part][:, None] - self.x[None, :], y[part][:, None] - self.y[None, :])
+            nearest = np.argpartition(d, k - 1, axis=1)[:, :k] if k < self.size else \
+                np.tile(np.arange(self.size), (len(part), 1))
+            row_index = np.arange(len(part))[:, None]
+            d = d[row_index, nearest]
+            order = np.argsort(d, axis=1)
+            dist[part, :k] = d[row_index, order]
+            ids[part, :k] = self.ids[nearest[row_index, order]]
+
+    def query(self, x, y, k=K):
+        """Return the distances and ids of the k nearest points to each query point.
+
+        Args:
+            x, y (NumPy arrays): projected query coordinates in metres
+            k (int): neighbours per query
+
+        Returns:
+            n x k arrays of distances (inf if missing) and ids (-1 if missing), nearest first
+        """
+        import numpy as np
+
+        n = len(x)
+        dist = np.full((n, k), np.inf)
+        ids = np.full((n, k), -1, np.int64)
+        if not self.size or not n:
+            return dist, ids
+        cx, cy = self.cells(x, y)
+        # The squares of queries outside the grid grow slowly towards their
+        # neighbours (the nearest cells outside them are not much farther)
+        outside = (x < self.x0) | (x > self.x0 + self.nx * self.cell) | \
+            (y < self.y0) | (y > self.y0 + self.ny * self.cell)
+        self.compare_all(x, y, k, dist, ids, np.nonzero(outside)[0])
+        pending = np.nonzero(~outside)[0]
+        # Start with the square expected to hold about k points
+        r = max(int(math.ceil((math.sqrt(float(k) / CELL_POINTS) - 1) / 2)), 1)
+        while len(pending):
+            # Queries far from the points see many cells; take them a few at a time
+            queries, _, count = self.ranges(cx[pending], cy[pending], r)
+            total = np.cumsum(np.bincount(queries, weights=count, minlength=len(pending)))
+            done = np.zeros(len(pending), bool)
+            i = 0
+            while i < len(pending):
+                before = total[i - 1] if i else 0
+                j = max(int(np.searchsorted(total, before + MAX_CANDIDATES, 'right')), i + 1)
+                done[i:j] = self.resolve(x, y, cx, cy, r, k, dist, ids, pending[i:j])
+                i = j
+            pending = pending[~done]
+            r *= 2
+        return dist, ids
+
+
+class AmenityIndex(object):
+    """PointGrids of the nodes of each '<key>=<value>' class, in one projection."""
+
+    def __init__(self, lat0, grids):
+        self.lat0 = lat0
+        self.grids = grids
+
+    def project(self, lat, lon):
+        """Return x, y in metres of NumPy arrays of lat and lon."""
+        import numpy as np
+
+        return (EARTH_RADIUS * np.radians(lon) * math.cos(math.radians(self.lat0)),
+                EARTH_RADIUS * np.radians(lat))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build the index from (id, lat, lon, class) rows."""
+        import numpy as np
+
+        by_class = {}
+        total, n = 0.0, 0
+        for node_id, lat, lon, name in rows:
+            if name not in by_class:
+                by_class[name] = (array(ID_TYPECODE), array('d'), array('d'))
+            ids, lats, lons = by_class[name]
+            ids.append(node_id)
+            lats.append(lat)
+            lons.append(lon)
+            total += lat
+            n += 1
+        index = cls(total / n if n else 0.0, {})
+        for name, (ids, lat, lon) in by_class.items():
+            x, y = index.project(np.frombuffer(lat), np.frombuffer(lon))
+            index.grids[name] = PointGrid(x, y, np.frombuffer(ids, np.int64).copy())
+        return index
+
+    @classmethod
+    def from_db(cls, sqlite_file, class_keys=CLASS_KEYS):
+        """Read the nodes with a tag in class_keys from eastbay.db (any create_db layout)."""
+        conn = connect_read_only(sqlite_file)
+        try:
+            scale = float(coord_scale(conn))
+            rows = conn.execute('''SELECT n.id, n.lat, n.lon, t.key || '=' || t.value
+FROM nodes_tags t JOIN nodes n ON n.id = t.id
+WHERE t.type = 'regular' AND t.key IN ({0}) AND n.lat IS NOT NULL AND n.lon IS NOT NULL;'''.format(
+                ', '.join('?' * len(class_keys))), tuple(class_keys))
+            return cls.from_rows((node_id, lat / scale, lon / scale, name)
+                                 for node_id, lat, lon, name in rows)
+        finally:
+            conn.close()
+
+    def classes(self):
+        """Return {class: number of nodes}."""
+        return dict((name, grid.size) for name, grid in self.grids.items())
+
+    def nearest(self, node_class, lat, lon, k=K):
+        """Return the k nearest nodes of a class to each point, as in PointGrid.query.
+
+        Args:
+            node_class (string): '<key>=<value>', e.g. 'amenity=bicycle_parking'
+            lat, lon (sequences or NumPy arrays): query points in degrees
+            k (int, defaults to K): neighbours per point
+
+        Returns:
+            n x k arrays of distances in metres and node ids; a class with no
+            nodes gives inf and -1 everywhere
+        """
+        import numpy as np
+
+        lat, lon = np.asarray(lat, np.float64), np.asarray(lon, np.float64)
+        grid = self.grids.get(node_class) or PointGrid(np.zeros(0), np.zeros(0), np.zeros(0, np.int64))
+        x, y = self.project(lat, lon)
+        dist, ids = [], []
+        for i in range(0, max(len(lat), 1), BATCH):
+            d, found = grid.query(x[i:i + BATCH], y[i:i + BATCH], k)
+            dist.append(d)
+            ids.append(found)
+        return np.concatenate(dist), np.concatenate(ids)
@@ -0,0 +1,72 @@
+# coding: utf-8
+
+"""Read .osm files one top level element at a time, and take samples of them."""
+
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    # cElementTree was removed in Python 3.9; ElementTree uses the C parser anyway
+    import xml.etree.ElementTree as ET
+
+
+def get_element(osm_file, tags=('node', 'way', 'relation')):
+    """Yield element if it is the right type of tag
+    
+    Helper function to take systematic sample of elements
+    from origional OSM region.
+    
+    Args:
+        osm_file (.osm file): the Open Street Map data file that is assessed
+        tags (list): list of strings
+    
+    Returns:
+        elements from osm_file if tag is listed in tags
+    """
+    context = iter(ET.iterparse(osm_file, events=('start', 'end')))
+    _, root = next(context)
+    for event, elem in context:
+        if event == 'end' and elem.tag in tags:
+            yield elem
+            root.clear()
+
+
+def iterparse_clear(filename, tags=('node', 'way', 'relation')):
+    """Yield ('end', element) pairs like ET.iterparse(filename), without keeping the tree.
+    
+    ET.iterparse keeps every element attached to the root, so memory grows with
+    the file. Here the root is cleared after each top level element (listed in
+    tags) has been yielded, the same way get_element does.
+    
+    Args:
+        filename (string): name of .osm file
+        tags (list): top level elements to clear after they are yielded
+    """
+    context = iter(ET.iterparse(filename, events=('start', 'end')))
+    _, root = next(context)
+    for event, elem in context:
+        if event == 'end':
+            yield event, elem
+            if elem.tag in tags:
+                root.clear()
+
+
+def create_sample(master_osm, sample_file, k):
+    """Take systematic sample of elements from origional OSM region
+    Args:
+        master_osm (.osm file): Open Street Map data file from which sample is taken
+        sample_file (.osm file): Name of sample file that will be created
+        k (int): divisor for total number of elements; determines size of sample file. 
+            Larger k returns smaller file.
+    Returns:
+        .osm file, sample of master .osm file.
+    """
+    with open(sample_file, 'wb') as output:
+        output.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        output.write('<osm>\n  ')
+
+        # Write every kth top level element
+        for i, element in enumerate(get_element(master_osm)):
+            if i % k == 0:
+                output.write(ET.tostring(element, encoding='utf-8'))
+
+        output.write('</osm>')
@@ -0,0 +1,136 @@
+# coding: utf-8
+
+"""Run the stages of an iterator chain in their own threads, connected by bounded queues.
+
+process_map(..., pipelined=True) parses in one thread, shapes (and validates)
+in another, and writes the csv files in the calling thread, so reading and
+parsing the input overlaps with shaping and with the disk writes. Only one
+thread runs Python code at a time, so the gain comes from overlapping file
+reads and writes (which release the lock) with the work of the other stages.
+
+Items travel between threads in batches, to keep the locking overhead of the
+queues small. Each queue holds at most 'queue_size' batches: a stage that gets
+ahead of the next one blocks until there is room (backpressure), so memory use
+does not depend on the size of the input. An exception in any stage is passed
+down the chain and raised again in the calling thread, which then stops the
+stages before it.
+"""
+
+import sys
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+QUEUE_SIZE = 4
+BATCH_SIZE = 100
+# How long close() waits for each thread before emptying the queues again
+POLL = 0.1
+
+
+class _Done(object):
+    """End of a stage's output; 'error' is the exception that ended it early, if any."""
+
+    def __init__(self, error=None):
+        self.error = error
+
+
+class Stopped(Exception):
+    """Raised inside a stage when the pipeline has been closed by the calling thread."""
+
+
+class Pipeline(object):
+    """Chain of threaded stages; iterate over it to get the output of the last stage in order.
+
+    Args:
+        source (iterator): items for the first stage
+        stages (list): functions that take an iterator and return an iterator;
+            each one runs in its own thread
+        queue_size (int): batches each queue holds before the stage feeding it blocks
+        batch_size (int): items per batch
+    """
+
+    def __init__(self, source, stages, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE):
+        self.stopped = threading.Event()
+        self.threads = []
+        self.queues = []
+        self.batch_size = batch_size
+        items = source
+        for stage in stages:
+            out = queue.Queue(maxsize=queue_size)
+            thread = threading.Thread(target=self.run_stage, args=(stage, items, out))
+            thread.daemon = True
+            self.threads.append(thread)
+            self.queues.append(out)
+            items = self.drain(out)
+        self.output = items
+
+    def put(self, out, batch):
+        """Put a batch on a queue, waiting for room; give up if the pipeline was stopped meanwhile."""
+        out.put(batch)
+        if self.stopped.is_set():
+            raise Stopped()
+
+    def drain(self, q):
+        """Yield the items of each batch put on q until the stage feeding it is done."""
+        while True:
+            batch = q.get()
+            if isinstance(batch, _Done):
+                if batch.error is not None:
+                    raise batch.error
+                return
+            if self.stopped.is_set():
+                raise Stopped()
+            for item in batch:
+                yield item
+
+    def run_stage(self, stage, items, out):
+        """Thread body: feed stage(items) to the out queue in batches.
+
+        An exception, raised here or passed on from an earlier stage, is put on
+        the queue in place of the remaining items, so it reaches the calling thread.
+        """
+        error = None
+        try:
+            batch = []
+            for item in stage(items):
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    self.put(out, batch)
+                    batch = []
+            if batch:
+                self.put(out, batch)
+        except Stopped:
+            pass
+        except Exception:
+            error = sys.exc_info()[1]
+        # Always sent, so the next stage never waits forever; close() makes room for it
+        out.put(_Done(error))
+
+    def __iter__(self):
+        for thread in self.threads:
+            thread.start()
+        try:
+            for item in self.output:
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop every stage and wait for the threads to finish.
+
+        Emptying the queues wakes up stages waiting for room; the _Done each
+        stage sends on its way out wakes up the stage after it.
+        """
+        self.stopped.set()
+        while any(thread.is_alive() for thread in self.threads):
+            for q in self.queues:
+                try:
+                    while True:
+                        q.get_nowait()
+                except queue.Empty:
+                    pass
+            for thread in self.threads:
+                thread.join(POLL)
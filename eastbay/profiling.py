@@ -0,0 +1,127 @@
+# coding: utf-8
+
+"""Time, row count and EXPLAIN QUERY PLAN of every report query, ranked by time.
+
+    profiler = QueryProfiler()
+    run_reports('eastbay.db', workers=1, profiler=profiler)
+    print(profiler.text())
+    profiler.write('profile.json')
+
+With several workers, the queries share the CPUs and each time includes the
+waits for the others; one worker gives times that add up to the total.
+
+Each plan is checked for the steps that get slower as the database grows:
+    full scan       SCAN of a table or view (every row is read), as opposed to a
+                    SEARCH through an index or the scan of a subquery's result
+    temp b-tree     USE TEMP B-TREE: rows sorted or grouped in a temporary index
+    automatic index an index built for this query only, every time it runs
+"""
+
+import json
+import re
+import threading
+from timeit import default_timer as timer
+
+# "SCAN nodes_tags", "SCAN d USING INDEX ...", or "SCAN TABLE nodes_tags" before sqlite 3.24
+SCAN = re.compile(r'^SCAN (?:TABLE )?(\S+)')
+# Subquery results, which are scanned too: "CO-ROUTINE tags", "MATERIALIZE i"
+SUBQUERY = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (?:SUBQUERY )?(\S+)')
+TEMP_BTREE = re.compile(r'^USE TEMP B-TREE FOR (.*)')
+AUTOMATIC_INDEX = re.compile(r'AUTOMATIC (?:PARTIAL )?(?:COVERING )?INDEX')
+
+
+def query_plan(conn, sql, params=()):
+    """Return the EXPLAIN QUERY PLAN steps of a query as (id, parent, detail) tuples."""
+    rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    # Before sqlite 3.24 the columns are (selectid, order, from, detail)
+    return [(row[0], row[1], row[-1]) for row in rows]
+
+
+def plan_text(plan):
+    """Indent each step under its parent, like the sqlite3 shell does."""
+    depth = {0: -1}
+    lines = []
+    for step_id, parent, detail in plan:
+        depth[step_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[step_id] + detail)
+    return lines
+
+
+def plan_flags(plan):
+    """Return the full scans, temp b-trees and automatic indexes in a query plan."""
+    subqueries = set()
+    for _, _, detail in plan:
+        match = SUBQUERY.match(detail)
+        if match:
+            subqueries.add(match.group(1))
+    flags = []
+    for _, _, detail in plan:
+        scan = SCAN.match(detail)
+        if scan and scan.group(1) not in subqueries and scan.group(1) not in ('SUBQUERY', 'CONSTANT'):
+            flags.append('full scan: ' + detail)
+        temp = TEMP_BTREE.match(detail)
+        if temp:
+            flags.append('temp b-tree: ' + temp.group(1))
+        if AUTOMATIC_INDEX.search(detail):
+            flags.append('automatic index: ' + detail)
+    return flags
+
+
+class QueryProfiler(object):
+    """Collects the time, rows and plan of each query; safe to share between threads."""
+
+    def __init__(self):
+        self.entries = []
+        self.lock = threading.Lock()
+
+    def run(self, conn, name, sql, params=()):
+        """Run a query on conn, record its profile and return its cursor description and rows."""
+        plan = query_plan(conn, sql, params)
+        start = timer()
+        cur = conn.execute(sql, params)
+        rows = cur.fetchall()
+        seconds = timer() - start
+        with self.lock:
+            self.entries.append({
+                'name': name,
+                'seconds': seconds,
+                'rows': len(rows),
+                'plan': plan_text(plan),
+                'flags': plan_flags(plan),
+            })
+        return cur.description, rows
+
+    def ranked(self):
+        """Return the recorded queries, slowest first."""
+        with self.lock:
+            return sorted(self.entries, key=lambda entry: entry['seconds'], reverse=True)
+
+    def text(self, plans=True):
+        """Return the ranked slow-query report as text.
+
+        Args:
+            plans (Boolean, defaults to True): include the plan of each flagged query
+        """
+        entries = self.ranked()
+        total = sum(entry['seconds'] for entry in entries)
+        lines = ['{0:<4} {1:<32} {2:>10} {3:>6} {4:>8}  {5}'.format(
+            'rank', 'query', 'ms', '%', 'rows', 'flags')]
+        for rank, entry in enumerate(entries, 1):
+            lines.append('{0:<4} {1:<32} {2:10.2f} {3:6.1f} {4:8d}  {5}'.format(
+                rank, entry['name'], entry['seconds'] * 1000,
+                100.0 * entry['seconds'] / total if total else 0.0, entry['rows'],
+                len(entry['flags']) or ''))
+        if plans:
+            for entry in entries:
+                if entry['flags']:
+                    lines.append('')
+                    lines.append('{0} ({1:.2f} ms)'.format(entry['name'], entry['seconds'] * 1000))
+                    lines.extend('  ! ' + flag for flag in entry['flags'])
+                    lines.extend('    ' + step for step in entry['plan'])
+        return '\n'.join(lines)
+
+    def write(self, path):
+        """Save the ranked report as JSON."""
+        with open(path, 'w') as f:
+            json.dump({'total_seconds': sum(entry['seconds'] for entry in self.entries),
+                       'queries': self.ranked()}, f, indent=2, sort_keys=True)
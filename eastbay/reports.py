@@ -0,0 +1,525 @@
+# coding: utf-8
+
+"""Report queries on eastbay.db, run concurrently, and plots of their results.
+
+pandas and seaborn (and with them numpy and matplotlib) take seconds to import,
+so they are only imported when a plot is made.
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+from timeit import default_timer as timer
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# Read-only connections, each used by one worker thread
+WORKERS = 4
+
+
+class ReportSpec(object):
+    """A named report query; the ? placeholders in 'sql' are filled in from 'params'.
+
+    Args:
+        name (string): key of the report's results
+        title (string): what the report shows
+        sql (string): SELECT statement
+        params (tuple): values for the placeholders
+    """
+
+    def __init__(self, name, title, sql, params=()):
+        self.name = name
+        self.title = title
+        self.sql = sql
+        self.params = tuple(params)
+
+    def __repr__(self):
+        return 'ReportSpec({0!r}, {1!r}, params={2!r})'.format(self.name, self.title, self.params)
+
+
+# Query templates shared by several reports
+TAG_FREQUENCY = '''
+SELECT tags.value, COUNT(*) as count
+FROM (SELECT * FROM nodes_tags
+      UNION ALL
+      SELECT * FROM ways_tags) tags
+WHERE tags.key = ?
+GROUP BY tags.value
+ORDER BY count DESC
+LIMIT ?;'''
+
+NODE_TAG_FREQUENCY = '''
+SELECT nodes_tags.value, COUNT(*) as count
+FROM nodes_tags
+WHERE nodes_tags.key = ?
+GROUP BY nodes_tags.value
+ORDER BY count DESC
+LIMIT ?;'''
+
+# Values of one key on the nodes that have a tag with a given value
+TAGGED_NODE_VALUES = '''
+SELECT nodes_tags.value, COUNT(*) as num
+FROM nodes_tags
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE value = ?) i
+    ON nodes_tags.id = i.id
+WHERE nodes_tags.key = ?
+GROUP BY nodes_tags.value
+ORDER BY num DESC
+LIMIT ?;'''
+
+DISTINCT_TAGGED_NODE_VALUES = '''
+SELECT DISTINCT(nodes_tags.value)
+FROM nodes_tags
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE value = ?) i
+    ON nodes_tags.id = i.id
+    WHERE nodes_tags.key = ?
+    ORDER BY nodes_tags.value;'''
+
+# All tags of the nodes that have a given tag
+NODE_DETAILS = '''
+SELECT *
+FROM nodes_tags
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE key = ? AND value = ?) i
+    ON nodes_tags.id = i.id
+ORDER BY nodes_tags.id, nodes_tags.type, nodes_tags.key
+LIMIT ?;'''
+
+USERS_WITH_POSTS = '''
+SELECT COUNT(*)
+FROM (SELECT e.uid, COUNT(*) as num
+FROM (SELECT uid FROM nodes UNION ALL SELECT uid FROM ways) e
+GROUP BY e.uid
+HAVING num BETWEEN ? AND ?) u;'''
+
+# LIMIT -1 is no limit; the largest integer sqlite stores is the upper bound of "over 100"
+NO_LIMIT = -1
+MAX_COUNT = 2 ** 63 - 1
+
+# The report queries of P3_EastBay_Map_Analysis.py, in the order they appear there.
+# The user queries group on the integer uid and look up the names in the users table.
+REPORTS = [
+    ReportSpec('nodes', 'Number of nodes', '''
+SELECT COUNT(*)
+FROM nodes;'''),
+    ReportSpec('ways', 'Number of ways', '''
+SELECT COUNT(*)
+FROM ways;'''),
+    ReportSpec('unique_users', 'Number of unique users', '''
+SELECT COUNT(DISTINCT(e.uid))
+FROM (SELECT uid FROM nodes UNION ALL SELECT uid FROM ways) e;'''),
+    ReportSpec('top_users', 'Frequency of users, top 10', '''
+SELECT users.user, e.count
+FROM (SELECT uid, COUNT(*) as count
+      FROM (SELECT uid FROM nodes UNION ALL SELECT uid FROM ways)
+      GROUP BY uid
+      ORDER BY count DESC
+      LIMIT ?) e
+    JOIN users ON users.uid = e.uid
+ORDER BY e.count DESC;''', (10,)),
+    ReportSpec('one_post_users', 'Number of users with only one post', USERS_WITH_POSTS, (1, 1)),
+    ReportSpec('over_100_post_users', 'Number of users with over 100 posts', USERS_WITH_POSTS,
+               (101, MAX_COUNT)),
+    ReportSpec('top_postcodes', 'Number and frequency of top 5 zip codes', TAG_FREQUENCY,
+               ('postcode', 5)),
+    ReportSpec('top_cities', '10 most frequent cities by count', '''
+SELECT tags.value, COUNT(*) as count
+FROM (SELECT * FROM nodes_tags
+      UNION ALL
+      SELECT * FROM ways_tags) tags
+WHERE tags.key LIKE ?
+GROUP BY tags.value
+ORDER BY count DESC
+LIMIT ?;''', ('%city', 10)),
+    ReportSpec('top_amenities', 'Frequency of top 10 amenities', TAG_FREQUENCY, ('amenity', 10)),
+    ReportSpec('bicycle_parking_capacity', 'Average capacity of bicycle parking amenities', '''
+SELECT AVG(CAST(nodes_tags.value as INTEGER))
+FROM nodes_tags
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE value = ?) i
+    ON nodes_tags.id = i.id
+    WHERE nodes_tags.key = 'capacity';''', ('bicycle_parking',)),
+    ReportSpec('largest_bicycle_parking', 'Capacities of top 10 largest bicycle parking amenities', '''
+SELECT CAST(nodes_tags.value as INTEGER)
+FROM nodes_tags
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE value = ?) i
+    ON nodes_tags.id = i.id
+    WHERE nodes_tags.key = 'capacity'
+    ORDER BY cast(nodes_tags.value as INTEGER) DESC
+    LIMIT ?;''', ('bicycle_parking', 10)),
+    ReportSpec('giant_bicycle_parking', 'Details on the giant bicycle parking station', NODE_DETAILS,
+               ('capacity', '268', NO_LIMIT)),
+    ReportSpec('giant_bicycle_parking_location', 'Latitude and longitude of the giant bicycle parking', '''
+SELECT nodes.lat, nodes.lon
+FROM nodes_tags JOIN nodes ON nodes_tags.id = nodes.id
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE value = ?) i
+    ON nodes_tags.id = i.id
+    WHERE nodes_tags.key = 'capacity' AND nodes_tags.value = ?;''', ('bicycle_parking', '268')),
+    ReportSpec('bicycle_parking_user_count', 'Number of users adding bicycle parking', '''
+SELECT COUNT(DISTINCT(uid))
+FROM nodes_tags JOIN nodes ON nodes_tags.id = nodes.id
+WHERE nodes_tags.key = 'amenity' and nodes_tags.value = ?
+;''', ('bicycle_parking',)),
+    ReportSpec('bicycle_parking_users', 'Users adding bicycle parking and their number of entries', '''
+SELECT users.user, e.count
+FROM (SELECT nodes.uid, COUNT(*) as count
+      FROM nodes_tags JOIN nodes ON nodes_tags.id = nodes.id
+      WHERE nodes_tags.key = 'amenity' and nodes_tags.value = ?
+      GROUP BY nodes.uid) e
+    JOIN users ON users.uid = e.uid
+ORDER BY e.count DESC
+;''', ('bicycle_parking',)),
+    ReportSpec('top_shops', 'Popular shops', NODE_TAG_FREQUENCY, ('shop', 10)),
+    ReportSpec('top_cuisines', 'Popular cuisines', TAGGED_NODE_VALUES, ('restaurant', 'cuisine', 10)),
+    ReportSpec('korean_ethiopian', 'Number of korean and ethiopian restaurants', '''
+SELECT nodes_tags.value, COUNT(*) as num
+FROM nodes_tags
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags WHERE value = ?) i
+    ON nodes_tags.id = i.id
+WHERE nodes_tags.key = 'cuisine'
+AND (nodes_tags.value = ? OR nodes_tags.value = ?)
+GROUP BY nodes_tags.value
+ORDER BY num DESC;''', ('restaurant', 'korean', 'ethiopian')),
+    ReportSpec('solar_generators', 'How many solar generators', '''
+SELECT COUNT(*) as count
+FROM nodes_tags
+WHERE nodes_tags.key = ?
+    AND nodes_tags.value = ?;''', ('source', 'solar')),
+    ReportSpec('power_values', 'Information about energy nodes', NODE_TAG_FREQUENCY,
+               ('power', NO_LIMIT)),
+    ReportSpec('generator_sources', 'What type of generators', DISTINCT_TAGGED_NODE_VALUES,
+               ('generator', 'source')),
+    ReportSpec('generator_places', 'Where the generators are', DISTINCT_TAGGED_NODE_VALUES,
+               ('generator', 'place')),
+    ReportSpec('solar_details', 'Details on rooftop solar systems', NODE_DETAILS,
+               ('source', 'solar', 20)),
+]
+
+# A database loaded with create_db(users=False) has no users table; these replace
+# the reports that join it, and group on the user names kept on nodes and ways
+USER_TEXT_REPORTS = [
+    ReportSpec('top_users', 'Frequency of users, top 10', '''
+SELECT e.user, COUNT(*) as count
+FROM (SELECT user FROM nodes UNION ALL SELECT user FROM ways) e
+GROUP BY e.user
+ORDER BY count DESC
+LIMIT ?;''', (10,)),
+    ReportSpec('bicycle_parking_users', 'Users adding bicycle parking and their number of entries', '''
+SELECT nodes.user, COUNT(*) as count
+FROM nodes_tags JOIN nodes ON nodes_tags.id = nodes.id
+WHERE nodes_tags.key = 'amenity' and nodes_tags.value = ?
+GROUP BY nodes.user
+ORDER BY count DESC
+;''', ('bicycle_parking',)),
+]
+
+
+# A database loaded with create_db(encode_tags=True) keeps the tag keys as integer codes in
+# nodes_tags_data and ways_tags_data. Through the nodes_tags and ways_tags views every
+# key filter looks up the text of each row's key; these versions of the reports that
+# filter on a key look its key_id up once in tag_keys and compare integers.
+KEY_ID = '(SELECT key_id FROM tag_keys WHERE key = {0})'
+
+# The key filter is in both halves of the UNION, so neither passes on rows of other keys
+ENCODED_TAG_FREQUENCY = '''
+SELECT tags.value, COUNT(*) as count
+FROM (SELECT value FROM nodes_tags_data WHERE key_id = {0}
+      UNION ALL
+      SELECT value FROM ways_tags_data WHERE key_id = {0}) tags
+GROUP BY tags.value
+ORDER BY count DESC
+LIMIT ?2;'''.format(KEY_ID.format('?1'))
+
+ENCODED_NODE_TAG_FREQUENCY = '''
+SELECT d.value, COUNT(*) as count
+FROM nodes_tags_data d
+WHERE d.key_id = {0}
+GROUP BY d.value
+ORDER BY count DESC
+LIMIT ?;'''.format(KEY_ID.format('?'))
+
+ENCODED_TAGGED_NODE_VALUES = '''
+SELECT d.value, COUNT(*) as num
+FROM nodes_tags_data d
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags_data WHERE value = ?) i
+    ON d.id = i.id
+WHERE d.key_id = {0}
+GROUP BY d.value
+ORDER BY num DESC
+LIMIT ?;'''.format(KEY_ID.format('?'))
+
+ENCODED_DISTINCT_TAGGED_NODE_VALUES = '''
+SELECT DISTINCT(d.value)
+FROM nodes_tags_data d
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags_data WHERE value = ?) i
+    ON d.id = i.id
+    WHERE d.key_id = {0}
+    ORDER BY d.value;'''.format(KEY_ID.format('?'))
+
+# The same columns as SELECT * of NODE_DETAILS: the view's four, then i.id
+ENCODED_NODE_DETAILS = '''
+SELECT d.id, tag_keys.key, d.value, tag_types.type, i.id
+FROM nodes_tags_data d
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags_data WHERE key_id = {0} AND value = ?) i
+    ON d.id = i.id
+    LEFT JOIN tag_keys ON tag_keys.key_id = d.key_id
+    LEFT JOIN tag_types ON tag_types.type_id = d.type_id
+ORDER BY d.id, tag_types.type, tag_keys.key
+LIMIT ?;'''.format(KEY_ID.format('?'))
+
+# SQL of each encoded report; the title and params are those of the report it replaces
+ENCODED_TAG_SQL = {
+    'top_postcodes': ENCODED_TAG_FREQUENCY,
+    'top_cities': '''
+SELECT tags.value, COUNT(*) as count
+FROM (SELECT value FROM nodes_tags_data WHERE key_id IN {0}
+      UNION ALL
+      SELECT value FROM ways_tags_data WHERE key_id IN {0}) tags
+GROUP BY tags.value
+ORDER BY count DESC
+LIMIT ?2;'''.format('(SELECT key_id FROM tag_keys WHERE key LIKE ?1)'),
+    'top_amenities': ENCODED_TAG_FREQUENCY,
+    'bicycle_parking_capacity': '''
+SELECT AVG(CAST(d.value as INTEGER))
+FROM nodes_tags_data d
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags_data WHERE value = ?) i
+    ON d.id = i.id
+    WHERE d.key_id = {0};'''.format(KEY_ID.format("'capacity'")),
+    'largest_bicycle_parking': '''
+SELECT CAST(d.value as INTEGER)
+FROM nodes_tags_data d
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags_data WHERE value = ?) i
+    ON d.id = i.id
+    WHERE d.key_id = {0}
+    ORDER BY cast(d.value as INTEGER) DESC
+    LIMIT ?;'''.format(KEY_ID.format("'capacity'")),
+    'giant_bicycle_parking': ENCODED_NODE_DETAILS,
+    'giant_bicycle_parking_location': '''
+SELECT nodes.lat, nodes.lon
+FROM nodes_tags_data d JOIN nodes ON d.id = nodes.id
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags_data WHERE value = ?) i
+    ON d.id = i.id
+    WHERE d.key_id = {0} AND d.value = ?;'''.format(KEY_ID.format("'capacity'")),
+    'bicycle_parking_user_count': '''
+SELECT COUNT(DISTINCT(uid))
+FROM nodes_tags_data d JOIN nodes ON d.id = nodes.id
+WHERE d.key_id = {0} and d.value = ?
+;'''.format(KEY_ID.format("'amenity'")),
+    'bicycle_parking_users': '''
+SELECT users.user, e.count
+FROM (SELECT nodes.uid, COUNT(*) as count
+      FROM nodes_tags_data d JOIN nodes ON d.id = nodes.id
+      WHERE d.key_id = {0} and d.value = ?
+      GROUP BY nodes.uid) e
+    JOIN users ON users.uid = e.uid
+ORDER BY e.count DESC
+;'''.format(KEY_ID.format("'amenity'")),
+    'top_shops': ENCODED_NODE_TAG_FREQUENCY,
+    'top_cuisines': ENCODED_TAGGED_NODE_VALUES,
+    'korean_ethiopian': '''
+SELECT d.value, COUNT(*) as num
+FROM nodes_tags_data d
+    JOIN (SELECT DISTINCT(id) FROM nodes_tags_data WHERE value = ?) i
+    ON d.id = i.id
+WHERE d.key_id = {0}
+AND (d.value = ? OR d.value = ?)
+GROUP BY d.value
+ORDER BY num DESC;'''.format(KEY_ID.format("'cuisine'")),
+    'solar_generators': '''
+SELECT COUNT(*) as count
+FROM nodes_tags_data d
+WHERE d.key_id = {0}
+    AND d.value = ?;'''.format(KEY_ID.format('?')),
+    'power_values': ENCODED_NODE_TAG_FREQUENCY,
+    'generator_sources': ENCODED_DISTINCT_TAGGED_NODE_VALUES,
+    'generator_places': ENCODED_DISTINCT_TAGGED_NODE_VALUES,
+    'solar_details': ENCODED_NODE_DETAILS,
+}
+# With encode_tags and users=False
+ENCODED_USER_TEXT_SQL = {
+    'bicycle_parking_users': '''
+SELECT nodes.user, COUNT(*) as count
+FROM nodes_tags_data d JOIN nodes ON d.id = nodes.id
+WHERE d.key_id = {0} and d.value = ?
+GROUP BY nodes.user
+ORDER BY count DESC
+;'''.format(KEY_ID.format("'amenity'")),
+}
+ENCODED_TAG_REPORTS = [ReportSpec(spec.name, spec.title, ENCODED_TAG_SQL[spec.name], spec.params)
+                       for spec in REPORTS if spec.name in ENCODED_TAG_SQL]
+ENCODED_USER_TEXT_REPORTS = [
+    ReportSpec(spec.name, spec.title, ENCODED_USER_TEXT_SQL[spec.name], spec.params)
+    for spec in USER_TEXT_REPORTS if spec.name in ENCODED_USER_TEXT_SQL]
+
+
+def report_spec(name, reports=REPORTS):
+    """Return the report with this name."""
+    for spec in reports:
+        if spec.name == name:
+            return spec
+    raise KeyError(name)
+
+
+def layout_reports(sqlite_file, reports=REPORTS):
+    """Return the reports to run on a database: without a users table (create_db(users=False)),
+    the ones that join it are replaced by those of USER_TEXT_REPORTS, and with encoded tags
+    (create_db(encode_tags=True)) the ones that filter on a key by ENCODED_TAG_REPORTS."""
+    conn = connect_read_only(sqlite_file)
+    try:
+        tables = set(row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE name IN ('users', 'tag_keys');"))
+    finally:
+        conn.close()
+    users, encoded = 'users' in tables, 'tag_keys' in tables
+    replacements = []
+    if not users:
+        replacements += USER_TEXT_REPORTS
+    if encoded:
+        replacements += ENCODED_TAG_REPORTS if users else (
+            ENCODED_TAG_REPORTS + ENCODED_USER_TEXT_REPORTS)
+    replaced = dict((spec.name, spec) for spec in replacements)
+    return [replaced.get(spec.name, spec) for spec in reports]
+
+
+def connect_read_only(sqlite_file):
+    """Open an existing database for queries only; writes raise sqlite3.OperationalError."""
+    if not os.path.exists(sqlite_file):
+        # sqlite3.connect would create an empty database instead
+        raise IOError('database not found: {0}'.format(sqlite_file))
+    conn = sqlite3.connect(sqlite_file)
+    conn.execute('PRAGMA query_only = 1;')
+    return conn
+
+
+def run_report(conn, spec, profiler=None):
+    """Run one report on an open connection and return its columns, rows and seconds.
+
+    With a QueryProfiler, its plan, time and row count are recorded too.
+    """
+    start = timer()
+    if profiler is None:
+        cur = conn.execute(spec.sql, spec.params)
+        rows = cur.fetchall()
+        description = cur.description
+    else:
+        description, rows = profiler.run(conn, spec.name, spec.sql, spec.params)
+    return {
+        'title': spec.title,
+        'params': list(spec.params),
+        'columns': [column[0] for column in description],
+        'rows': rows,
+        'seconds': timer() - start,
+    }
+
+
+def run_reports(sqlite_file, reports=None, workers=WORKERS, cache=None, profiler=None):
+    """Run the reports concurrently on a pool of read-only connections.
+
+    Each worker thread opens its own connection and takes the next report
+    from a shared queue. sqlite releases the interpreter lock while a query
+    runs, so reports on separate connections can overlap on a multi-core
+    machine; on one core they take about as long as with workers=1 (compare
+    the reports and reports_serial stages of benchmarks/bench_pipeline.py).
+    create_db leaves eastbay.db in WAL mode, where readers never wait for
+    each other or for a writer.
+
+    Args:
+        sqlite_file (string): name of database file
+        reports (list, defaults to None): ReportSpec of each report to run;
+            layout_reports(sqlite_file) if None
+        workers (int): number of connections and threads
+        cache (QueryCache, defaults to None): reuse results stored for the same
+            query on the unchanged database, and store the new ones
+        profiler (QueryProfiler, defaults to None): record the plan, time and rows
+            of every query that is run (cached reports are not run)
+
+    Returns:
+        dictionary with the database, number of workers, total seconds and a
+        'reports' dictionary of report name: title, params, columns, rows, seconds
+        and whether the rows came from the cache
+    """
+    start = timer()
+    if reports is None:
+        reports = layout_reports(sqlite_file)
+    results = {}
+    errors = []
+    pending = queue.Queue()
+    if cache is not None:
+        # Imported here: eastbay.cache imports connect_read_only from this module
+        from eastbay.cache import fingerprint
+        current = fingerprint(sqlite_file)
+    for spec in reports:
+        cached = None if cache is None else cache.get(sqlite_file, spec.sql, spec.params, current)
+        if cached is None:
+            pending.put(spec)
+        else:
+            results[spec.name] = {'title': spec.title, 'params': list(spec.params),
+                                  'columns': cached[0], 'rows': cached[1], 'seconds': 0.0,
+                                  'cached': True}
+
+    def work():
+        try:
+            conn = connect_read_only(sqlite_file)
+        except Exception:
+            errors.append(sys.exc_info()[1])
+            return
+        try:
+            # Stop taking reports once any worker has failed
+            while not errors:
+                try:
+                    spec = pending.get_nowait()
+                except queue.Empty:
+                    return
+                results[spec.name] = run_report(conn, spec, profiler)
+                results[spec.name]['cached'] = False
+        except Exception:
+            errors.append(sys.exc_info()[1])
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=work) for _ in range(min(workers, pending.qsize()))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    if cache is not None:
+        for spec in reports:
+            result = results[spec.name]
+            if not result['cached']:
+                cache.put(sqlite_file, spec.sql, spec.params, result['columns'], result['rows'],
+                          current)
+    return {
+        'database': sqlite_file,
+        'workers': len(threads),
+        'seconds': timer() - start,
+        'reports': results,
+    }
+
+
+def plot_freq_query(rows, x, y, title):
+    """Create bar plot of query that returns value and frequency of each value
+
+    Args:
+        rows (list): (value, frequency) rows, as returned by cursor.fetchall()
+        x (string): label of the value column
+        y (string): label of the frequency column
+        title (string): title of the plot
+    """
+    import pandas as pd
+    import seaborn as sns
+
+    data_list = list(rows)
+    # Reference: http://stackoverflow.com/questions/14835852/convert-sql-result-to-list-python
+
+    df = pd.DataFrame(data_list)
+    # Reference: http://stackoverflow.com/questions/20638006/convert-list-of-dictionaries-to-dataframe
+    df.columns = [x,y]
+
+    plot = sns.factorplot(x = x, y = y, data = df, kind = 'bar')
+    plot.set_xticklabels(rotation = 90)
+    #Reference: http://stackoverflow.com/questions/26540035/rotate-label-text-in-seaborn-factorplot
+    plot.fig.suptitle(title)
@@ -0,0 +1,487 @@
+# coding: utf-8
+
+"""Routing graph of the highway ways, in compressed sparse row (CSR) arrays.
+
+build_graph reads the csv files written by process_map once each: the
+highway (and oneway) tags from ways_tags.csv, the node order of those ways
+from ways_nodes.csv and the coordinates of their nodes from nodes.csv. Each
+pair of consecutive nodes of a way becomes an edge (two, unless the way is
+oneway) whose length is the great circle distance in metres. The graph is
+kept as NumPy arrays:
+
+    node_ids[i], lat[i], lon[i]          OSM id and position of graph node i
+    indices[indptr[i]:indptr[i + 1]]     nodes reached from node i
+    lengths[indptr[i]:indptr[i + 1]]     lengths of those edges (m)
+
+Parallel edges are merged into the shortest. Building is one pass over each
+file plus sorts of the kept rows, and the graph takes about 16 bytes per edge. Queries take OSM node ids:
+
+    graph = build_graph()                  # or RoutingGraph.load('routing_graph.npz')
+    graph.add_landmarks()                  # optional; saved with the graph
+    length, path = graph.route(53063557, 53111823)      # A*; path is a list of node ids
+    graph.distances(53063557, [53111823, 65318765])     # one-to-many Dijkstra
+    graph.nearest(37.8716, -122.2727)                   # closest graph node to a point
+
+A* settles the nodes in an ellipse around the two ends, so its time grows
+with the route. add_landmarks (graph --landmarks, LANDMARKS by default)
+precomputes the distances from and to landmarks around the edge of the graph,
+which give a far tighter lower bound than the straight line (ALT: A*,
+landmarks and the triangle inequality). The searches themselves run on Python
+lists of the CSR arrays. On a 490,000 node grid with 16 landmarks (about a
+minute to compute and 256 bytes per node), a route between random nodes takes
+60 ms (median; 0.2 s at the 90th percentile, against 0.27 and 0.96 s by the
+straight line alone), and one corner to corner or side to side across the
+whole grid 15 ms (at most 0.3 s, against 3 s). The slowest routes run along
+the grid's diagonal, where very many paths are within metres of the shortest.
+
+NumPy is imported when a graph is built or loaded, not with the package.
+"""
+
+import csv
+import heapq
+import math
+import random
+from array import array
+
+from eastbay.export import NODES_PATH, WAY_NODES_PATH, WAY_TAGS_PATH
+from eastbay.extract import ID_TYPECODE
+
+GRAPH_PATH = 'routing_graph.npz'
+EARTH_RADIUS = 6371008.8
+# highway values that are not (yet, or any more) travelled along
+EXCLUDED_HIGHWAYS = ('proposed', 'construction', 'abandoned', 'disused', 'platform', 'razed',
+                     'bus_stop', 'elevator', 'rest_area', 'services', 'raceway')
+ONEWAY_FORWARD = ('yes', 'true', '1')
+ONEWAY_BACKWARD = ('-1', 'reverse')
+ARRAYS = ('node_ids', 'lat', 'lon', 'indptr', 'indices', 'lengths')
+# Saved only for a graph with landmarks (add_landmarks)
+LANDMARK_ARRAYS = ('landmarks', 'landmark_from', 'landmark_to')
+# Landmarks made by add_landmarks, and the ones with the best bounds used by each route
+LANDMARKS = 16
+ACTIVE_LANDMARKS = 4
+# Middle nodes add_landmarks tries, unless one is connected to most of the graph
+MIDDLE_TRIES = 8
+# nodes.csv rows read before the ones not in the graph are dropped
+READ_CHUNK = 100000
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great circle distance in metres between points in degrees, for NumPy arrays."""
+    import numpy as np
+
+    lat1, lon1, lat2, lon2 = [np.radians(value) for value in (lat1, lon1, lat2, lon2)]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def point_distance(lat1, lon1, lat2, lon2):
+    """haversine for two points, with the math module (for the A* heuristic)."""
+    lat1, lon1, lat2, lon2 = [math.radians(value) for value in (lat1, lon1, lat2, lon2)]
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def read_highways(way_tags_path, highways=None, oneway=True):
+    """Return {way id: direction} of the highway ways: 0 both ways, 1 forward only, -1 backward only.
+
+    Args:
+        way_tags_path (string): ways_tags.csv
+        highways (collection, defaults to None): highway values to keep; every
+            value but EXCLUDED_HIGHWAYS if None
+        oneway (Boolean, defaults to True): follow oneway tags (False for walking)
+    """
+    ways = {}
+    directions = {}
+    with open(way_tags_path, 'rb') as f:
+        for row in csv.DictReader(f):
+            if row['type'] != 'regular':
+                continue
+            if row['key'] == 'highway':
+                value = row['value']
+                if (value in highways) if highways is not None else (value not in EXCLUDED_HIGHWAYS):
+                    ways[int(row['id'])] = 0
+            elif row['key'] == 'oneway' and oneway:
+                if row['value'] in ONEWAY_FORWARD:
+                    directions[int(row['id'])] = 1
+                elif row['value'] in ONEWAY_BACKWARD:
+                    directions[int(row['id'])] = -1
+    for way_id, direction in directions.items():
+        if way_id in ways:
+            ways[way_id] = direction
+    return ways
+
+
+class RoutingGraph(object):
+    """Directed graph of highway nodes in CSR arrays (see the module docstring)."""
+
+    def __init__(self, node_ids, lat, lon, indptr, indices, lengths, landmarks=None,
+                 landmark_from=None, landmark_to=None):
+        self.node_ids = node_ids
+        self.lat = lat
+        self.lon = lon
+        self.indptr = indptr
+        self.indices = indices
+        self.lengths = lengths
+        # Graph indexes of the landmarks, and the distances from and to each of them:
+        # landmark_from[k][i] from landmark k to node i, landmark_to[k][i] from node i to it.
+        # Kept as one array('d') per landmark: 8 bytes a distance, and quick to index.
+        self.landmarks = landmarks
+        self.landmark_from = None if landmark_from is None else [distance_row(row) for row in landmark_from]
+        self.landmark_to = None if landmark_to is None else [distance_row(row) for row in landmark_to]
+        self._radians = None
+        self._adjacency = None
+        self._tentative = None
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    @property
+    def edges(self):
+        return len(self.indices)
+
+    def save(self, path=GRAPH_PATH):
+        """Write the arrays to an uncompressed .npz file."""
+        import numpy as np
+
+        arrays = dict((name, getattr(self, name)) for name in ARRAYS)
+        if self.landmarks is not None:
+            arrays['landmarks'] = self.landmarks
+            for name in ('landmark_from', 'landmark_to'):
+                arrays[name] = np.array([to_numpy(row, np.float64) for row in getattr(self, name)])
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path=GRAPH_PATH):
+        import numpy as np
+
+        data = np.load(path)
+        try:
+            return cls(*[data[name] for name in ARRAYS],
+                       **dict((name, data[name]) for name in LANDMARK_ARRAYS if name in data.files))
+        finally:
+            data.close()
+
+    def index(self, node_id):
+        """Return the graph index of an OSM node id; ValueError if it is not on a kept way."""
+        import numpy as np
+
+        i = int(np.searchsorted(self.node_ids, node_id))
+        if i == len(self.node_ids) or self.node_ids.item(i) != node_id:
+            raise ValueError('node {0} is not on a routable way'.format(node_id))
+        return i
+
+    def nearest(self, lat, lon):
+        """Return the OSM id of the graph node closest to a point."""
+        import numpy as np
+
+        return self.node_ids.item(int(np.argmin(haversine(self.lat, self.lon, lat, lon))))
+
+    def radians(self):
+        """Return lat, lon (radians) and cos(lat) of every node as lists, made on first use."""
+        if self._radians is None:
+            import numpy as np
+
+            lat, lon = np.radians(self.lat), np.radians(self.lon)
+            self._radians = lat.tolist(), lon.tolist(), np.cos(lat).tolist()
+        return self._radians
+
+    def adjacency(self):
+        """Return indptr, indices and lengths as lists, made on first use.
+
+        Indexing a list is several times quicker than indexing or slicing a NumPy array.
+        """
+        if self._adjacency is None:
+            self._adjacency = self.indptr.tolist(), self.indices.tolist(), self.lengths.tolist()
+        return self._adjacency
+
+    def reverse(self):
+        """Return the graph with every edge turned around (the same node indexes)."""
+        import numpy as np
+
+        src = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind='mergesort')
+        indptr = np.zeros(len(self) + 1, np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=len(self)), out=indptr[1:])
+        return RoutingGraph(self.node_ids, self.lat, self.lon, indptr, src[order],
+                            self.lengths[order])
+
+    def all_distances(self, source):
+        """Return an array of the metres from graph index source to every node (inf if unreachable)."""
+        import numpy as np
+
+        dist, _ = self.search(source, None)
+        distances = np.full(len(self), np.inf)
+        distances[list(dist)] = list(dist.values())
+        return distances
+
+    def add_landmarks(self, count=LANDMARKS):
+        """Choose landmarks and store the distances from and to each, for route (ALT).
+
+        The landmarks are spread around the edge of the graph: the nodes around a
+        middle node are split into 'count' equal angles, and the landmark of each
+        is its node farthest from the middle. Only nodes that reach the middle node
+        and are reached from it are chosen, so a dead end is never a landmark.
+        Each landmark takes a Dijkstra search over the whole graph each way, and
+        its distances 16 bytes per node; save() keeps them with the graph.
+        """
+        import numpy as np
+
+        backward = self.reverse()
+        # The node nearest the middle may be on a small piece of the graph (a parking
+        # lot's aisles); of a few candidates keep the one connected to the most nodes
+        rng = random.Random(0)
+        candidates = [self.index(self.nearest(float(np.mean(self.lat)), float(np.mean(self.lon))))]
+        candidates += [rng.randrange(len(self)) for _ in range(MIDDLE_TRIES - 1)]
+        best = -1
+        for candidate in candidates:
+            reached = self.all_distances(candidate)
+            both = np.isfinite(reached) & np.isfinite(backward.all_distances(candidate))
+            if np.count_nonzero(both) > best:
+                middle, spread, connected, best = candidate, reached, both, np.count_nonzero(both)
+            if 2 * best > len(self):
+                break
+        spread[~connected] = -1.0
+        angle = np.arctan2(self.lat - self.lat[middle],
+                           (self.lon - self.lon[middle]) * math.cos(math.radians(self.lat[middle])))
+        sector = np.minimum((angle + math.pi) / (2 * math.pi) * count, count - 1).astype(np.int64)
+        landmarks, from_rows, to_rows = [], [], []
+        for k in range(count):
+            in_sector = np.where(sector == k, spread, -1.0)
+            landmark = int(np.argmax(in_sector))
+            if in_sector[landmark] <= 0:
+                continue
+            landmarks.append(landmark)
+            from_rows.append(distance_row(self.all_distances(landmark)))
+            to_rows.append(distance_row(backward.all_distances(landmark)))
+        self.landmarks = np.array(landmarks, np.int64)
+        self.landmark_from, self.landmark_to = from_rows, to_rows
+
+    def landmark_bounds(self, source, target):
+        """Return (distances from landmark, from target's, distances to landmark, to target's)
+        for the ACTIVE_LANDMARKS landmarks giving the best lower bound from source to target.
+
+        A term that bounds nothing is made -inf (from) or inf (to), which the
+        heuristic in search ignores.
+        """
+        inf = float('inf')
+        terms = []
+        for from_l, to_l in zip(self.landmark_from, self.landmark_to):
+            # d(L, t) - d(L, v) and d(v, L) - d(t, L) are lower bounds of d(v, t)
+            from_t = from_l[target] if from_l[target] < inf else -inf
+            to_t = to_l[target]
+            bound = max(from_t - from_l[source], to_l[source] - to_t if to_t < inf else -inf)
+            terms.append((bound, from_l, from_t, to_l, to_t))
+        terms.sort(key=lambda term: term[0], reverse=True)
+        return [term[1:] for term in terms[:ACTIVE_LANDMARKS]]
+
+    def search(self, source, targets, target=None, limit=None):
+        """Dijkstra (A* towards target, if given) from graph index source.
+
+        A* takes the larger of the straight line distance to the target and, with
+        landmarks (add_landmarks), the best of their bounds (ALT).
+        Stops when every index in targets (if not None) is settled, or past limit metres.
+        Tentative distances are kept in a list of one entry per graph node, made
+        on first use and reset after each search, which is quicker than a
+        dictionary; so a graph answers one query at a time.
+
+        Returns:
+            {index: distance} and {index: previous index, -1 for source} of the nodes settled
+        """
+        indptr, indices, lengths = self.adjacency()
+        bounds = []
+        if target is not None:
+            lat, lon, cos_lat = self.radians()
+            lat_t, lon_t, cos_t = lat[target], lon[target], cos_lat[target]
+            if self.landmarks is not None and len(self.landmarks):
+                bounds = self.landmark_bounds(source, target)
+        inf = float('inf')
+        if self._tentative is None:
+            self._tentative = [inf] * len(self)
+        tentative = self._tentative
+        remaining = set(targets) if targets is not None else None
+        dist = {}
+        previous = {source: -1}
+        touched = [source]
+        tentative[source] = 0.0
+        heap = [(0.0, 0.0, source)]
+        heappush, heappop = heapq.heappush, heapq.heappop
+        try:
+            while heap:
+                _, d, u = heappop(heap)
+                if u in dist:
+                    continue
+                if limit is not None and d > limit:
+                    break
+                dist[u] = d
+                if remaining is not None:
+                    remaining.discard(u)
+                    if not remaining:
+                        break
+                for e in range(indptr[u], indptr[u + 1]):
+                    v = indices[e]
+                    d_v = d + lengths[e]
+                    if d_v < tentative[v]:
+                        if tentative[v] == inf:
+                            touched.append(v)
+                        tentative[v] = d_v
+                        previous[v] = u
+                        if target is None:
+                            heappush(heap, (d_v, d_v, v))
+                        else:
+                            # A*: add the straight line distance to the target (point_distance)
+                            a = math.sin((lat[v] - lat_t) / 2) ** 2 + \
+                                cos_lat[v] * cos_t * math.sin((lon[v] - lon_t) / 2) ** 2
+                            h = 2 * EARTH_RADIUS * math.asin(math.sqrt(min(a, 1.0)))
+                            # or the landmark bounds, if larger (inf - inf is nan: no bound)
+                            for from_l, from_t, to_l, to_t in bounds:
+                                if from_t - from_l[v] > h:
+                                    h = from_t - from_l[v]
+                                if to_l[v] - to_t > h:
+                                    h = to_l[v] - to_t
+                            heappush(heap, (d_v + h, d_v, v))
+        finally:
+            for v in touched:
+                tentative[v] = inf
+        return dist, previous
+
+    def route(self, source_id, target_id):
+        """Return the length in metres and the node ids of a shortest path, by A*.
+
+        Returns (None, []) if the target cannot be reached.
+        """
+        source, target = self.index(source_id), self.index(target_id)
+        dist, previous = self.search(source, [target], target=target)
+        if target not in dist:
+            return None, []
+        path = []
+        i = target
+        while i != -1:
+            path.append(self.node_ids.item(i))
+            i = previous[i]
+        return dist[target], path[::-1]
+
+    def distances(self, source_id, target_ids=None, limit=None):
+        """Return {node id: metres} from one node to many, by one Dijkstra search.
+
+        Args:
+            source_id (int): OSM id of the start node
+            target_ids (list, defaults to None): OSM ids to reach; None for every
+                node within limit. Targets that cannot be reached are left out.
+            limit (float, defaults to None): stop past this distance in metres
+        """
+        source = self.index(source_id)
+        if target_ids is None:
+            dist, _ = self.search(source, None, limit=limit)
+            return dict((self.node_ids.item(i), d) for i, d in dist.items())
+        targets = dict((self.index(node_id), node_id) for node_id in target_ids)
+        if not targets:
+            return {}
+        dist, _ = self.search(source, targets, limit=limit)
+        return dict((node_id, dist[i]) for i, node_id in targets.items() if i in dist)
+
+
+def distance_row(values):
+    """Return a NumPy row of landmark distances as an array('d')."""
+    return array('d', values.astype('float64').tobytes())
+
+
+def to_numpy(values, dtype):
+    """Return an array module array as a NumPy array, without copying."""
+    import numpy as np
+
+    return np.frombuffer(values, dtype) if len(values) else np.zeros(0, dtype)
+
+
+def read_way_nodes(way_nodes_path, ways):
+    """Return way id, node id and position arrays of the ways_nodes rows of the given ways."""
+    way_ids, node_ids, positions = array(ID_TYPECODE), array(ID_TYPECODE), array(ID_TYPECODE)
+    with open(way_nodes_path, 'rb') as f:
+        for row in csv.DictReader(f):
+            way_id = int(row['id'])
+            if way_id in ways:
+                way_ids.append(way_id)
+                node_ids.append(int(row['node_id']))
+                positions.append(int(row['position']))
+    return way_ids, node_ids, positions
+
+
+def read_coordinates(nodes_path, used):
+    """Return sorted id, lat and lon arrays of the nodes whose ids are in the sorted array used."""
+    import numpy as np
+
+    kept = {'ids': [np.zeros(0, np.int64)], 'lat': [np.zeros(0)], 'lon': [np.zeros(0)]}
+
+    def keep_used(ids, lat, lon):
+        # Memory grows with the graph's nodes, not with every node in the file
+        ids, lat, lon = to_numpy(ids, np.int64), to_numpy(lat, np.float64), to_numpy(lon, np.float64)
+        if not len(used):
+            return
+        i = np.searchsorted(used, ids)
+        keep = (i < len(used)) & (used[np.minimum(i, len(used) - 1)] == ids)
+        for name, values in (('ids', ids), ('lat', lat), ('lon', lon)):
+            kept[name].append(values[keep])
+
+    ids, lat, lon = array(ID_TYPECODE), array('d'), array('d')
+    with open(nodes_path, 'rb') as f:
+        for row in csv.DictReader(f):
+            if row['lat'] and row['lon']:
+                ids.append(int(row['id']))
+                lat.append(float(row['lat']))
+                lon.append(float(row['lon']))
+                if len(ids) == READ_CHUNK:
+                    keep_used(ids, lat, lon)
+                    ids, lat, lon = array(ID_TYPECODE), array('d'), array('d')
+    keep_used(ids, lat, lon)
+    ids, lat, lon = [np.concatenate(kept[name]) for name in ('ids', 'lat', 'lon')]
+    order = np.argsort(ids, kind='mergesort')
+    ids, first = np.unique(ids[order], return_index=True)
+    return ids, lat[order][first], lon[order][first]
+
+
+def build_graph(nodes_path=NODES_PATH, way_nodes_path=WAY_NODES_PATH, way_tags_path=WAY_TAGS_PATH,
+                highways=None, oneway=True):
+    """Build a RoutingGraph of the highway ways in the csv files written by process_map.
+
+    Args:
+        nodes_path, way_nodes_path, way_tags_path (string): csv files
+        highways (collection, defaults to None): highway values to keep; every
+            value but EXCLUDED_HIGHWAYS if None
+        oneway (Boolean, defaults to True): follow oneway tags (False for walking)
+
+    Returns:
+        RoutingGraph; nodes missing from nodes.csv are left out with their edges
+    """
+    import numpy as np
+
+    ways = read_highways(way_tags_path, highways, oneway)
+    way_ids, node_ids, positions = [to_numpy(a, np.int64)
+                                    for a in read_way_nodes(way_nodes_path, ways)]
+    # process_map writes each way's nodes together and in order; sort if not
+    if np.any((np.diff(way_ids) < 0) | ((np.diff(way_ids) == 0) & (np.diff(positions) <= 0))):
+        order = np.lexsort((positions, way_ids))
+        way_ids, node_ids = way_ids[order], node_ids[order]
+
+    ids, lat, lon = read_coordinates(nodes_path, np.unique(node_ids))
+    index = np.minimum(np.searchsorted(ids, node_ids), max(len(ids) - 1, 0))
+    known = (ids[index] == node_ids) if len(ids) else np.zeros(len(node_ids), bool)
+
+    # Consecutive nodes of the same way, both with coordinates
+    pair = (way_ids[:-1] == way_ids[1:]) & known[:-1] & known[1:]
+    src, dst = index[:-1][pair], index[1:][pair]
+    lengths = haversine(lat[src], lon[src], lat[dst], lon[dst])
+    direction = np.array([ways[way_id] for way_id in way_ids[:-1][pair].tolist()], np.int8)
+    forward, backward = direction >= 0, direction <= 0
+    src, dst = np.concatenate([src[forward], dst[backward]]), np.concatenate([dst[forward], src[backward]])
+    lengths = np.concatenate([lengths[forward], lengths[backward]])
+
+    # Sort by source node, keeping the shortest of parallel edges and no loops
+    order = np.lexsort((lengths, dst, src))
+    src, dst, lengths = src[order], dst[order], lengths[order]
+    keep = np.concatenate([[True], (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])]) & (src != dst)
+    src, dst, lengths = src[keep], dst[keep], lengths[keep]
+    indptr = np.zeros(len(ids) + 1, np.int64)
+    np.cumsum(np.bincount(src, minlength=len(ids)), out=indptr[1:])
+    return RoutingGraph(ids, lat, lon, indptr, dst.astype(np.int64), lengths)
@@ -0,0 +1,169 @@
+# coding: utf-8
+
+"""Fast scanner for count-only audits.
+
+count_tags and key_type only need element names and "k" values, so building
+every element with ElementTree is wasted work. These functions memory-map the
+.osm file and pull those values out with byte regexes instead. No elements are
+created, and the counts match count_tags and process_key_types in eastbay.audits.
+
+XML does not allow a raw '<' inside attribute values, so outside of comments,
+CDATA and processing instructions every '<' followed by a name starts an element.
+"""
+
+import mmap
+import re
+from collections import Counter
+
+from eastbay.audits import lower, lower_colon, problemchars
+
+# Comments, CDATA and processing instructions are matched (and dropped) so that
+# any '<name' inside them is not counted as an element.
+SCAN_ELEMENT = re.compile(br'<(?:!--.*?-->|!\[CDATA\[.*?\]\]>|\?.*?\?>|([A-Za-z_][^\s/>]*))', re.DOTALL)
+# Same idea for the "k" attribute of <tag> elements, wherever it is in the tag.
+SCAN_TAG_KEY = re.compile(br'<(?:!--.*?-->|!\[CDATA\[.*?\]\]>|\?.*?\?>|tag'
+                          br'(?:\s+(?!k\s*=)[^\s=/>]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*'
+                          br'\s+k\s*=\s*("[^"]*"|\'[^\']*\'))', re.DOTALL)
+SCAN_CHUNK = 4 * 1024 * 1024
+
+# Entity and character references ElementTree resolves in attribute values
+XML_REF = re.compile(r'&(#x[0-9a-fA-F]+|#[0-9]+|amp|lt|gt|quot|apos);')
+XML_ENTITIES = {'amp': '&', 'lt': '<', 'gt': '>', 'quot': '"', 'apos': "'"}
+
+try:
+    unichr
+except NameError:
+    unichr = chr
+
+def resolve_ref(m):
+    """Return the character for an entity or character reference match."""
+    ref = m.group(1)
+    if ref.startswith('#x'):
+        return unichr(int(ref[2:], 16))
+    if ref.startswith('#'):
+        return unichr(int(ref[1:]))
+    return XML_ENTITIES[ref]
+
+def map_osm(filename):
+    """Return a read-only memory map of the whole .osm file.
+
+    Args:
+        filename (string): name of .osm file
+
+    Returns:
+        mmap object; close it when done.
+    """
+    with open(filename, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def decode_attr(raw):
+    """Decode a raw attribute value the same way ElementTree does.
+
+    Literal tabs and newlines become spaces (XML attribute normalization),
+    then entity and character references are resolved.
+
+    Args:
+        raw (bytes): attribute value as found between the quotes
+
+    Returns:
+        Decoded value (unicode string)
+    """
+    value = raw.decode('utf-8')
+    value = value.replace('\r\n', ' ').replace('\t', ' ').replace('\n', ' ').replace('\r', ' ')
+    if '&' in value:
+        value = XML_REF.sub(resolve_ref, value)
+    return value
+
+def scan_chunks(mm, size=SCAN_CHUNK):
+    """Yield (start, end) offsets that split the map into chunks of about 'size' bytes.
+
+    Every chunk ends just before a '<', and never inside a comment, CDATA section
+    or processing instruction, so a regex run over one chunk sees whole markup.
+
+    Args:
+        mm (mmap): memory-mapped .osm file
+        size (int): approximate chunk size in bytes
+    """
+    start = 0
+    total = len(mm)
+    while start < total:
+        end = start + size
+        if end >= total:
+            end = total
+        else:
+            cut = mm.rfind(b'<', start + 1, end)
+            if cut < 0:
+                cut = mm.find(b'<', end)
+            end = total if cut < 0 else cut
+            for opener, closer in ((b'<!--', b'-->'), (b'<![CDATA[', b']]>'), (b'<?', b'?>')):
+                opened = mm.rfind(opener, start, end)
+                if opened > mm.rfind(closer, start, end):
+                    closed = mm.find(closer, end)
+                    end = total if closed < 0 else closed + len(closer)
+        yield start, end
+        start = end
+
+def scan_tags(filename):
+    """Return the same dictionary as count_tags, using the byte-level scanner.
+
+    Args:
+        filename (string): name of .osm file that is reviewed
+
+    Returns:
+        dictionary with tags as keys, number of cases as value
+    """
+    counts = Counter()
+    mm = map_osm(filename)
+    try:
+        for start, end in scan_chunks(mm):
+            counts.update(SCAN_ELEMENT.findall(mm, start, end))
+    finally:
+        mm.close()
+    counts.pop(b'', None) # comments, CDATA and processing instructions
+    return dict((name.decode('utf-8'), n) for name, n in counts.items())
+
+def scan_keys(filename):
+    """Return a Counter of raw "k" values of every <tag> element in the file.
+
+    Args:
+        filename (string): name of .osm file
+
+    Returns:
+        Counter with raw k values (bytes) as keys, number of cases as value
+    """
+    found = Counter()
+    mm = map_osm(filename)
+    try:
+        for start, end in scan_chunks(mm):
+            found.update(SCAN_TAG_KEY.findall(mm, start, end))
+    finally:
+        mm.close()
+    found.pop(b'', None) # comments, CDATA and processing instructions
+    keys = Counter()
+    for quoted, n in found.items():
+        keys[quoted[1:-1]] += n
+    return keys
+
+def scan_key_types(filename):
+    """Return the same four tag categories as process_key_types, using the byte-level scanner.
+
+    Each distinct key is only classified once, then weighted by how often it occurs.
+
+    Args:
+        filename (string): name of .osm file that will be scanned
+
+    Returns:
+        keys (dictionary): dictionary of character types and number of cases in .osm file
+    """
+    keys = {"lower": 0, "lower_colon": 0, "problemchars": 0, "other": 0}
+    for raw, n in scan_keys(filename).items():
+        k = decode_attr(raw)
+        if re.search(lower, k):
+            keys["lower"] += n
+        elif re.search(lower_colon, k):
+            keys['lower_colon'] += n
+        elif re.search(problemchars, k):
+            keys['problemchars'] += n
+        else:
+            keys['other'] += n
+    return keys
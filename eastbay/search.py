@@ -0,0 +1,151 @@
+# coding: utf-8
+
+"""Full-text search of tag values: find nodes and ways by name, street, shop and so on.
+
+create_db(search=True) builds two tables:
+    search_tags  every tag of each node and way that has a SEARCH_KEYS tag, with
+                 the full key ('addr:street', not 'street' and 'addr'), indexed on
+                 (element, id) so the tags of a result are read without a scan
+    tag_search   FTS5 index of the SEARCH_KEYS values in search_tags (an
+                 external content table: the values are read from search_tags)
+
+    searcher = TagSearch('eastbay.db')
+    for result in searcher.search('bike station'):
+        print(result['element'], result['id'], result['key'], result['value'], result['tags'])
+
+Words are matched whole or as prefixes ('bicy' finds 'bicycle_parking'), ignoring
+case and accents; '_' and punctuation separate words. Results are ranked by
+bm25, one per element, with the tag that matched best. The FTS5 extension is
+part of the sqlite bundled with Python 3 and recent Python 2 builds; without
+it, building the index raises sqlite3.OperationalError ('no such module: fts5').
+"""
+
+import re
+
+from eastbay.reports import connect_read_only
+
+# Full tag keys whose values are indexed
+SEARCH_KEYS = ['name', 'alt_name', 'old_name', 'official_name', 'brand', 'operator',
+               'addr:street', 'addr:housenumber', 'addr:city', 'addr:postcode',
+               'amenity', 'shop', 'cuisine', 'leisure', 'tourism', 'description']
+LIMIT = 20
+
+# The csv files split 'addr:street' into type 'addr' and key 'street'
+FULL_KEY_SQL = "CASE type WHEN 'regular' THEN key ELSE type || ':' || key END"
+
+SEARCH_TAGS_SQL = 'CREATE TABLE search_tags(element TEXT, id INTEGER, key TEXT, value TEXT)'
+# Indexes the value column of the search_tags rows inserted into it, and reads the
+# values back from search_tags, so they are not stored twice. Prefix indexes make
+# 2 and 3 letter prefix queries as fast as whole words.
+TAG_SEARCH_SQL = '''CREATE VIRTUAL TABLE tag_search USING fts5(
+    value, content = 'search_tags',
+    tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')'''
+SEARCH_TABLES = ('tag_search', 'search_tags')
+
+# Words, as the unicode61 tokenizer splits them
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def drop_search_index(conn):
+    """Drop the search tables, if any."""
+    cur = conn.cursor()
+    for table in SEARCH_TABLES:
+        cur.execute('DROP TABLE IF EXISTS {0};'.format(table))
+    conn.commit()
+
+
+def build_search_index(conn, keys=SEARCH_KEYS):
+    """Drop and rebuild search_tags and tag_search from nodes_tags and ways_tags.
+
+    Args:
+        conn (sqlite3 connection): connection to the database
+        keys (list): full tag keys whose values are indexed
+    """
+    drop_search_index(conn)
+    cur = conn.cursor()
+    cur.execute(SEARCH_TAGS_SQL)
+    marks = ', '.join('?' * len(keys))
+    for element, table in (('node', 'nodes_tags'), ('way', 'ways_tags')):
+        cur.execute('''INSERT INTO search_tags
+SELECT ?, id, {0}, value FROM {1}
+WHERE id IN (SELECT id FROM {1} WHERE {0} IN ({2}));'''.format(FULL_KEY_SQL, table, marks),
+                    [element] + list(keys))
+    cur.execute('CREATE INDEX search_tags_element ON search_tags(element, id);')
+    cur.execute(TAG_SEARCH_SQL)
+    # Only the SEARCH_KEYS rows; the 'rebuild' command would index every row of search_tags
+    cur.execute('''INSERT INTO tag_search(rowid, value)
+SELECT rowid, value FROM search_tags WHERE key IN ({0});'''.format(marks), list(keys))
+    # Merge the index segments written by the insert into one
+    cur.execute("INSERT INTO tag_search(tag_search) VALUES ('optimize');")
+    conn.commit()
+
+
+def fts_query(text, prefix=True):
+    """Return an FTS5 query matching every word of 'text', so punctuation in it is not syntax.
+
+    'Bike Station #3' -> '"Bike"* AND "Station"* AND "3"*'
+    """
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+    words = WORD.findall(text)
+    return ' AND '.join(u'"{0}"{1}'.format(word, '*' if prefix else '') for word in words)
+
+
+class TagSearch(object):
+    """Searches the tag_search index of a database built with create_db(search=True).
+
+    Args:
+        sqlite_file (string): name of database file
+    """
+
+    def __init__(self, sqlite_file):
+        self.conn = connect_read_only(sqlite_file)
+
+    def search(self, text, keys=None, limit=LIMIT, prefix=True, raw=False):
+        """Return the nodes and ways whose indexed tag values match 'text', best first.
+
+        Args:
+            text (string): words to find, all of them in the same tag value
+            keys (list, defaults to None): only match the values of these full keys
+            limit (int, defaults to LIMIT): most elements returned
+            prefix (Boolean, defaults to True): match words that start with each word of text
+            raw (Boolean, defaults to False): text is an FTS5 query ('cafe OR coffee', 'NEAR(...)')
+
+        Returns:
+            list of dictionaries with the element ('node' or 'way'), id, the key and
+            value of the best matching tag, and tags: dictionary of every tag of the element
+        """
+        query = text if raw else fts_query(text, prefix)
+        if not query:
+            return []
+        sql = '''SELECT s.element, s.id, s.key, s.value, MIN(tag_search.rank)
+FROM tag_search JOIN search_tags s ON s.rowid = tag_search.rowid
+WHERE tag_search MATCH ?'''
+        params = [query]
+        if keys:
+            sql += ' AND s.key IN ({0})'.format(', '.join('?' * len(keys)))
+            params.extend(keys)
+        # With MIN(), sqlite takes the other columns from the row with the best rank
+        sql += ' GROUP BY s.element, s.id ORDER BY MIN(tag_search.rank) LIMIT ?;'
+        params.append(limit)
+        return [{'element': element, 'id': element_id, 'key': key, 'value': value,
+                 'tags': self.tags(element, element_id)}
+                for element, element_id, key, value, _ in self.conn.execute(sql, params).fetchall()]
+
+    def tags(self, element, element_id):
+        """Return every tag of a node or way in search_tags as a dictionary of full key: value."""
+        return dict(self.conn.execute(
+            'SELECT key, value FROM search_tags WHERE element = ? AND id = ?;',
+            (element, element_id)).fetchall())
+
+    def close(self):
+        self.conn.close()
+
+
+def search(sqlite_file, text, keys=None, limit=LIMIT):
+    """Return the nodes and ways matching 'text' (see TagSearch.search)."""
+    searcher = TagSearch(sqlite_file)
+    try:
+        return searcher.search(text, keys, limit)
+    finally:
+        searcher.close()
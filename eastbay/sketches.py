@@ -0,0 +1,184 @@
+# coding: utf-8
+
+"""Approximate audits in fixed memory, for extracts too large to count exactly.
+
+process_users, process_zips and the tag audits keep every distinct value they
+see, so their memory grows with the extract. approx_stats reads the file once
+and keeps only:
+    HyperLogLog  distinct users, tag keys and tag key=value pairs; 2 ** p one-byte
+                 registers, relative standard error 1.04 / sqrt(2 ** p)
+    SpaceSaving  most frequent amenities, postcodes and cities; 1 / error counters,
+                 each count at most error * (values seen) above the true count
+
+    stats = approx_stats('eastbay.osm', distinct_error=0.01, frequency_error=0.001)
+    stats['unique_users']['estimate']
+    stats['postcodes']['top']   # [value, count, overestimate] pairs, most frequent first
+
+benchmarks/bench_sketches.py checks the estimates against exact counts.
+"""
+
+import hashlib
+import heapq
+import math
+import struct
+
+from eastbay.osm import iterparse_clear
+
+DISTINCT_ERROR = 0.01
+FREQUENCY_ERROR = 0.001
+TOP = 10
+
+# Tag keys whose most frequent values approx_stats reports
+FREQUENT_KEYS = [('amenities', 'amenity'), ('postcodes', 'addr:postcode'), ('cities', 'addr:city')]
+
+
+def hash64(value):
+    """Return a 64 bit hash of a string that is the same in every process (unlike hash())."""
+    if not isinstance(value, bytes):
+        value = value.encode('utf-8')
+    return struct.unpack('>Q', hashlib.md5(value).digest()[:8])[0]
+
+
+class HyperLogLog(object):
+    """Estimates the number of distinct values added, in 2 ** p bytes.
+
+    Args:
+        error (float): relative standard error wanted; the smallest power of two
+            register count m with 1.04 / sqrt(m) <= error is used (p from 4 to 18)
+    """
+
+    def __init__(self, error=DISTINCT_ERROR):
+        self.p = max(4, min(18, int(math.ceil(math.log((1.04 / error) ** 2, 2)))))
+        self.m = 1 << self.p
+        self.registers = bytearray(self.m)
+
+    @property
+    def std_error(self):
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value):
+        h = hash64(value)
+        # First p bits pick the register, which keeps the longest run of leading zeros seen
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = 64 - self.p - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """Add the values of another HyperLogLog with the same error."""
+        if other.m != self.m:
+            raise ValueError('cannot merge HyperLogLog of {0} and {1} registers'.format(
+                self.m, other.m))
+        for i, rank in enumerate(other.registers):
+            if rank > self.registers[i]:
+                self.registers[i] = rank
+
+    def estimate(self):
+        """Return the estimated number of distinct values."""
+        m = self.m
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        raw = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(b'\0')
+        if raw <= 2.5 * m and zeros:
+            # Few values: count the empty registers instead (linear counting)
+            return int(round(m * math.log(float(m) / zeros)))
+        return int(round(raw))
+
+
+class SpaceSaving(object):
+    """Keeps the most frequent values added, with at most 1 / error counters.
+
+    A value that is not counted takes the counter of the least frequent one,
+    with its count. A count is never below the true count of its value, and at
+    most error * total above it; every value seen more than error * total
+    times has a counter.
+
+    Args:
+        error (float): largest overestimate, as a fraction of the values added
+    """
+
+    def __init__(self, error=FREQUENCY_ERROR):
+        self.capacity = int(math.ceil(1.0 / error))
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        # (count, value) of every counted value; counts are brought up to date
+        # only when an entry reaches the top, so the smallest is found quickly
+        self.heap = []
+
+    def add(self, value, count=1):
+        self.total += count
+        if value in self.counts:
+            self.counts[value] += count
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[value] = count
+            self.errors[value] = 0
+            heapq.heappush(self.heap, (count, value))
+            return
+        while True:
+            smallest, victim = self.heap[0]
+            if self.counts[victim] == smallest:
+                break
+            heapq.heapreplace(self.heap, (self.counts[victim], victim))
+        heapq.heapreplace(self.heap, (smallest + count, value))
+        del self.counts[victim]
+        del self.errors[victim]
+        self.counts[value] = smallest + count
+        self.errors[value] = smallest
+
+    def max_error(self):
+        """Return the largest possible overestimate of any count so far."""
+        return self.total // self.capacity
+
+    def top(self, k=TOP):
+        """Return the k values with the highest counts as (value, count, overestimate), highest first.
+
+        The true count of each value is between count - overestimate and count.
+        """
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(value, count, self.errors[value]) for value, count in ranked]
+
+
+def approx_stats(filename, distinct_error=DISTINCT_ERROR, frequency_error=FREQUENCY_ERROR, top=TOP):
+    """Return approximate distinct counts and most frequent values of an .osm file.
+
+    Memory does not depend on the size of the file: under 2 * (1.04 / distinct_error) ** 2
+    bytes per distinct count and 1 / frequency_error counters per frequent key.
+
+    Args:
+        filename (string): name of .osm file
+        distinct_error (float, defaults to DISTINCT_ERROR): relative standard error of
+            the distinct counts
+        frequency_error (float, defaults to FREQUENCY_ERROR): largest overestimate of
+            a frequent value's count, as a fraction of that key's tags
+        top (int, defaults to TOP): frequent values returned per key
+
+    Returns:
+        dictionary with, for unique_users, tag_keys and tag_values (key=value
+        pairs), the estimate and std_error, and for amenities, postcodes and
+        cities, the total tags, the max_error of a count and the top values as
+        [value, count, overestimate] lists
+    """
+    distinct = dict((name, HyperLogLog(distinct_error))
+                    for name in ('unique_users', 'tag_keys', 'tag_values'))
+    frequent = dict((name, SpaceSaving(frequency_error)) for name, _ in FREQUENT_KEYS)
+    by_key = dict((key, frequent[name]) for name, key in FREQUENT_KEYS)
+    for _, element in iterparse_clear(filename):
+        if element.tag == 'tag':
+            k = element.attrib['k']
+            v = element.attrib['v']
+            distinct['tag_keys'].add(k)
+            distinct['tag_values'].add(k + u'=' + v)
+            if k in by_key:
+                by_key[k].add(v)
+        elif 'uid' in element.attrib:
+            distinct['unique_users'].add(element.attrib['uid'])
+    stats = {}
+    for name, sketch in distinct.items():
+        stats[name] = {'estimate': sketch.estimate(), 'std_error': sketch.std_error}
+    for name, sketch in frequent.items():
+        stats[name] = {'total': sketch.total, 'max_error': sketch.max_error(),
+                       'top': [list(entry) for entry in sketch.top(top)]}
+    return stats
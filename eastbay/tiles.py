@@ -0,0 +1,186 @@
+# coding: utf-8
+
+"""Node density per web mercator tile, at several zoom levels.
+
+create_db(tiles=True) reads the lat/lon columns of nodes in chunks, bins each
+chunk into the tiles of every zoom level in ZOOMS with NumPy, and stores the
+counts in one small table:
+
+    tile_counts(zoom, class, x, y, count)   WITHOUT ROWID, key (zoom, class, x, y)
+
+class '' counts every node; 'amenity=cafe', 'shop=bicycle' and so on count the
+nodes with that tag (CLASS_KEYS). Tiles without nodes have no row. x and y are
+the usual slippy map tile numbers (x east from -180, y south from 85.05 N), so
+a zoom 14 tile is about 1.9 km wide here.
+
+    SELECT x, y, count FROM tile_counts WHERE zoom = 14 AND class = 'amenity=cafe';
+    x0, y0, grid = density_grid('eastbay.db', 14, 'amenity=cafe')   # for plt.imshow(grid)
+
+NumPy is imported when the counts are built or read, not with the package.
+"""
+
+import math
+
+from eastbay.reports import connect_read_only
+
+ZOOMS = (10, 12, 14, 16)
+# Tags whose values each get their own counts, as '<key>=<value>'
+CLASS_KEYS = ('amenity', 'shop')
+ALL_NODES = ''
+# Rows read and binned at a time
+CHUNK = 50000
+# Web mercator stops short of the poles
+MAX_LAT = 85.0511287798
+
+TILE_COUNTS_SQL = '''CREATE TABLE tile_counts(
+    zoom INTEGER, class TEXT, x INTEGER, y INTEGER, count INTEGER,
+    PRIMARY KEY (zoom, class, x, y)) WITHOUT ROWID'''
+
+
+def tile_xy(lat, lon, zoom):
+    """Return the x and y tile numbers of NumPy arrays of lat and lon at a zoom level."""
+    import numpy as np
+
+    n = 2 ** zoom
+    lat = np.radians(np.clip(lat, -MAX_LAT, MAX_LAT))
+    x = np.floor((lon + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def tile_bounds(x, y, zoom):
+    """Return (south, west, north, east) of a tile in degrees."""
+    n = 2.0 ** zoom
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0
+
+
+class TileCounter(object):
+    """Adds up (class, tile) counts over chunks of coordinates, for each zoom level.
+
+    The counts of each zoom are kept as two arrays, sorted keys and counts, with
+    key = (class code * 2 ** zoom + x) * 2 ** zoom + y; each chunk is merged in
+    with np.unique and np.bincount, so memory grows with the tiles, not the nodes.
+    """
+
+    def __init__(self, zooms=ZOOMS):
+        import numpy as np
+
+        self.zooms = zooms
+        self.classes = {}
+        self.counts = dict((zoom, (np.zeros(0, np.int64), np.zeros(0, np.int64)))
+                           for zoom in zooms)
+
+    def add(self, lat, lon, classes=None):
+        """Count a chunk of nodes.
+
+        Args:
+            lat, lon (NumPy arrays): coordinates in degrees
+            classes (list, defaults to None): class of each node; ALL_NODES if None
+        """
+        import numpy as np
+
+        if classes is None:
+            codes = np.full(len(lat), self.classes.setdefault(ALL_NODES, len(self.classes)),
+                            np.int64)
+        else:
+            names, inverse = np.unique(np.array(classes, dtype=object), return_inverse=True)
+            known = np.array([self.classes.setdefault(name, len(self.classes)) for name in names],
+                             np.int64)
+            codes = known[inverse]
+        for zoom in self.zooms:
+            n = 2 ** zoom
+            x, y = tile_xy(lat, lon, zoom)
+            keys = (codes * n + x) * n + y
+            old_keys, old_counts = self.counts[zoom]
+            merged, inverse = np.unique(np.concatenate([old_keys, keys]), return_inverse=True)
+            weights = np.concatenate([old_counts, np.ones(len(keys), np.int64)])
+            self.counts[zoom] = merged, np.bincount(inverse, weights=weights).astype(np.int64)
+
+    def rows(self):
+        """Yield (zoom, class, x, y, count) for every tile with nodes."""
+        names = dict((code, name) for name, code in self.classes.items())
+        for zoom in self.zooms:
+            n = 2 ** zoom
+            keys, counts = self.counts[zoom]
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                code, tile = divmod(key, n * n)
+                x, y = divmod(tile, n)
+                yield zoom, names[code], x, y, count
+
+
+def read_chunks(cur, scale, size=CHUNK):
+    """Yield (lat, lon, classes) NumPy arrays of the rows of an executed cursor, 'size' at a time."""
+    import numpy as np
+
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            return
+        coords = np.array([row[:2] for row in rows], dtype=np.float64) / scale
+        classes = [row[2] for row in rows] if len(rows[0]) > 2 else None
+        yield coords[:, 0], coords[:, 1], classes
+
+
+def drop_tile_counts(conn):
+    """Drop the tile_counts table, if any."""
+    conn.execute('DROP TABLE IF EXISTS tile_counts;')
+    conn.commit()
+
+
+def build_tile_counts(conn, zooms=ZOOMS, class_keys=CLASS_KEYS, scale=1):
+    """Drop and rebuild tile_counts from the nodes and nodes_tags tables.
+
+    Args:
+        conn (sqlite3 connection): connection to the database
+        zooms (list): zoom levels to count
+        class_keys (list): tag keys whose '<key>=<value>' classes are counted too
+        scale (int, defaults to 1): units per degree of lat and lon; COORD_SCALE
+            for a database created with typed=True
+    """
+    counter = TileCounter(zooms)
+    cur = conn.cursor()
+    cur.execute('SELECT lat, lon FROM nodes WHERE lat IS NOT NULL AND lon IS NOT NULL;')
+    for lat, lon, classes in read_chunks(cur, scale):
+        counter.add(lat, lon)
+    if class_keys:
+        cur.execute('''SELECT n.lat, n.lon, t.key || '=' || t.value
+FROM nodes_tags t JOIN nodes n ON n.id = t.id
+WHERE t.type = 'regular' AND t.key IN ({0}) AND n.lat IS NOT NULL AND n.lon IS NOT NULL;'''.format(
+            ', '.join('?' * len(class_keys))), tuple(class_keys))
+        for lat, lon, classes in read_chunks(cur, scale):
+            counter.add(lat, lon, classes)
+    drop_tile_counts(conn)
+    cur.execute(TILE_COUNTS_SQL)
+    cur.executemany('INSERT INTO tile_counts VALUES (?, ?, ?, ?, ?);', counter.rows())
+    conn.commit()
+
+
+def density_grid(sqlite_file, zoom, node_class=ALL_NODES):
+    """Return the counts of one zoom level and class as a 2D NumPy array, for plotting.
+
+    Args:
+        sqlite_file (string): name of database file
+        zoom (int): one of the zoom levels in tile_counts
+        node_class (string, defaults to ALL_NODES): '' for every node, or '<key>=<value>'
+
+    Returns:
+        x and y of the top left tile, and an array of counts indexed [y - y0, x - x0]
+    """
+    import numpy as np
+
+    conn = connect_read_only(sqlite_file)
+    try:
+        rows = conn.execute('SELECT x, y, count FROM tile_counts WHERE zoom = ? AND class = ?;',
+                            (zoom, node_class)).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        return None, None, np.zeros((0, 0), np.int64)
+    x, y, count = [np.array(column, np.int64) for column in zip(*rows)]
+    grid = np.zeros((y.max() - y.min() + 1, x.max() - x.min() + 1), np.int64)
+    grid[y - y.min(), x - x.min()] = count
+    return int(x.min()), int(y.min()), grid